@@ -0,0 +1,75 @@
+"""
+FocusGuard AI - Pipeline Mode Benchmark
+Compares time-to-roast of the sequential, pipelined, streamed and fused GroqAgent
+modes against the mock Groq server, using the per-stage timings in each result.
+For streamed runs ttft_ms is when the first roast token reached the client callback.
+Fused runs make one vision call (reported as vision_ms) instead of vision + reasoning.
+
+Run: python benchmarks/bench_pipeline.py --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from mock_groq import MockGroqServer  # noqa: E402
+
+STAGES = ["vision_ms", "reasoning_ms", "safety_ms", "ttft_ms", "time_to_roast_ms", "total_ms"]
+MODES = ("sequential", "pipelined", "streamed", "fused", "fused_streamed")
+
+
+def run_mode(agent, mode: str, runs: int) -> dict:
+    samples = {stage: [] for stage in STAGES}
+    agent.pipeline_mode = "fused" if mode.startswith("fused") else "sequential"
+    for _ in range(runs):
+        if mode == "pipelined":
+            result, verdict = agent.process_distraction_pipelined("AAAA")
+            timings = dict(result["timings"], **verdict.result()["timings"])
+        elif mode.endswith("streamed"):
+            timings = agent.process_distraction("AAAA", on_token=lambda delta: None)["timings"]
+        else:
+            timings = agent.process_distraction("AAAA")["timings"]
+        # Without streaming the first token arrives with the whole roast
+        timings.setdefault("ttft_ms", timings["time_to_roast_ms"])
+        if "fused_ms" in timings:
+            timings.setdefault("vision_ms", timings["fused_ms"])
+            timings.setdefault("reasoning_ms", 0.0)
+        for stage in STAGES:
+            samples[stage].append(timings[stage])
+    return {stage: statistics.median(values) for stage, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs pipelined vs streamed vs fused roast latency")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.15, help="vision/reasoning latency (s)")
+    parser.add_argument("--safety-latency", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+
+    mock = MockGroqServer(args.port, latency=args.latency,
+                          latency_by_model={"guard": args.safety_latency})
+    mock.start()
+    os.environ["GROQ_API_KEY"] = "mock-key"
+    os.environ["GROQ_BASE_URL"] = mock.base_url
+    # Measure the model path every run, not the caches
+    os.environ["FOCUS_ROAST_POOL"] = "0"
+    os.environ["FOCUS_SAFETY_CACHE"] = "0"
+
+    from focus_guard.engine.groq_agent import GroqAgent
+    agent = GroqAgent()
+
+    try:
+        print(f"{'mode':<16}" + "".join(f"{s:>18}" for s in STAGES))
+        for mode in MODES:
+            medians = run_mode(agent, mode, args.runs)
+            print(f"{mode:<16}" + "".join(f"{medians[s]:>18.1f}" for s in STAGES))
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+FocusGuard AI - Frame Protocol Microbenchmark
+Bytes on the wire and server CPU per frame: legacy JSON data URL vs binary frames.
+
+Server CPU covers what /ws/focus does with a frame before the Groq call:
+parse the message, get raw bytes for the frame cache, and build the base64
+data URL the vision model needs.
+
+Run: python benchmarks/bench_protocol.py --width 1280 --height 720
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from PIL import Image  # noqa: E402
+
+from focus_guard.engine.protocol import (  # noqa: E402
+    decode_message, encode_frame, frame_base64, frame_bytes,
+)
+
+
+def sample_jpeg(width: int, height: int) -> bytes:
+    """Noisy JPEG roughly the size of a real webcam frame."""
+    rng = random.Random(0)
+    img = Image.frombytes("L", (width // 8, height // 8),
+                          bytes(rng.randrange(256) for _ in range(width * height // 64)))
+    img = img.resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def json_path(payload: str):
+    data = json.loads(payload)
+    image = data["image"]
+    if "," in image:
+        image = image.split(",", 1)[1]
+    raw = frame_bytes(image)
+    url = f"data:image/jpeg;base64,{frame_base64(image)}"
+    return raw, url
+
+
+def binary_path(payload: bytes):
+    frame = decode_message(payload)
+    raw = frame_bytes(frame.image)
+    url = f"data:image/jpeg;base64,{frame_base64(frame.image)}"
+    return raw, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs binary frame messages")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    jpeg = sample_jpeg(args.width, args.height)
+    reason = "User looking away"
+    json_payload = json.dumps({
+        "image": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode(),
+        "reason": reason,
+    })
+    binary_payload = encode_frame(jpeg, reason)
+
+    json_us = timeit.timeit(lambda: json_path(json_payload), number=args.number) / args.number * 1e6
+    binary_us = timeit.timeit(lambda: binary_path(binary_payload), number=args.number) / args.number * 1e6
+
+    print(f"frame {args.width}x{args.height}, JPEG {len(jpeg)} bytes")
+    print(f"{'format':<8}{'wire bytes':>12}{'overhead':>10}{'server us/frame':>18}")
+    for name, size, cpu in (("json", len(json_payload), json_us), ("binary", len(binary_payload), binary_us)):
+        print(f"{name:<8}{size:>12}{(size / len(jpeg) - 1) * 100:>9.1f}%{cpu:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+FocusGuard AI - Dashboard Rollup Benchmark
+Query time for the history API's summary over ranges of growing length: full
+scan of the event log vs the hourly/daily rollups, on a synthetic log
+(default 1M events spread over one user-year, plus other users' noise).
+
+Run: python benchmarks/bench_rollups.py --events 1000000 --users 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from focus_guard.engine.events import (  # noqa: E402
+    DAY, DISTRACTION, HOUR, RECOVERED, SESSION_END, EventStore,
+)
+
+ACTIVITIES = ["phone", "away", "sleeping", "eating", "talking", "other"]
+RANGES = {"1h": HOUR, "1d": DAY, "1w": 7 * DAY, "30d": 30 * DAY, "1y": 365 * DAY}
+
+
+def fill(store: EventStore, events: int, users: int, end: float, batch: int = 20000):
+    """Write ``events`` rows straight through the store's batch writer (rollups included)."""
+    rng = random.Random(0)
+    rows = []
+    for i in range(events):
+        # Half the log belongs to the user being queried
+        user = "alice" if i % 2 == 0 else f"user{rng.randrange(users)}"
+        kind = rng.choices([DISTRACTION, RECOVERED, SESSION_END], weights=[6, 3, 1])[0]
+        rows.append((user, end - rng.uniform(0, 365 * DAY), kind,
+                     rng.choice(ACTIVITIES) if kind == DISTRACTION else None,
+                     rng.uniform(30, 3600) if kind != DISTRACTION else 0,
+                     int(kind == DISTRACTION and rng.random() < 0.4), None))
+        if len(rows) == batch:
+            store._write(rows)
+            rows = []
+    if rows:
+        store._write(rows)
+
+
+def best_ms(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=number)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary queries: full scan vs rollups")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N per query")
+    parser.add_argument("--db", help="keep the generated log here (default: temporary file)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="focus-rollups-"), "events.db")
+    store = EventStore(path)
+    # Odd minute so every range has raw edges as well as whole buckets
+    end = time.time() // HOUR * HOUR - 17 * 60 - 13
+
+    started = time.perf_counter()
+    fill(store, args.events, args.users, end)
+    print(f"wrote {args.events} events in {time.perf_counter() - started:.1f}s ({path})")
+
+    print(f"{'range':<7}{'scan ms':>10}{'rollup ms':>11}{'speedup':>10}  match")
+    try:
+        for name, length in RANGES.items():
+            start = end - length
+            scanned = store.scan_summary("alice", start, end)
+            rolled = store.summary("alice", start, end)
+            match = all(abs(scanned[key] - rolled[key]) < 1e-6 for key in scanned)
+            scan_ms = best_ms(lambda: store.scan_summary("alice", start, end), args.repeat)
+            rollup_ms = best_ms(lambda: store.summary("alice", start, end), args.repeat)
+            print(f"{name:<7}{scan_ms:>10.2f}{rollup_ms:>11.2f}{scan_ms / rollup_ms:>9.1f}x  "
+                  f"{'yes' if match else 'NO'}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
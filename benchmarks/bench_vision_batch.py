@@ -0,0 +1,113 @@
+"""
+FocusGuard AI - Vision Batching Benchmark
+Throughput and per-frame latency of concurrent analyze_image calls with
+cross-session batching off and at growing batch windows, against the mock Groq
+server. The mock caps requests in flight (--concurrency, a stand-in for the
+provider's rate limit) and charges --image-latency per extra image in a request.
+
+"requests" is what the provider saw; "added ms" is the p50 latency over the
+unbatched run at the same load (negative when batching relieves queueing).
+
+Run: python benchmarks/bench_vision_batch.py --sessions 1,8,32 --duration 5
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from mock_groq import MockGroqServer  # noqa: E402
+
+WINDOWS = ("off", 0.01, 0.025, 0.05, 0.1)
+
+
+def run_load(agent, sessions: int, duration: float, interval: float) -> dict:
+    """Each session sends a fresh frame, waits for its description, then idles ``interval``."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    frames = itertools.count()
+    stop = time.monotonic() + duration
+
+    def session():
+        while time.monotonic() < stop:
+            frame = b"\xff\xd8" + next(frames).to_bytes(8, "big")
+            started = time.perf_counter()
+            description = agent.analyze_image(frame, timeout=10.0)
+            with lock:
+                (errors if description.startswith("Error") else latencies).append(time.perf_counter() - started)
+            if interval:
+                time.sleep(interval)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "frames": len(latencies),
+        "errors": len(errors),
+        "fps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-session vision batching: throughput vs added latency")
+    parser.add_argument("--sessions", default="1,8,32", help="comma-separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--interval", type=float, default=0.0, help="idle seconds between a session's frames")
+    parser.add_argument("--latency", type=float, default=0.2, help="vision request latency (s)")
+    parser.add_argument("--image-latency", type=float, default=0.02, help="extra latency per additional image (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests the provider serves at once")
+    parser.add_argument("--max-batch", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8902)
+    args = parser.parse_args()
+
+    mock = MockGroqServer(args.port, latency=args.latency, image_latency=args.image_latency,
+                          concurrency=args.concurrency)
+    mock.start()
+    os.environ["GROQ_API_KEY"] = "mock-key"
+    os.environ["GROQ_BASE_URL"] = mock.base_url
+    # Every frame is new work: no description reuse
+    os.environ["FOCUS_FRAME_CACHE"] = "0"
+    os.environ["FOCUS_ROAST_POOL"] = "0"
+
+    from focus_guard.engine.groq_agent import GroqAgent
+    from focus_guard.engine.vision_batch import VisionBatcher
+    agent = GroqAgent()
+
+    try:
+        print(f"{'sessions':>8}{'window':>8}{'frames/s':>10}{'requests':>10}{'img/req':>9}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'added ms':>10}{'errors':>8}")
+        for sessions in (int(n) for n in args.sessions.split(",")):
+            baseline = None
+            for window in WINDOWS:
+                agent.vision_batcher = None if window == "off" else VisionBatcher(
+                    agent.groq_vision_batch, agent._describe_frame, max_wait=window, max_batch=args.max_batch)
+                before = mock.app.state.requests
+                result = run_load(agent, sessions, args.duration, args.interval)
+                requests = mock.app.state.requests - before
+                if agent.vision_batcher is not None:
+                    agent.vision_batcher.shutdown()
+                baseline = result["p50_ms"] if baseline is None else baseline
+
+                label = window if window == "off" else f"{window * 1000:.0f}ms"
+                print(f"{sessions:>8}{label:>8}{result['fps']:>10.1f}{requests:>10}"
+                      f"{result['frames'] / max(requests, 1):>9.2f}{result['p50_ms']:>9.1f}"
+                      f"{result['p95_ms']:>9.1f}{result['p50_ms'] - baseline:>+10.1f}{result['errors']:>8}")
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
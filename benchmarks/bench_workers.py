@@ -0,0 +1,151 @@
+"""
+FocusGuard AI - Worker Scaling Benchmark
+Runs the same /ws/focus load against 1..N server worker processes (run_local.py
+with FOCUS_WORKERS) sharing one SQLite backend, and reports how throughput and
+latency scale. Also checks that a stopping server drains an in-flight frame.
+
+Run: python benchmarks/bench_workers.py --max-workers 4 --sessions 40 --duration 15
+     python benchmarks/bench_workers.py --backend redis://127.0.0.1:6379/0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from bench_ws_concurrency import ROOT  # noqa: E402
+from load_ws import COLD_ENV, build_report, drive, load_frames, load_reasons, start_mock_groq  # noqa: E402
+
+from focus_guard.engine.protocol import encode_frame  # noqa: E402
+
+
+# =============================================================================
+# Servers
+# =============================================================================
+
+def start_workers(port: int, groq_url: str, workers: int, backend: str, args) -> subprocess.Popen:
+    """run_local.py with ``workers`` processes behind one port."""
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        GROQ_API_KEY="mock-key",
+        GROQ_BASE_URL=groq_url,
+        FOCUS_WORKERS=str(workers),
+        FOCUS_SHARED_BACKEND=backend,
+        FOCUS_GROQ_RATE=str(args.rate),
+        FOCUS_ENGINE_WORKERS=str(args.engine_workers),
+        **(COLD_ENV if args.cold else {}),
+    )
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "run_local.py")], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(150):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("FocusGuard workers did not start")
+
+
+def stop(proc: subprocess.Popen):
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# =============================================================================
+# Drain Check
+# =============================================================================
+
+async def drain_check(port: int, frame: bytes, proc: subprocess.Popen, timeout: float = 20) -> dict:
+    """Send a frame, stop the server while it is in flight, and see whether the roast still arrives."""
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/focus", max_size=None) as ws:
+        started = time.perf_counter()
+        await ws.send(encode_frame(frame))
+        await asyncio.sleep(0.05)
+        proc.send_signal(signal.SIGINT)
+        try:
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                if message.get("type") not in ("roast_delta", "safety"):
+                    break
+            delivered = "tease" in message
+        except (asyncio.TimeoutError, websockets.ConnectionClosed):
+            delivered = False
+    return {"delivered": delivered, "elapsed_ms": (time.perf_counter() - started) * 1000}
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale /ws/focus from 1 to N worker processes")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--sessions", type=int, default=40, help="concurrent sockets")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of load per step")
+    parser.add_argument("--messages", type=int, default=10, help="messages per session before reconnecting")
+    parser.add_argument("--port", type=int, default=8820)
+    parser.add_argument("--backend", help="FOCUS_SHARED_BACKEND (default: a temporary SQLite file)")
+    parser.add_argument("--engine-workers", type=int, default=16, help="FOCUS_ENGINE_WORKERS per process")
+    parser.add_argument("--rate", type=float, default=0, help="FOCUS_GROQ_RATE shared by all workers")
+    parser.add_argument("--cold", action="store_true", help="disable prefilter and caches")
+    parser.add_argument("--latency", type=float, default=0.25, help="mock Groq latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--json", help="write all reports to this file")
+    args = parser.parse_args()
+    # Fields load_ws's workload expects
+    args.think, args.reason_ratio, args.timeout = 0.0, 0.2, 30.0
+    args.error_rate, args.error_status = 0.0, 500
+
+    frames = load_frames()
+    reasons = load_reasons()
+    tmp = tempfile.mkdtemp(prefix="focus-bench-")
+    mock_url = f"http://127.0.0.1:{args.port + 1}"
+    mock = start_mock_groq(args.port + 1, args)
+
+    reports = []
+    try:
+        for workers in range(1, args.max_workers + 1):
+            backend = args.backend or f"sqlite:///{os.path.join(tmp, f'shared-{workers}.db')}"
+            proc = start_workers(args.port, mock_url, workers, backend, args)
+            try:
+                results, client_lags, elapsed = asyncio.run(
+                    drive(f"ws://127.0.0.1:{args.port}/ws/focus", frames, reasons, args))
+                drained = asyncio.run(drain_check(args.port, frames[0], proc))
+            finally:
+                stop(proc)
+            report = build_report(results, client_lags, elapsed, {}, 0, args)
+            report.update(workers=workers, drain_delivered=drained["delivered"],
+                          drain_ms=drained["elapsed_ms"])
+            reports.append(report)
+
+            speedup = report["frames_per_sec"] / reports[0]["frames_per_sec"] if reports[0]["frames_per_sec"] else 0
+            print(f"workers={workers}  frames/s={report['frames_per_sec']:.1f} (x{speedup:.2f})  "
+                  f"frame p50={report['frame_p50_ms']:.0f}ms p99={report['frame_p99_ms']:.0f}ms  "
+                  f"errors={report['errors'] + report['timeouts']}  "
+                  f"drain={'ok' if drained['delivered'] else 'LOST'} ({drained['elapsed_ms']:.0f}ms)")
+    finally:
+        mock.terminate()
+        mock.wait(timeout=10)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+FocusGuard AI - WebSocket Concurrency Benchmark
+N simulated sockets send frames to /ws/focus backed by the mock Groq server.
+Reports p50/p99 round-trip latency per frame and /health latency under load.
+
+Run: python benchmarks/bench_ws_concurrency.py --sockets 20 --frames 5
+     python benchmarks/bench_ws_concurrency.py --compare   # inline vs offloaded
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mock_groq import MockGroqServer  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+FRAME = {"image": "data:image/jpeg;base64," + "A" * 4000}
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def start_focus_server(port: int, groq_url: str, workers: int, rate: float = 0,
+                       extra_env: dict = None) -> subprocess.Popen:
+    """Launch the FocusGuard server against the mock Groq API."""
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="mock-key",
+        GROQ_BASE_URL=groq_url,
+        FOCUS_ENGINE_WORKERS=str(workers),
+        FOCUS_GROQ_RATE=str(rate),
+        **(extra_env or {}),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--app-dir", os.path.join(ROOT, "src"),
+         "focus_guard.server:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("FocusGuard server did not start")
+
+
+async def socket_client(url: str, frames: int, latencies: list):
+    async with websockets.connect(url, max_size=None) as ws:
+        for _ in range(frames):
+            started = time.perf_counter()
+            await ws.send(json.dumps(FRAME))
+            await ws.recv()
+            latencies.append(time.perf_counter() - started)
+
+
+async def health_prober(port: int, stop: asyncio.Event, latencies: list):
+    """Measures how long /health takes while sockets are busy."""
+    loop = asyncio.get_running_loop()
+    url = f"http://127.0.0.1:{port}/health"
+    while not stop.is_set():
+        started = time.perf_counter()
+        await loop.run_in_executor(None, lambda: urllib.request.urlopen(url, timeout=30).read())
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+
+async def drive(port: int, sockets: int, frames: int):
+    frame_latencies, health_latencies = [], []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(health_prober(port, stop, health_latencies))
+
+    started = time.perf_counter()
+    url = f"ws://127.0.0.1:{port}/ws/focus"
+    await asyncio.gather(*(socket_client(url, frames, frame_latencies) for _ in range(sockets)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await prober
+    return frame_latencies, health_latencies, elapsed
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def run(sockets: int, frames: int, workers: int, latency: float, port: int, rate: float = 0) -> dict:
+    mock = MockGroqServer(port + 1, latency=latency)
+    mock.start()
+    proc = start_focus_server(port, mock.base_url, workers, rate)
+    try:
+        frame_lat, health_lat, elapsed = asyncio.run(drive(port, sockets, frames))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        mock.stop()
+
+    return {
+        "workers": workers,
+        "sockets": sockets,
+        "frames": len(frame_lat),
+        "frames_per_sec": len(frame_lat) / elapsed,
+        "p50_ms": percentile(frame_lat, 50) * 1000,
+        "p99_ms": percentile(frame_lat, 99) * 1000,
+        "health_p50_ms": percentile(health_lat, 50) * 1000,
+        "health_p99_ms": percentile(health_lat, 99) * 1000,
+        "mean_ms": statistics.mean(frame_lat) * 1000 if frame_lat else 0.0,
+    }
+
+
+def print_report(result: dict):
+    label = "inline" if result["workers"] == 0 else f"{result['workers']} workers"
+    print(f"[{label}] sockets={result['sockets']} frames={result['frames']} "
+          f"fps={result['frames_per_sec']:.1f}")
+    print(f"    frame  p50={result['p50_ms']:.0f}ms  p99={result['p99_ms']:.0f}ms")
+    print(f"    health p50={result['health_p50_ms']:.0f}ms  p99={result['health_p99_ms']:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /ws/focus under concurrency")
+    parser.add_argument("--sockets", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.25, help="mock Groq latency (s)")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--rate", type=float, default=0, help="FOCUS_GROQ_RATE (0 = unlimited)")
+    parser.add_argument("--compare", action="store_true", help="also run inline (blocking) mode")
+    args = parser.parse_args()
+
+    modes = [0, args.workers] if args.compare else [args.workers]
+    for workers in modes:
+        print_report(run(args.sockets, args.frames, workers, args.latency, args.port, args.rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+FocusGuard AI - Pre-Classifier Evaluation
+Runs FocusPreClassifier over a folder of sample frames (in filename order, as one
+session) and reports how many vision calls it would save and how often it agrees
+with the labels.
+
+Labels come from an optional labels.csv (filename,label) in the folder, or from the
+filename prefix before the first underscore (e.g. away_003.jpg, phone_012.jpg).
+Agreement:
+    away  - frame label is "away"
+    same  - frame label matches the label of the last frame sent to the LLM
+    llm   - always counted as agreeing (the vision model decides)
+
+Run: python benchmarks/eval_prefilter.py path/to/frames
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from focus_guard.engine.prefilter import AWAY, LLM, SAME, FocusPreClassifier  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg")
+
+
+def load_labels(folder: str, filenames: list) -> dict:
+    path = os.path.join(folder, "labels.csv")
+    if os.path.exists(path):
+        with open(path, newline="") as f:
+            return {row[0]: row[1].strip().lower() for row in csv.reader(f) if len(row) >= 2}
+    return {name: name.split("_", 1)[0].lower() for name in filenames if "_" in name}
+
+
+def evaluate(folder: str, classifier: FocusPreClassifier) -> dict:
+    filenames = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    labels = load_labels(folder, filenames)
+
+    verdicts = Counter()
+    agreed = judged = 0
+    last_llm_label = None
+    elapsed = 0.0
+
+    for name in filenames:
+        with open(os.path.join(folder, name), "rb") as f:
+            frame = f.read()
+
+        started = time.perf_counter()
+        verdict = classifier.classify(frame)
+        elapsed += time.perf_counter() - started
+        verdicts[verdict] += 1
+
+        label = labels.get(name)
+        if verdict == LLM:
+            classifier.remember(label or name)
+            last_llm_label = label
+        elif label is not None:
+            judged += 1
+            expected = "away" if verdict == AWAY else last_llm_label
+            agreed += label == expected
+
+    total = len(filenames)
+    return {
+        "frames": total,
+        "verdicts": dict(verdicts),
+        "call_reduction": (verdicts[AWAY] + verdicts[SAME]) / total if total else 0.0,
+        "agreement": agreed / judged if judged else None,
+        "judged": judged,
+        "ms_per_frame": elapsed / total * 1000 if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the focus pre-classifier")
+    parser.add_argument("folder")
+    parser.add_argument("--dark", type=float, help="override dark threshold")
+    parser.add_argument("--min-skin", type=float, help="override min skin ratio")
+    parser.add_argument("--still", type=float, help="override still threshold")
+    args = parser.parse_args()
+
+    overrides = {k: v for k, v in (("dark_threshold", args.dark), ("min_skin_ratio", args.min_skin),
+                                   ("still_threshold", args.still)) if v is not None}
+    report = evaluate(args.folder, FocusPreClassifier(**overrides))
+
+    print(f"frames:          {report['frames']}")
+    print(f"verdicts:        away={report['verdicts'].get(AWAY, 0)} "
+          f"same={report['verdicts'].get(SAME, 0)} llm={report['verdicts'].get(LLM, 0)}")
+    print(f"call reduction:  {report['call_reduction']:.1%}")
+    if report["agreement"] is None:
+        print("agreement:       n/a (no labels)")
+    else:
+        print(f"agreement:       {report['agreement']:.1%} over {report['judged']} gated frames")
+    print(f"cost:            {report['ms_per_frame']:.2f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
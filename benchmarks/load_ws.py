@@ -0,0 +1,407 @@
+"""
+FocusGuard AI - WebSocket Load Generator
+Replays recorded webcam frames and tab-switch reasons against /ws/focus at a
+given concurrency, then reports sessions/s, frames/s, p50/p95/p99 latency and
+event-loop lag (server side from /metrics, plus the generator's own loop).
+
+By default it starts the mock Groq server and a FocusGuard server itself;
+pass --url to load a server that is already running.
+
+Run: python benchmarks/load_ws.py --sessions 50 --duration 30
+     python benchmarks/load_ws.py --frames-dir recordings/ --reasons reasons.txt
+     python benchmarks/load_ws.py --error-rate 0.05 --jitter 0.5
+     python benchmarks/load_ws.py --json baseline.json
+     python benchmarks/load_ws.py --baseline baseline.json   # exit 1 on regression
+"""
+
+import argparse
+import asyncio
+import glob
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from bench_ws_concurrency import percentile, start_focus_server  # noqa: E402
+
+from focus_guard.engine.protocol import encode_frame  # noqa: E402
+
+DEFAULT_REASONS = [
+    "Switched tabs",
+    "Opened YouTube",
+    "Tab hidden for 30 seconds",
+    "Opened Instagram",
+    "Window lost focus",
+]
+
+# Environment that sends every frame down the full Vision -> Reasoning -> Safety path
+COLD_ENV = {
+    "FOCUS_PREFILTER": "0",
+    "FOCUS_FRAME_CACHE": "0",
+    "FOCUS_ROAST_POOL": "0",
+    "FOCUS_SAFETY_CACHE": "0",
+}
+
+LAG_METRIC = "focusguard_event_loop_lag_seconds"
+FALLBACK_METRIC = "focusguard_roast_fallbacks_total"
+
+
+# =============================================================================
+# Workload
+# =============================================================================
+
+def load_frames(folder: str = None, count: int = 16) -> list:
+    """JPEG bytes from a folder of recorded frames, or synthetic webcam-like frames."""
+    if folder:
+        paths = sorted(glob.glob(os.path.join(folder, "*.jpg")) + glob.glob(os.path.join(folder, "*.jpeg")))
+        if not paths:
+            raise SystemExit(f"No .jpg frames in {folder}")
+        frames = []
+        for path in paths:
+            with open(path, "rb") as f:
+                frames.append(f.read())
+        return frames
+    return [synthetic_frame(seed) for seed in range(count)]
+
+
+def synthetic_frame(seed: int, width: int = 640, height: int = 480) -> bytes:
+    """Noisy frame with a skin-toned block in the middle, different for every seed.
+
+    Noise keeps the frame cache and motion check from short-circuiting the vision call.
+    """
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    small = Image.frombytes("RGB", (width // 8, height // 8),
+                            bytes(rng.randrange(60, 200) for _ in range(width * height * 3 // 64)))
+    img = small.resize((width, height))
+    ImageDraw.Draw(img).ellipse(
+        (width // 3, height // 4, width * 2 // 3, height * 3 // 4), fill=(205, 150, 120))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=75)
+    return buffer.getvalue()
+
+
+def load_reasons(path: str = None) -> list:
+    if not path:
+        return DEFAULT_REASONS
+    with open(path, encoding="utf-8") as f:
+        reasons = [line.strip() for line in f if line.strip()]
+    return reasons or DEFAULT_REASONS
+
+
+class Results:
+    """Per-kind latencies plus session and error counts."""
+
+    def __init__(self):
+        self.latencies = {"frame": [], "reason": []}
+        self.sessions = 0
+        self.connect_errors = 0
+        self.errors = 0
+        self.timeouts = 0
+
+
+# =============================================================================
+# Load Generator
+# =============================================================================
+
+async def receive_result(ws, timeout: float) -> dict:
+    """Wait for the reply to the last message, skipping stream deltas and late safety verdicts."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        message = json.loads(await asyncio.wait_for(ws.recv(), remaining))
+        if message.get("type") in ("roast_delta", "safety"):
+            continue
+        return message
+
+
+async def run_session(url: str, frames: list, reasons: list, args, deadline: float,
+                      results: Results, rng: random.Random):
+    """One socket: replay up to --messages messages, one at a time, then disconnect."""
+    offset = rng.randrange(len(frames))
+    async with websockets.connect(url, max_size=None) as ws:
+        for index in range(args.messages):
+            if time.perf_counter() >= deadline:
+                break
+            if rng.random() < args.reason_ratio:
+                kind, payload = "reason", json.dumps({"reason": rng.choice(reasons)})
+            else:
+                kind, payload = "frame", encode_frame(frames[(offset + index) % len(frames)])
+
+            started = time.perf_counter()
+            await ws.send(payload)
+            try:
+                reply = await receive_result(ws, args.timeout)
+            except asyncio.TimeoutError:
+                results.timeouts += 1
+                return
+            if "error" in reply:
+                results.errors += 1
+            else:
+                results.latencies[kind].append(time.perf_counter() - started)
+            if args.think:
+                await asyncio.sleep(args.think)
+    results.sessions += 1
+
+
+async def session_worker(url: str, frames: list, reasons: list, args, deadline: float,
+                         results: Results, seed: int):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        try:
+            await run_session(url, frames, reasons, args, deadline, results, rng)
+        except (OSError, websockets.WebSocketException):
+            results.connect_errors += 1
+            await asyncio.sleep(0.1)
+
+
+async def loop_lag_probe(stop: asyncio.Event, lags: list, interval: float = 0.05):
+    """The generator's own loop lag; if this is high the client, not the server, is the bottleneck."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def drive(url: str, frames: list, reasons: list, args) -> tuple:
+    results = Results()
+    client_lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(loop_lag_probe(stop, client_lags))
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        session_worker(url, frames, reasons, args, deadline, results, seed)
+        for seed in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    return results, client_lags, elapsed
+
+
+# =============================================================================
+# Servers
+# =============================================================================
+
+def start_mock_groq(port: int, args) -> subprocess.Popen:
+    """Mock Groq in its own process so it doesn't compete with the generator for the GIL."""
+    proc = subprocess.Popen([
+        sys.executable, os.path.join(os.path.dirname(__file__), "mock_groq.py"),
+        "--port", str(port), "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+    ])
+    for _ in range(100):
+        if scrape(f"http://127.0.0.1:{port}", "/mock/stats"):
+            return proc
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("Mock Groq server did not start")
+
+
+# =============================================================================
+# Server Metrics
+# =============================================================================
+
+def scrape(http_url: str, path: str) -> str:
+    try:
+        with urllib.request.urlopen(f"{http_url}{path}", timeout=5) as response:
+            return response.read().decode()
+    except OSError:
+        return ""
+
+
+def histogram_buckets(text: str, name: str) -> dict:
+    """Cumulative bucket counts {upper bound: count} for an unlabelled histogram."""
+    buckets = {}
+    pattern = re.compile(rf'^{name}_bucket{{le="([^"]+)"}} (\S+)$', re.M)
+    for bound, count in pattern.findall(text):
+        buckets[float("inf") if bound == "+Inf" else float(bound)] = float(count)
+    return buckets
+
+
+def histogram_quantile(q: float, buckets: dict) -> float:
+    """Prometheus-style quantile estimate (linear interpolation inside the bucket)."""
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] == 0:
+        return 0.0
+    rank = q * buckets[bounds[-1]]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def counter_value(text: str, name: str) -> float:
+    match = re.search(rf"^{name} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def server_metrics(before: str, after: str, stats: str) -> dict:
+    """Loop lag and fallback roasts during the run, from the difference of two scrapes."""
+    start, end = histogram_buckets(before, LAG_METRIC), histogram_buckets(after, LAG_METRIC)
+    delta = {bound: end[bound] - start.get(bound, 0.0) for bound in end}
+    try:
+        max_lag_ms = json.loads(stats)["event_loop"]["max_lag_ms"]
+    except (ValueError, KeyError, TypeError):
+        max_lag_ms = None
+
+    # Interpolation can overshoot inside a wide bucket; never report more than was seen
+    cap = max_lag_ms if max_lag_ms is not None else float("inf")
+    return {
+        "server_lag_p50_ms": min(histogram_quantile(0.5, delta) * 1000, cap),
+        "server_lag_p99_ms": min(histogram_quantile(0.99, delta) * 1000, cap),
+        "server_lag_max_ms": max_lag_ms,
+        "fallbacks": int(counter_value(after, FALLBACK_METRIC) - counter_value(before, FALLBACK_METRIC)),
+    }
+
+
+# =============================================================================
+# Report
+# =============================================================================
+
+def build_report(results: Results, client_lags: list, elapsed: float, server: dict,
+                 injected: int, args) -> dict:
+    frames, reasons = results.latencies["frame"], results.latencies["reason"]
+    report = {
+        "sessions": args.sessions,
+        "duration_s": round(elapsed, 2),
+        "sessions_completed": results.sessions,
+        "sessions_per_sec": results.sessions / elapsed,
+        "frames": len(frames),
+        "frames_per_sec": len(frames) / elapsed,
+        "reasons": len(reasons),
+        "reasons_per_sec": len(reasons) / elapsed,
+        "errors": results.errors,
+        "timeouts": results.timeouts,
+        "connect_errors": results.connect_errors,
+        "groq_errors_injected": injected,
+        "client_lag_p99_ms": percentile(client_lags, 99) * 1000,
+    }
+    for kind, values in (("frame", frames), ("reason", reasons)):
+        for pct in (50, 95, 99):
+            report[f"{kind}_p{pct}_ms"] = percentile(values, pct) * 1000
+    report.update(server)
+    return report
+
+
+def print_report(report: dict):
+    print(f"sessions={report['sessions']} duration={report['duration_s']}s")
+    print(f"    throughput  sessions/s={report['sessions_per_sec']:.2f}  "
+          f"frames/s={report['frames_per_sec']:.1f}  reasons/s={report['reasons_per_sec']:.1f}")
+    for kind in ("frame", "reason"):
+        print(f"    {kind:<7}     p50={report[f'{kind}_p50_ms']:.0f}ms  "
+              f"p95={report[f'{kind}_p95_ms']:.0f}ms  p99={report[f'{kind}_p99_ms']:.0f}ms")
+    max_lag = report["server_lag_max_ms"]
+    print(f"    loop lag    server p50={report['server_lag_p50_ms']:.1f}ms  "
+          f"p99={report['server_lag_p99_ms']:.1f}ms  "
+          f"max={'n/a' if max_lag is None else f'{max_lag:.1f}ms'}  "
+          f"client p99={report['client_lag_p99_ms']:.1f}ms")
+    print(f"    failures    errors={report['errors']}  timeouts={report['timeouts']}  "
+          f"connect={report['connect_errors']}  fallback roasts={report['fallbacks']}  "
+          f"injected Groq errors={report['groq_errors_injected']}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that got worse than the baseline by more than ``tolerance``."""
+    regressions = []
+    for key in ("frames_per_sec", "sessions_per_sec"):
+        if baseline.get(key) and report[key] < baseline[key] * (1 - tolerance):
+            regressions.append(f"{key}: {report[key]:.2f} < {baseline[key]:.2f}")
+    for key in ("frame_p95_ms", "frame_p99_ms", "reason_p95_ms", "server_lag_p99_ms"):
+        if baseline.get(key) and report[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {report[key]:.1f} > {baseline[key]:.1f}")
+    return regressions
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay frames and reasons against /ws/focus")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent sockets")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--messages", type=int, default=10, help="messages per session before reconnecting")
+    parser.add_argument("--think", type=float, default=0.0, help="pause after each reply (s)")
+    parser.add_argument("--reason-ratio", type=float, default=0.2, help="share of messages that are reasons")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-reply timeout (s)")
+    parser.add_argument("--frames-dir", help="folder of recorded .jpg frames (default: synthetic)")
+    parser.add_argument("--reasons", help="file with one tab-switch reason per line")
+    parser.add_argument("--url", help="existing server, e.g. http://127.0.0.1:8000 (skips the mock)")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--workers", type=int, default=16, help="FOCUS_ENGINE_WORKERS")
+    parser.add_argument("--rate", type=float, default=0, help="FOCUS_GROQ_RATE (0 = unlimited)")
+    parser.add_argument("--cold", action="store_true", help="disable prefilter and caches")
+    parser.add_argument("--latency", type=float, default=0.25, help="mock Groq latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="mock latency jitter (fraction)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock Groq error rate")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (fraction)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames_dir)
+    reasons = load_reasons(args.reasons)
+
+    mock = proc = None
+    if args.url:
+        http_url = args.url.rstrip("/")
+    else:
+        mock_url = f"http://127.0.0.1:{args.port + 1}"
+        mock = start_mock_groq(args.port + 1, args)
+        proc = start_focus_server(args.port, mock_url, args.workers, args.rate,
+                                  extra_env=COLD_ENV if args.cold else None)
+        http_url = f"http://127.0.0.1:{args.port}"
+    ws_url = http_url.replace("http", "ws", 1) + "/ws/focus"
+
+    try:
+        before = scrape(http_url, "/metrics")
+        results, client_lags, elapsed = asyncio.run(drive(ws_url, frames, reasons, args))
+        server = server_metrics(before, scrape(http_url, "/metrics"), scrape(http_url, "/stats"))
+        injected = json.loads(scrape(mock_url, "/mock/stats") or "{}").get("errors", 0) if mock else 0
+    finally:
+        for child in (proc, mock):
+            if child is not None:
+                child.terminate()
+                child.wait(timeout=10)
+
+    report = build_report(results, client_lags, elapsed, server, injected, args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
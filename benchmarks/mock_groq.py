@@ -0,0 +1,208 @@
+"""
+FocusGuard AI - Mock Groq Server
+Local stand-in for the Groq chat completions API used by the benchmarks.
+
+Point the SDK at it with GROQ_BASE_URL=http://127.0.0.1:<port>
+
+Latency can be fixed, per model, or jittered; errors can be injected at a
+given rate (500s by default, 429 with retry-after-ms for rate-limit tests).
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+DEFAULT_LATENCY = 0.25  # seconds per completion
+TOKEN_INTERVAL = 0.02  # seconds between streamed tokens
+
+REPLIES = {
+    "guard": "safe",
+    "scout": "The person is looking down at a phone instead of the screen.",
+}
+DEFAULT_REPLY = "Bro you gotta lock in fr, that phone ain't paying your bills"
+# Vision requests in fused mode (JSON mode, or the JSON instructions when streamed)
+FUSED_REPLY = ('{"is_focused": false, "activity": "The person is looking down at a phone", '
+               '"tease": "Bro you gotta lock in fr, that phone ain\'t paying your bills"}')
+
+
+def image_count(body: dict) -> int:
+    return sum(
+        1
+        for message in body.get("messages", []) if isinstance(message.get("content"), list)
+        for part in message["content"] if part.get("type") == "image_url"
+    )
+
+
+def batch_reply(count: int) -> str:
+    """Multi-image vision reply: one description per image."""
+    return json.dumps({"descriptions": [f"Image {i}: {REPLIES['scout']}" for i in range(1, count + 1)]})
+
+
+def wants_json(body: dict) -> bool:
+    if body.get("response_format", {}).get("type") == "json_object":
+        return True
+    system = next((m.get("content") for m in body.get("messages", []) if m.get("role") == "system"), "")
+    return isinstance(system, str) and "JSON object" in system
+
+
+# =============================================================================
+# App
+# =============================================================================
+
+def create_app(latency: float = DEFAULT_LATENCY, latency_by_model: dict = None, jitter: float = 0.0,
+               error_rate: float = 0.0, error_status: int = 500, seed: int = None,
+               image_latency: float = 0.0, concurrency: int = None) -> FastAPI:
+    """Build a fake Groq API with a configurable per-request latency.
+    
+    latency_by_model maps a model-name substring (e.g. "guard") to its own latency.
+    jitter adds up to that fraction of the latency at random (0.5 = +0-50%).
+    error_rate is the share of requests answered with error_status instead.
+    image_latency is added for every image after the first in a request.
+    concurrency caps requests in flight (a stand-in for provider rate limits); others queue.
+    """
+    app = FastAPI(title="Mock Groq")
+    slots = asyncio.Semaphore(concurrency) if concurrency else None
+    app.state.latency = latency
+    app.state.latency_by_model = latency_by_model or {}
+    app.state.jitter = jitter
+    app.state.error_rate = error_rate
+    app.state.error_status = error_status
+    app.state.requests = 0
+    app.state.errors = 0
+    rng = random.Random(seed)
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+
+        model = body.get("model", "")
+        delay = next(
+            (v for k, v in app.state.latency_by_model.items() if k in model),
+            app.state.latency,
+        )
+        images = image_count(body)
+        delay = delay * (1 + rng.random() * app.state.jitter) + image_latency * max(0, images - 1)
+        if slots is not None:
+            async with slots:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+
+        if rng.random() < app.state.error_rate:
+            app.state.errors += 1
+            return error_response(app.state.error_status)
+
+        content = next((v for k, v in REPLIES.items() if k in model), DEFAULT_REPLY)
+        if "scout" in model and wants_json(body):
+            content = batch_reply(images) if images > 1 else FUSED_REPLY
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(model, content), media_type="text/event-stream")
+        return completion_payload(model, content)
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return {"requests": app.state.requests, "errors": app.state.errors}
+
+    return app
+
+
+def error_response(status: int) -> JSONResponse:
+    """Groq-style error body; 429s carry the headers a real rate limit would."""
+    headers = {"retry-after-ms": "50", "x-should-retry": "true"} if status == 429 else {}
+    return JSONResponse(
+        {"error": {"message": "injected failure", "type": "server_error", "code": status}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def completion_payload(model: str, content: str) -> dict:
+    """OpenAI-compatible chat completion body."""
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+async def stream_chunks(model: str, content: str):
+    """Server-sent events in the chat.completion.chunk format, one word per chunk.
+
+    The request latency covers time-to-first-token; later tokens follow every TOKEN_INTERVAL.
+    """
+    words = content.split(" ")
+    for index, word in enumerate(words):
+        if index:
+            await asyncio.sleep(TOKEN_INTERVAL)
+        delta = word if index == 0 else " " + word
+        chunk = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+# =============================================================================
+# Runner
+# =============================================================================
+
+class MockGroqServer:
+    """Runs the mock API on a background thread."""
+
+    def __init__(self, port: int, latency: float = DEFAULT_LATENCY, latency_by_model: dict = None, **options):
+        self.app = create_app(latency, latency_by_model, **options)
+        self.port = port
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock Groq API")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra latency, fraction of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, jitter=args.jitter, error_rate=args.error_rate, error_status=args.error_status)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -9,22 +9,17 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
 
 
 def main():
-    import uvicorn
-    from focus_guard.server import app
+    from focus_guard.runner import WORKERS, serve
     
     # Use PORT env var for Replit, default 5000
     port = int(os.environ.get("PORT", 5000))
     
     print("🚀 Starting FocusGuard AI...")
     print(f"🌐 Open http://localhost:{port} in your browser")
+    if WORKERS > 1:
+        print(f"👥 {WORKERS} workers")
     
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=port,
-        reload=False,
-        log_level="info"
-    )
+    serve(host="0.0.0.0", port=port, workers=WORKERS, log_level="info")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+"""
+FocusGuard AI - Static Assets
+Production static pipeline: content-hashed URLs, immutable caching, ETag/304
+revalidation, and gzip/brotli variants compressed once at startup.
+
+    dev    every response is no-cache (edit a file, reload, see it)
+    prod   /static/css/app.3f9a1c0b2d4e.css is cached for a year; pages and
+           unhashed URLs revalidate with If-None-Match and get 304s
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import get_route_path
+from starlette.staticfiles import StaticFiles
+
+# Optional: brotli for .br variants (gzip only without it)
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+STATIC_MODE = os.getenv("FOCUS_STATIC_MODE", "dev")
+
+# Hashed URLs never change content, so caches may keep them for a year
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Pages and unhashed URLs: cache, but check the ETag on every use
+REVALIDATE_CACHE = "no-cache"
+NO_CACHE = "no-cache, no-store, must-revalidate"
+
+HASH_LENGTH = 12
+# Only worth compressing text; variants that don't save at least this fraction are dropped
+COMPRESSIBLE = {".css", ".js", ".html", ".svg", ".json", ".txt", ".map"}
+MIN_SAVING = 0.1
+
+# Text assets whose /static/... references get rewritten to hashed URLs
+REWRITTEN = {".css", ".js", ".html"}
+STATIC_URL = re.compile(r"/static/([A-Za-z0-9_\-./]+\.[A-Za-z0-9]+)")
+
+# Preferred first
+ENCODINGS = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """css/app.css -> css/app.<digest>.css"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def accepted_encodings(header: str) -> set:
+    """Encodings the client accepts (q=0 excluded)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
+
+
+# =============================================================================
+# Assets
+# =============================================================================
+
+class Asset:
+    """One file held in memory with its precompressed variants."""
+
+    def __init__(self, path: str, body: bytes):
+        self.path = path
+        self.body = body
+        self.digest = content_hash(body)
+        self.etag = f'"{self.digest}"'
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/") or self.media_type == "application/javascript":
+            self.media_type += "; charset=utf-8"
+        self.variants = {}  # encoding -> compressed body
+
+    def compress(self):
+        if os.path.splitext(self.path)[1] not in COMPRESSIBLE:
+            return
+        candidates = {"gzip": gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if BROTLI_AVAILABLE:
+            candidates["br"] = brotli.compress(self.body, quality=11)
+        for encoding, data in candidates.items():
+            if len(data) <= len(self.body) * (1 - MIN_SAVING):
+                self.variants[encoding] = data
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        """Full response, the best precompressed variant, or a 304."""
+        headers = {"ETag": self.etag, "Cache-Control": cache_control}
+        if self.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+
+        body = self.body
+        accepted = accepted_encodings(request.headers.get("accept-encoding"))
+        for encoding in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                body = self.variants[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+class AssetManifest:
+    """Every file under the static directory, hashed, rewritten and compressed.
+
+    Built once (at startup, or on first request); files added later, such as
+    meme uploads, are served from disk instead.
+    """
+
+    def __init__(self, static_dir: str):
+        self.static_dir = static_dir
+        self.assets = {}  # relative path -> Asset
+        self.hashed = {}  # hashed relative path -> Asset
+        self.built = False
+        self._lock = threading.Lock()
+
+    def build(self) -> "AssetManifest":
+        with self._lock:
+            if self.built:
+                return self
+            files = {}
+            for root, _, names in os.walk(self.static_dir):
+                for name in names:
+                    full = os.path.join(root, name)
+                    rel = os.path.relpath(full, self.static_dir).replace(os.sep, "/")
+                    with open(full, "rb") as f:
+                        files[rel] = f.read()
+
+            # Leaves first (images, media), then text that may reference them
+            for rel, body in files.items():
+                if os.path.splitext(rel)[1] not in REWRITTEN:
+                    self._add(rel, body)
+            for ext in (".css", ".js", ".html"):
+                for rel, body in files.items():
+                    if os.path.splitext(rel)[1] == ext:
+                        self._add(rel, self.rewrite(body))
+            self.built = True
+            return self
+
+    def _add(self, rel: str, body: bytes):
+        asset = Asset(rel, body)
+        asset.compress()
+        self.assets[rel] = asset
+        self.hashed[hashed_name(rel, asset.digest)] = asset
+
+    def rewrite(self, body: bytes) -> bytes:
+        """Point /static/... references at the hashed URLs of assets already built."""
+        text = body.decode("utf-8")
+
+        def replace(match):
+            asset = self.assets.get(match.group(1))
+            return self.url(match.group(1)) if asset else match.group(0)
+
+        return STATIC_URL.sub(replace, text).encode("utf-8")
+
+    def url(self, rel: str) -> str:
+        asset = self.assets.get(rel)
+        return f"/static/{hashed_name(rel, asset.digest)}" if asset else f"/static/{rel}"
+
+    def lookup(self, rel: str):
+        """(asset, is_hashed_url) for a path under /static, or (None, False)."""
+        self.build()
+        if rel in self.hashed:
+            return self.hashed[rel], True
+        return self.assets.get(rel), False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "assets": len(self.assets),
+            "bytes": sum(len(asset.body) for asset in self.assets.values()),
+            "compressed": {encoding: sum(encoding in asset.variants for asset in self.assets.values())
+                           for encoding in ENCODINGS},
+        }
+
+
+# =============================================================================
+# Handlers
+# =============================================================================
+
+class NoCacheStaticFiles(StaticFiles):
+    """Static file handler with cache disabled (dev mode)."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = NO_CACHE
+        return response
+
+
+class ProductionStaticFiles:
+    """ASGI app for /static in prod mode, backed by an AssetManifest."""
+
+    def __init__(self, manifest: AssetManifest):
+        self.manifest = manifest
+        # Files that appeared after startup (uploads); Starlette handles their ETag/304
+        self.fallback = StaticFiles(directory=manifest.static_dir)
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if request.method in ("GET", "HEAD"):
+            asset, hashed = self.manifest.lookup(get_route_path(scope).lstrip("/"))
+            if asset is not None:
+                response = asset.response(request, IMMUTABLE_CACHE if hashed else REVALIDATE_CACHE)
+                await response(scope, receive, send)
+                return
+        await self.fallback(scope, receive, send)
@@ -1,4 +1,11 @@
 # FocusGuard AI Engine
-from .groq_agent import GroqAgent
+# Submodules load on demand: importing one piece (e.g. engine.protocol) doesn't pull in the Groq SDK.
 
 __all__ = ["GroqAgent"]
+
+
+def __getattr__(name):
+    if name == "GroqAgent":
+        from .groq_agent import GroqAgent
+        return GroqAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,100 @@
+"""
+FocusGuard AI - Adaptive Capture Control
+Recommends how often, how large and at what JPEG quality each browser should
+capture frames, from server load (messages queued for the Groq budget and
+engine workers), recent vision latency and how stable the session's activity is.
+
+The server pushes a recommendation to a socket only when its level changes:
+``{"type": "control", "capture": {"level", "interval_ms", "max_side", "quality"}}``.
+Level 0 is the app's own defaults, so an idle server sends nothing.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+CAPTURE_CONTROL_ENABLED = os.getenv("FOCUS_CAPTURE_CONTROL", "1") != "0"
+# How often load is re-evaluated for every open socket (seconds)
+CAPTURE_UPDATE_INTERVAL = float(os.getenv("FOCUS_CAPTURE_UPDATE", "2.0"))
+# One level of back-off per this many queued messages / seconds of vision latency
+CAPTURE_QUEUE_HIGH = int(os.getenv("FOCUS_CAPTURE_QUEUE_HIGH", "8"))
+CAPTURE_LATENCY_HIGH = float(os.getenv("FOCUS_CAPTURE_LATENCY_HIGH", "2.0"))
+
+# interval_ms: minimum gap between frames (0 = the app's roast cooldown only)
+# max_side: longest side of the uploaded frame in px (0 = camera resolution)
+CAPTURE_LEVELS = [
+    {"interval_ms": 0, "max_side": 0, "quality": 0.7},
+    {"interval_ms": 20000, "max_side": 512, "quality": 0.6},
+    {"interval_ms": 40000, "max_side": 384, "quality": 0.5},
+    {"interval_ms": 60000, "max_side": 320, "quality": 0.4},
+]
+
+# Load must fall this far below a level before stepping back down (no flapping)
+HYSTERESIS = 0.25
+# Weight of the newest latency sample in the moving average
+LATENCY_SMOOTHING = 0.3
+
+
+def capture_settings(level: int, levels: List[Dict[str, Any]] = CAPTURE_LEVELS) -> Dict[str, Any]:
+    """Capture settings for a level, as sent to the app."""
+    return dict(levels[level], level=level)
+
+
+# =============================================================================
+# Controller
+# =============================================================================
+
+class CaptureController:
+    """Maps server load and session stability to a capture level."""
+
+    def __init__(self, queue_high: int = CAPTURE_QUEUE_HIGH, latency_high: float = CAPTURE_LATENCY_HIGH,
+                 levels: List[Dict[str, Any]] = CAPTURE_LEVELS):
+        self.queue_high = max(queue_high, 1)
+        self.latency_high = latency_high
+        self.levels = levels
+        self.latency = None  # smoothed vision latency (s)
+        self.queue_depth = 0
+        self.counters = {"updates": 0, "backoffs": 0, "recoveries": 0}
+
+    def observe_latency(self, seconds: float):
+        """Feed one vision (or fused) call's latency."""
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def observe_result(self, result: Dict[str, Any]):
+        """Pick the model latency out of a pipeline result's timings."""
+        timings = result.get("timings") if isinstance(result, dict) else None
+        if not timings:
+            return
+        ms = timings.get("vision_ms", timings.get("fused_ms"))
+        if ms is not None:
+            self.observe_latency(ms / 1000)
+
+    def load(self, queue_depth: Optional[int] = None) -> float:
+        """0 when idle; each whole unit is one level of back-off."""
+        if queue_depth is not None:
+            self.queue_depth = queue_depth
+        latency_load = (self.latency or 0.0) / self.latency_high if self.latency_high > 0 else 0.0
+        return max(self.queue_depth / self.queue_high, latency_load)
+
+    def recommend(self, current: int, stable: bool = False, load: Optional[float] = None) -> int:
+        """Level for a session now at ``current``; stable sessions back off one more level."""
+        load = self.load() if load is None else load
+        target = int(load) + (1 if stable else 0)
+        if target < current and load + (1 if stable else 0) > current - HYSTERESIS:
+            target = current
+        target = min(target, len(self.levels) - 1)
+        if target != current:
+            self.counters["updates"] += 1
+            self.counters["backoffs" if target > current else "recoveries"] += 1
+        return target
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, load=round(self.load(), 2), queue_depth=self.queue_depth,
+                    latency_ms=round(self.latency * 1000, 1) if self.latency is not None else None)
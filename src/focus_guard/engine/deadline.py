@@ -0,0 +1,107 @@
+"""
+FocusGuard AI - Event Deadlines
+One time budget per distraction event, split into per-stage sub-budgets.
+
+When a stage runs out of time the pipeline degrades instead of waiting:
+
+    full       Vision -> Reasoning -> Safety, all on time
+    text_only  vision too slow: roast from text alone (the client's reason or a generic prompt)
+    pool       a pre-approved roast from the roast pool (no Reasoning/Safety calls)
+    static     nothing else fit in the budget: the built-in fallback line
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Whole event, from message taken off the socket to roast sent
+EVENT_BUDGET = float(os.getenv("FOCUS_EVENT_BUDGET", "4.0"))
+
+# Upper bound per stage (each is also capped by what's left of the event budget)
+STAGE_BUDGETS = {
+    "vision": float(os.getenv("FOCUS_VISION_BUDGET", "2.0")),
+    "reasoning": float(os.getenv("FOCUS_REASONING_BUDGET", "1.5")),
+    "safety": float(os.getenv("FOCUS_SAFETY_BUDGET", "1.0")),
+    # Fused mode's single vision+roast call
+    "fused": float(os.getenv("FOCUS_FUSED_BUDGET", "2.5")),
+}
+
+# Below this a stage isn't worth starting; the next tier takes over
+MIN_STAGE_BUDGET = float(os.getenv("FOCUS_MIN_STAGE_BUDGET", "0.2"))
+
+TIER_FULL = "full"
+TIER_TEXT_ONLY = "text_only"
+TIER_POOL = "pool"
+TIER_STATIC = "static"
+
+
+# =============================================================================
+# Deadline
+# =============================================================================
+
+class Deadline:
+    """Absolute deadline for one event plus the stages that ran out of time."""
+
+    def __init__(self, budget: float = EVENT_BUDGET, stage_budgets: Dict[str, float] = None,
+                 min_stage: float = MIN_STAGE_BUDGET):
+        self.budget = budget
+        self.stage_budgets = stage_budgets or STAGE_BUDGETS
+        self.min_stage = min_stage
+        self.started = time.monotonic()
+        self.expires = self.started + budget
+        self.missed = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeout(self, stage: str) -> Optional[float]:
+        """Seconds the stage may take, or None if it shouldn't start at all."""
+        allowed = min(self.stage_budgets.get(stage, self.budget), self.remaining())
+        if allowed < self.min_stage:
+            self.miss(stage)
+            return None
+        return allowed
+
+    def miss(self, stage: str):
+        """Record that a stage was skipped or cut short."""
+        if stage not in self.missed:
+            self.missed.append(stage)
+
+    def describe(self) -> Dict[str, object]:
+        """Budget summary attached to each result."""
+        return {
+            "budget_ms": round(self.budget * 1000),
+            "remaining_ms": round(self.remaining() * 1000, 1),
+            "missed": list(self.missed),
+        }
+
+
+# =============================================================================
+# Thread Scope
+# =============================================================================
+
+_local = threading.local()
+
+
+@contextmanager
+def deadline_scope(expires: Optional[float]):
+    """Retries made by this thread inside the block must finish before ``expires`` (time.monotonic)."""
+    previous = getattr(_local, "expires", None)
+    _local.expires = expires
+    try:
+        yield
+    finally:
+        _local.expires = previous
+
+
+def time_left() -> float:
+    """Seconds until the current thread's deadline (inf when there is none)."""
+    expires = getattr(_local, "expires", None)
+    return float("inf") if expires is None else expires - time.monotonic()
@@ -0,0 +1,429 @@
+"""
+FocusGuard AI - Event Store
+Append-only log of focus events per user (session start/end, distractions,
+recoveries), fed by /ws/focus and queried as pre-aggregated dashboard stats.
+
+Writes are queued and committed in batches by one background thread to a
+WAL-mode SQLite file, so the event loop never waits on disk. Each batch also
+updates per-user hourly and daily rollups in the same transaction, so a query
+over any range reads O(buckets) rows instead of every event.
+"""
+
+import json
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .roast_pool import classify_activity
+from .safety import DATA_DIR
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+EVENTS_ENABLED = os.getenv("FOCUS_EVENTS", "1") != "0"
+EVENTS_PATH = os.getenv("FOCUS_EVENTS_PATH", os.path.join(DATA_DIR, "events.db"))
+# Rows per transaction, and the longest a queued event waits for its batch
+EVENTS_BATCH = int(os.getenv("FOCUS_EVENTS_BATCH", "200"))
+EVENTS_FLUSH_INTERVAL = float(os.getenv("FOCUS_EVENTS_FLUSH_INTERVAL", "1.0"))
+
+SESSION_START = "session_start"
+SESSION_END = "session_end"
+DISTRACTION = "distraction"
+RECOVERED = "recovered"
+KINDS = (SESSION_START, SESSION_END, DISTRACTION, RECOVERED)
+
+HOUR = 3600
+DAY = 86400
+BUCKETS = {"hour": HOUR, "day": DAY}
+MAX_PAGE = 500
+
+# Rollup columns, in order: sessions, session seconds, distracted seconds, distractions, roasts
+TOTALS = ("sessions", "session_seconds", "distracted_seconds", "distractions", "roasts")
+
+ANONYMOUS = "anonymous"
+_USER_ID = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+
+
+def clean_user(user: Optional[str]) -> str:
+    """Client-supplied user id, or "anonymous" if it isn't a short token."""
+    return user if user and _USER_ID.match(user) else ANONYMOUS
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    activity TEXT,
+    seconds REAL NOT NULL DEFAULT 0,
+    roasted INTEGER NOT NULL DEFAULT 0,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_user_ts ON events (user, ts);
+CREATE INDEX IF NOT EXISTS events_user_kind_ts ON events (user, kind, ts);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    user TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    session_seconds REAL NOT NULL DEFAULT 0,
+    distracted_seconds REAL NOT NULL DEFAULT 0,
+    distractions INTEGER NOT NULL DEFAULT 0,
+    roasts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, size, start)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_activities (
+    user TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, size, start, activity)
+) WITHOUT ROWID;
+"""
+
+# Totals straight from the log, for the partial hours at the edges of a range
+SCAN_TOTALS = (
+    "SELECT "
+    "COALESCE(SUM(CASE WHEN kind = 'session_end' THEN 1 END), 0), "
+    "COALESCE(SUM(CASE WHEN kind = 'session_end' THEN seconds END), 0), "
+    "COALESCE(SUM(CASE WHEN kind = 'recovered' THEN seconds END), 0), "
+    "COALESCE(SUM(CASE WHEN kind = 'distraction' THEN 1 END), 0), "
+    "COALESCE(SUM(roasted), 0) "
+    "FROM events WHERE user = ? AND ts >= ? AND ts < ?"
+)
+SCAN_ACTIVITIES = (
+    "SELECT activity, COUNT(*) FROM events "
+    "WHERE user = ? AND kind = 'distraction' AND ts >= ? AND ts < ? GROUP BY activity"
+)
+ROLLUP_TOTALS = (
+    "SELECT COALESCE(SUM(sessions), 0), COALESCE(SUM(session_seconds), 0), "
+    "COALESCE(SUM(distracted_seconds), 0), COALESCE(SUM(distractions), 0), COALESCE(SUM(roasts), 0) "
+    "FROM rollups WHERE user = ? AND size = ? AND start >= ? AND start < ?"
+)
+ROLLUP_ACTIVITIES = (
+    "SELECT activity, SUM(count) FROM rollup_activities "
+    "WHERE user = ? AND size = ? AND start >= ? AND start < ? GROUP BY activity"
+)
+
+
+# =============================================================================
+# Rollups
+# =============================================================================
+
+def bucket_start(ts: float, size: int) -> int:
+    return int(ts // size) * size
+
+
+def accumulate(rows: List[tuple]):
+    """Hourly and daily deltas for a batch of event rows.
+
+    Returns ({(user, size, start): [totals...]}, {(user, size, start, activity): count}).
+    """
+    totals, activities = {}, {}
+    for user, ts, kind, activity, seconds, roasted, _ in rows:
+        for size in (HOUR, DAY):
+            key = (user, size, bucket_start(ts, size))
+            bucket = totals.get(key)
+            if bucket is None:
+                bucket = totals[key] = [0, 0.0, 0.0, 0, 0]
+            if kind == SESSION_END:
+                bucket[0] += 1
+                bucket[1] += seconds
+            elif kind == RECOVERED:
+                bucket[2] += seconds
+            elif kind == DISTRACTION:
+                bucket[3] += 1
+                activity_key = key + (activity or "other",)
+                activities[activity_key] = activities.get(activity_key, 0) + 1
+            bucket[4] += roasted
+    return totals, activities
+
+
+def apply_rollups(db: sqlite3.Connection, rows: List[tuple]):
+    """Add a batch to the rollup tables (call inside the batch's transaction)."""
+    totals, activities = accumulate(rows)
+    db.executemany(
+        "INSERT INTO rollups (user, size, start, sessions, session_seconds, distracted_seconds, "
+        "distractions, roasts) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (user, size, start) DO UPDATE SET "
+        "sessions = sessions + excluded.sessions, "
+        "session_seconds = session_seconds + excluded.session_seconds, "
+        "distracted_seconds = distracted_seconds + excluded.distracted_seconds, "
+        "distractions = distractions + excluded.distractions, "
+        "roasts = roasts + excluded.roasts",
+        [key + tuple(values) for key, values in totals.items()],
+    )
+    db.executemany(
+        "INSERT INTO rollup_activities (user, size, start, activity, count) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (user, size, start, activity) DO UPDATE SET count = count + excluded.count",
+        [key + (count,) for key, count in activities.items()],
+    )
+
+
+def split_range(start: float, end: float) -> List[tuple]:
+    """Cover [start, end) with (size, lo, hi) parts: whole days, whole hours, and raw edges (size None)."""
+    first_hour, last_hour = math.ceil(start / HOUR) * HOUR, bucket_start(end, HOUR)
+    if first_hour >= last_hour:
+        return [(None, start, end)]
+    parts = [(None, start, first_hour)] if start < first_hour else []
+    first_day, last_day = math.ceil(start / DAY) * DAY, bucket_start(end, DAY)
+    if first_day < last_day:
+        if first_hour < first_day:
+            parts.append((HOUR, first_hour, first_day))
+        parts.append((DAY, first_day, last_day))
+        if last_day < last_hour:
+            parts.append((HOUR, last_day, last_hour))
+    else:
+        parts.append((HOUR, first_hour, last_hour))
+    if last_hour < end:
+        parts.append((None, last_hour, end))
+    return parts
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class EventStore:
+    """Batched, append-only event log with aggregate queries."""
+
+    def __init__(self, path: str = None, batch_size: int = EVENTS_BATCH,
+                 flush_interval: float = EVENTS_FLUSH_INTERVAL):
+        self.path = path or EVENTS_PATH
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()  # one connection: writer thread and queries take turns
+        self._queue = queue.Queue()
+        self._writer = None
+        self._closed = False
+        self.counters = {"appended": 0, "written": 0, "batches": 0, "errors": 0}
+
+        # Log written before rollups existed: build them once
+        has_events = self._db.execute("SELECT EXISTS (SELECT 1 FROM events)").fetchone()[0]
+        has_rollups = self._db.execute("SELECT EXISTS (SELECT 1 FROM rollups)").fetchone()[0]
+        if has_events and not has_rollups:
+            self.rebuild_rollups()
+
+    # -------------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------------
+
+    def append(self, user: str, kind: str, ts: float = None, activity: str = None,
+               seconds: float = 0.0, roasted: bool = False, data: Dict[str, Any] = None):
+        """Queue one event; it is written with the next batch."""
+        if self._closed:
+            return
+        row = (clean_user(user), ts if ts is not None else time.time(), kind, activity,
+               float(seconds or 0.0), int(bool(roasted)), json.dumps(data) if data else None)
+        self.counters["appended"] += 1
+        self._queue.put(row)
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run, daemon=True, name="focus-events")
+                    self._writer.start()
+
+    def record_result(self, user: str, result: Dict[str, Any], reason: str = None):
+        """Log a pipeline result sent to the client as a distraction event."""
+        if not isinstance(result, dict) or result.get("error") or result.get("is_focused"):
+            return
+        description = result.get("activity") or reason or ""
+        self.append(
+            user, DISTRACTION,
+            activity=classify_activity(description),
+            roasted=bool(result.get("tease")),
+            data={"description": description[:200], "tier": result.get("tier"), "source": result.get("source")},
+        )
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            if batch[0] is None:
+                self._queue.task_done()
+                return
+            # Gather whatever else arrives within the flush interval, up to a full batch
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(row)
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, rows: List[tuple]):
+        try:
+            with self._lock, self._db:
+                self._db.executemany(
+                    "INSERT INTO events (user, ts, kind, activity, seconds, roasted, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                apply_rollups(self._db, rows)
+            self.counters["written"] += len(rows)
+            self.counters["batches"] += 1
+        except sqlite3.Error as e:
+            self.counters["errors"] += 1
+            print(f"Warning: Could not write {len(rows)} focus events: {e}")
+
+    def flush(self):
+        """Block until everything queued so far is written."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def delete_user(self, user: str) -> int:
+        """Erase a user's events and rollups (queued events first); returns the events removed."""
+        user = clean_user(user)
+        self.flush()
+        with self._lock, self._db:
+            deleted = self._db.execute("DELETE FROM events WHERE user = ?", (user,)).rowcount
+            self._db.execute("DELETE FROM rollups WHERE user = ?", (user,))
+            self._db.execute("DELETE FROM rollup_activities WHERE user = ?", (user,))
+        return deleted
+
+    def rebuild_rollups(self, chunk: int = 50000):
+        """Recompute every rollup from the log."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM rollups")
+            self._db.execute("DELETE FROM rollup_activities")
+            cursor = self._db.execute(
+                "SELECT user, ts, kind, activity, seconds, roasted, NULL FROM events ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                apply_rollups(self._db, rows)
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def summary(self, user: str, start: float = 0, end: float = None) -> Dict[str, Any]:
+        """Totals for a time range: focus ratio, distractions per hour, roasts."""
+        end = end if end is not None else time.time()
+        user = clean_user(user)
+        totals = [0, 0.0, 0.0, 0, 0]
+        with self._lock:
+            for size, lo, hi in split_range(start, end):
+                if size is None:
+                    row = self._db.execute(SCAN_TOTALS, (user, lo, hi)).fetchone()
+                else:
+                    row = self._db.execute(ROLLUP_TOTALS, (user, size, lo, hi)).fetchone()
+                totals = [total + value for total, value in zip(totals, row)]
+        return summarize(*totals)
+
+    def top_activities(self, user: str, start: float = 0, end: float = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Most frequent distraction classes in a time range."""
+        end = end if end is not None else time.time()
+        user = clean_user(user)
+        counts = {}
+        with self._lock:
+            for size, lo, hi in split_range(start, end):
+                if size is None:
+                    rows = self._db.execute(SCAN_ACTIVITIES, (user, lo, hi)).fetchall()
+                else:
+                    rows = self._db.execute(ROLLUP_ACTIVITIES, (user, size, lo, hi)).fetchall()
+                for activity, count in rows:
+                    counts[activity] = counts.get(activity, 0) + count
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"activity": activity, "count": count} for activity, count in ranked]
+
+    def scan_summary(self, user: str, start: float = 0, end: float = None) -> Dict[str, Any]:
+        """summary() computed from every event in the range (reference for tests and benchmarks)."""
+        end = end if end is not None else time.time()
+        with self._lock:
+            row = self._db.execute(SCAN_TOTALS, (clean_user(user), start, end)).fetchone()
+        return summarize(*row)
+
+    def timeline(self, user: str, bucket: str = "hour", start: float = 0, end: float = None,
+                 limit: int = 48, offset: int = 0) -> Dict[str, Any]:
+        """One row per hour/day with activity, newest first, paginated."""
+        size = BUCKETS[bucket]
+        end = end if end is not None else time.time()
+        limit = max(1, min(limit, MAX_PAGE))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT start, " + ", ".join(TOTALS) + " FROM rollups "
+                "WHERE user = ? AND size = ? AND start >= ? AND start < ? "
+                "ORDER BY start DESC LIMIT ? OFFSET ?",
+                (clean_user(user), size, bucket_start(start, size), end, limit + 1, offset),
+            ).fetchall()
+        items = [dict(summarize(*row[1:]), start=row[0]) for row in rows[:limit]]
+        return page(items, limit, offset, more=len(rows) > limit)
+
+    def distractions(self, user: str, limit: int = 50, before_id: int = None) -> Dict[str, Any]:
+        """Recent distraction log, newest first; pass the returned cursor to get the next page."""
+        limit = max(1, min(limit, MAX_PAGE))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, ts, activity, roasted, data FROM events "
+                "WHERE user = ? AND kind = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (clean_user(user), DISTRACTION, before_id or 2 ** 62, limit + 1),
+            ).fetchall()
+        items = [
+            dict(json.loads(data) if data else {}, id=row_id, ts=ts, activity=activity, roasted=bool(roasted))
+            for row_id, ts, activity, roasted, data in rows[:limit]
+        ]
+        cursor = items[-1]["id"] if len(rows) > limit else None
+        return {"items": items, "limit": limit, "next_cursor": cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, queued=self._queue.qsize(), path=self.path)
+
+    def close(self):
+        """Write what's queued and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        with self._lock:
+            self._db.close()
+
+
+def summarize(sessions: int, session_seconds: float, distracted_seconds: float,
+              distractions: int, roasts: int) -> Dict[str, Any]:
+    """Dashboard numbers from raw totals."""
+    distracted_seconds = min(distracted_seconds, session_seconds)
+    hours = session_seconds / 3600
+    return {
+        "sessions": sessions,
+        "session_seconds": round(session_seconds, 1),
+        "focused_seconds": round(session_seconds - distracted_seconds, 1),
+        "focus_ratio": round(1 - distracted_seconds / session_seconds, 3) if session_seconds else None,
+        "distractions": distractions,
+        "distractions_per_hour": round(distractions / hours, 2) if hours else None,
+        "roasts": roasts,
+    }
+
+
+def page(items: list, limit: int, offset: int, more: bool) -> Dict[str, Any]:
+    return {"items": items, "limit": limit, "offset": offset,
+            "next_offset": offset + limit if more else None}
@@ -0,0 +1,75 @@
+"""
+FocusGuard AI - Engine Executor
+Bounded thread pool that runs blocking Groq calls off the event loop.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Worker threads shared by every socket. 0 runs calls inline (legacy, blocking).
+ENGINE_WORKERS = int(os.getenv("FOCUS_ENGINE_WORKERS", "16"))
+
+
+# =============================================================================
+# Executor
+# =============================================================================
+
+class EngineExecutor:
+    """Offloads synchronous agent calls to a bounded worker pool."""
+
+    def __init__(self, max_workers: int = ENGINE_WORKERS):
+        self.max_workers = max_workers
+        self._pool = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="focus-engine")
+            if max_workers > 0 else None
+        )
+        # Created lazily (per loop) so the executor can be built at import time
+        self._slots = None
+        self._slots_loop = None
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable without stalling the event loop."""
+        if self._pool is None:
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_workers)
+            self._slots_loop = loop
+
+        # Wait in asyncio rather than in the pool's unbounded queue
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        """Current pool occupancy."""
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,171 @@
+"""
+FocusGuard AI - Frame Cache
+Perceptual-hash cache so near-identical webcam frames reuse the last vision description.
+"""
+
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from importlib.util import find_spec
+from typing import Any, Dict, Optional, Tuple
+
+from .protocol import FrameData, frame_bytes
+
+# Optional: Pillow for JPEG decoding, imported on first frame (cache is disabled without it)
+PIL_AVAILABLE = find_spec("PIL") is not None
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+FRAME_CACHE_ENABLED = os.getenv("FOCUS_FRAME_CACHE", "1") != "0"
+FRAME_CACHE_SIZE = int(os.getenv("FOCUS_FRAME_CACHE_SIZE", "256"))
+FRAME_CACHE_TTL = float(os.getenv("FOCUS_FRAME_CACHE_TTL", "30"))
+# Max differing bits (out of 64) for two frames to count as the same scene
+FRAME_CACHE_THRESHOLD = int(os.getenv("FOCUS_FRAME_CACHE_THRESHOLD", "6"))
+FRAME_HASH = os.getenv("FOCUS_FRAME_HASH", "dhash")
+
+HASH_SIZE = 8
+
+
+# =============================================================================
+# Perceptual Hashing
+# =============================================================================
+
+def _grayscale(image_bytes: bytes, size: tuple) -> Optional[list]:
+    """Decode a frame and return its downscaled grayscale pixels."""
+    try:
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(image_bytes))
+        # Let the JPEG decoder scale down during decode (much cheaper than a full decode)
+        img.draft("L", (size[0] * 8, size[1] * 8))
+        img = img.convert("L").resize(size, Image.BILINEAR)
+        return list(img.tobytes())
+    except Exception:
+        return None
+
+
+def ahash(image_bytes: bytes) -> Optional[int]:
+    """Average hash: one bit per pixel, set when brighter than the mean."""
+    pixels = _grayscale(image_bytes, (HASH_SIZE, HASH_SIZE))
+    if pixels is None:
+        return None
+    mean = sum(pixels) / len(pixels)
+    value = 0
+    for pixel in pixels:
+        value = (value << 1) | (pixel > mean)
+    return value
+
+
+def dhash(image_bytes: bytes) -> Optional[int]:
+    """Difference hash: one bit per pixel, set when brighter than its right neighbour."""
+    width = HASH_SIZE + 1
+    pixels = _grayscale(image_bytes, (width, HASH_SIZE))
+    if pixels is None:
+        return None
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * width + col]
+            value = (value << 1) | (left > pixels[row * width + col + 1])
+    return value
+
+
+HASHERS = {"ahash": ahash, "dhash": dhash}
+
+# (scope, perceptual hash): frames only match frames from the same user
+FrameKey = Tuple[Optional[str], int]
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class FrameCache:
+    """LRU + TTL cache of vision descriptions keyed by scope (user) and perceptual hash.
+
+    Fused mode also stores the model's focus verdict; plain vision calls leave it None.
+    """
+
+    def __init__(self, max_entries: int = FRAME_CACHE_SIZE, ttl: float = FRAME_CACHE_TTL,
+                 threshold: int = FRAME_CACHE_THRESHOLD, hash_kind: str = FRAME_HASH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hasher = HASHERS[hash_kind]
+        self.enabled = PIL_AVAILABLE
+        self._entries = OrderedDict()  # (scope, hash) -> (description, stored_at, focused)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, image: FrameData, scope: Optional[str] = None) -> Optional[FrameKey]:
+        """Cache key for a JPEG frame seen by ``scope``, or None if it can't be decoded."""
+        if not self.enabled:
+            return None
+        image_bytes = frame_bytes(image)
+        value = self.hasher(image_bytes) if image_bytes else None
+        return (scope, value) if value is not None else None
+
+    def get(self, key: Optional[FrameKey]) -> Optional[str]:
+        """Return the description of the closest fresh frame within the threshold."""
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def lookup(self, key: Optional[FrameKey]) -> Optional[Tuple[str, Optional[bool]]]:
+        """(description, focused) of the closest fresh frame from the same scope within the threshold."""
+        if key is None:
+            return None
+
+        scope, value = key
+        now = time.monotonic()
+        with self._lock:
+            best, best_distance = None, self.threshold + 1
+            for cached_key, (_, stored_at, _) in list(self._entries.items()):
+                if now - stored_at > self.ttl:
+                    del self._entries[cached_key]
+                    continue
+                if cached_key[0] != scope:
+                    continue
+                distance = hamming(value, cached_key[1])
+                if distance < best_distance:
+                    best, best_distance = cached_key, distance
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best)
+            description, _, focused = self._entries[best]
+            return description, focused
+
+    def put(self, key: Optional[FrameKey], description: str, focused: Optional[bool] = None):
+        """Remember a vision description (and the focus verdict, when known) for this frame."""
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (description, time.monotonic(), focused)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
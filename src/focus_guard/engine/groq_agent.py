@@ -1,22 +1,61 @@
 """
 FocusGuard AI - Groq Agent
 3-stage agentic pipeline: Vision -> Reasoning -> Safety
+(or, in fused mode, one vision call that returns the roast as JSON -> Safety)
+
+The Groq SDK (and its HTTP stack) is imported when the first agent is built,
+so importing this module stays cheap for a fast cold start.
 """
 
 import os
-from groq import Groq
-from typing import Dict, Any
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from .deadline import Deadline, TIER_FULL, TIER_POOL, TIER_STATIC, TIER_TEXT_ONLY, deadline_scope, time_left
+from .frame_cache import FrameCache, FrameKey, FRAME_CACHE_ENABLED
+from .metrics import ERRORS, FALLBACKS, ROASTS, STAGE_LATENCY, UNSAFE
+from .protocol import FrameData, frame_base64
+from .replay import RECORD, REPLAY, REPLAY_MODE, wrap_groq_client
+from .roast_pool import RoastPool, ROAST_POOL_ENABLED, classify_activity
+from .router import VISION_PROMPT, create_vision_router
+from .safety import SafetyBatcher, VerdictCache, SAFETY_FAIL_OPEN, SAFETY_TIMEOUT
+from .shared import shared_backend
+from .structured import IncrementalJSONParser, parse_focus_reply
+from .vision_batch import VISION_BATCH_ENABLED, VISION_BATCH_PROMPT, VisionBatcher, parse_batch_reply
+
+
+def track(name=None):
+    """No-op stand-in for opik.track."""
+    def decorator(func):
+        return func
+    return decorator
+
+
+# Optional: Opik tracking, only imported when enabled (slow import; keep off in production)
+OPIK_ENABLED = os.getenv("FOCUS_OPIK", "0") == "1"
+if OPIK_ENABLED:
+    try:
+        from opik import track  # noqa: F811
+        os.environ.setdefault("OPIK_PROJECT_NAME", "FocusGuard AI")
+    except ImportError:
+        print("Warning: FOCUS_OPIK=1 but opik is not installed. Tracking disabled.")
+
+
+def _groq_client_class():
+    """The Groq SDK client class, imported on first use."""
+    if "Groq" not in globals():
+        from groq import Groq
+        globals()["Groq"] = Groq
+    return globals()["Groq"]
+
 
-# Optional: Opik tracking (disable for production/Railway)
-try:
-    from opik import track
-    os.environ["OPIK_PROJECT_NAME"] = "FocusGuard AI"
-except ImportError:
-    # Dummy decorator if opik not installed
-    def track(name=None):
-        def decorator(func):
-            return func
-        return decorator
+def __getattr__(name):
+    # Keeps ``focus_guard.engine.groq_agent.Groq`` reachable (and patchable) without an eager import
+    if name == "Groq":
+        return _groq_client_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # =============================================================================
@@ -27,6 +66,32 @@ VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
 REASONING_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
 SAFETY_MODEL = "meta-llama/llama-guard-4-12b"
 
+# "sequential": Vision -> Reasoning -> Safety, roast delivered after all three.
+# "pipelined": roast delivered after Reasoning, Safety runs alongside delivery
+#              and retracts the roast if it fails.
+# "fused":     one vision call returns is_focused/activity/tease as JSON, then Safety;
+#              falls back to the 3 stages when the reply doesn't parse.
+PIPELINE_MODE = os.getenv("FOCUS_PIPELINE_MODE", "sequential")
+SAFETY_WORKERS = int(os.getenv("FOCUS_SAFETY_WORKERS", "4"))
+
+VISION_ERROR_PREFIX = "Error analyzing image"
+ROAST_FALLBACK = "Get back to work."
+UNSAFE_FALLBACK = "I have no words for your laziness. Back to work."
+# Roast prompt when the frame couldn't be analysed in time (and the client sent no reason)
+TEXT_ONLY_DESCRIPTION = "The user drifted off task; no camera details available."
+
+# Stream reasoning tokens to the client as they arrive (sequential mode only)
+STREAM_ROASTS = os.getenv("FOCUS_STREAM_ROASTS", "0") == "1"
+
+SAFETY_CACHE_ENABLED = os.getenv("FOCUS_SAFETY_CACHE", "1") != "0"
+SAFETY_BATCH_ENABLED = os.getenv("FOCUS_SAFETY_BATCH", "1") != "0"
+
+# Fused mode: appended to SYSTEM_PROMPT; the reply is checked against structured.FOCUS_SCHEMA
+FUSED_INSTRUCTIONS = """Look at the webcam frame and decide whether the user is focused on their screen.
+Reply with ONE JSON object and nothing else:
+{"is_focused": true or false, "activity": "what the person is doing, one sentence", "tease": "the roast"}
+If they are focused, "tease" is an empty string."""
+
 SYSTEM_PROMPT = """Role: You are 'The Toxic Homie Coach' - a brutally honest bestie who roasts users back to focus.
 
 Vibe: Gen-Z energy, meme-lord humor, uses slang like 'homie', 'dude', 'bro', 'nah fr', 'lowkey', 'no cap', 'sus', 'bruh moment'.
@@ -56,117 +121,701 @@ Examples:
 class GroqAgent:
     """Agent for generating personalized roasts using Groq's LPU."""
     
-    def __init__(self, reasoning_model: str = REASONING_MODEL):
+    def __init__(self, reasoning_model: str = REASONING_MODEL, pipeline_mode: str = PIPELINE_MODE):
         api_key = os.getenv("GROQ_API_KEY") or os.getenv("GROG_API_KEY")
-        self.enabled = bool(api_key)
+        # FOCUS_REPLAY=replay answers every call from recorded responses: no key or network needed
+        self.enabled = bool(api_key) or REPLAY_MODE == REPLAY
         
         if self.enabled:
-            self.client = Groq(api_key=api_key)
+            self.transport = None
+            client = None
+            if api_key:
+                from .transport import shared_transport
+                
+                # Every agent shares one keep-alive pool; retries live in the transport
+                self.transport = shared_transport()
+                client = _groq_client_class()(
+                    api_key=api_key, http_client=self.transport.http_client, max_retries=0
+                )
+            # FOCUS_REPLAY=record|replay: calls go through the response store (engine.replay)
+            self.client = wrap_groq_client(client)
             self.reasoning_model = reasoning_model
             self.vision_model = VISION_MODEL
             self.safety_model = SAFETY_MODEL
         else:
             self.client = None
+            self.transport = None
             print("Warning: GROQ_API_KEY not set. AI features disabled.")
         
         self.system_prompt = SYSTEM_PROMPT
+        self.pipeline_mode = pipeline_mode
+        self._safety_pool = None
+        
+        # Record/replay: every stage makes its own model call for its own item, so a replay
+        # asks for exactly what was recorded. Caches, cross-session batching, the randomly
+        # refilled roast pool and latency-based routing all depend on timing and are off.
+        replaying = REPLAY_MODE in (RECORD, REPLAY)
+        optimized = self.enabled and not replaying
+        
+        # Near-duplicate webcam frames reuse the previous vision description
+        self.frame_cache = FrameCache() if FRAME_CACHE_ENABLED and not replaying else None
+        
+        # Llama Guard verdicts are cached by content (across workers with a shared backend)
+        # and batched across sessions
+        backend = shared_backend()
+        self.verdict_cache = (
+            VerdictCache(shared=backend if backend.shared else None)
+            if optimized and SAFETY_CACHE_ENABLED else None
+        )
+        self.safety_batcher = (
+            SafetyBatcher(self._moderate_batch) if optimized and SAFETY_BATCH_ENABLED else None
+        )
+        
+        # Pre-approved roasts per activity class skip Reasoning + Safety
+        self.roast_pool = (
+            RoastPool(self._roast_for_pool, self.check_safety)
+            if optimized and ROAST_POOL_ENABLED else None
+        )
+        
+        # FOCUS_VISION_BACKENDS / FOCUS_HEDGE: vision requests go to the fastest backend, hedged
+        self.vision_router = create_vision_router(self) if optimized else None
+        
+        # FOCUS_VISION_BATCH: frames from different sessions share multi-image requests
+        self.vision_batcher = (
+            VisionBatcher(self.groq_vision_batch, self._describe_frame)
+            if optimized and VISION_BATCH_ENABLED else None
+        )
 
     # =========================================================================
     # Stage 1: Vision Analysis
     # =========================================================================
 
     @track(name="vision_analysis")
-    def analyze_image(self, image_b64: str) -> str:
-        """Analyze webcam frame to detect user activity."""
+    def analyze_image(self, image: FrameData, timeout: Optional[float] = None, scope: str = None) -> str:
+        """Analyze webcam frame (base64 text or raw JPEG bytes) to detect user activity.
+        
+        Cached descriptions are only reused for frames from the same ``scope`` (session).
+        """
+        frame_key = self.frame_cache.fingerprint(image, scope) if self.frame_cache else None
+        if frame_key is not None:
+            cached = self.frame_cache.get(frame_key)
+            if cached is not None:
+                return cached
+        return self._analyze_uncached(image, timeout, frame_key)
+
+    def _analyze_uncached(self, image: FrameData, timeout: Optional[float] = None,
+                          frame_key: Optional[FrameKey] = None) -> str:
+        """Vision call for a frame the cache didn't have (stored under ``frame_key``)."""
         try:
-            image_url = f"data:image/jpeg;base64,{image_b64}"
-            
-            completion = self.client.chat.completions.create(
-                model=self.vision_model,
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text", 
-                            "text": "Describe what the person is doing. Are they focused on screen, looking at phone, sleeping, or away?"
-                        },
-                        {"type": "image_url", "image_url": {"url": image_url}}
-                    ]
-                }],
-                temperature=0.7,
-                max_tokens=100
-            )
-            return completion.choices[0].message.content
+            if self.vision_batcher is not None:
+                description = self.vision_batcher.describe(image, timeout)
+            else:
+                description = self._describe_frame(image, timeout)
+            if frame_key is not None:
+                self.frame_cache.put(frame_key, description)
+            return description
         except Exception as e:
-            return f"Error analyzing image: {str(e)}"
+            ERRORS.inc(stage="vision")
+            return f"{VISION_ERROR_PREFIX}: {str(e)}"
+
+    def _describe_frame(self, image: FrameData, timeout: Optional[float] = None) -> str:
+        if self.vision_router is not None:
+            return self.vision_router.call(image, timeout)
+        return self.groq_vision(image, timeout)
+
+    def groq_vision(self, image: FrameData, timeout: Optional[float] = None, model: str = None) -> str:
+        """One Groq vision request (raises on failure)."""
+        image_url = f"data:image/jpeg;base64,{frame_base64(image)}"
+        completion = self.client.chat.completions.create(
+            model=model or self.vision_model,
+            messages=[{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": VISION_PROMPT},
+                    {"type": "image_url", "image_url": {"url": image_url}}
+                ]
+            }],
+            temperature=0.7,
+            max_tokens=100,
+            **_timeout_kwargs(timeout)
+        )
+        return completion.choices[0].message.content
+
+    def groq_vision_batch(self, images: List[FrameData], timeout: Optional[float] = None) -> List[str]:
+        """One Groq request describing several frames, one description each (raises on failure)."""
+        content = [{"type": "text", "text": VISION_BATCH_PROMPT.format(count=len(images))}]
+        for number, image in enumerate(images, 1):
+            content.append({"type": "text", "text": f"Image {number}:"})
+            content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{frame_base64(image)}"}})
+        completion = self.client.chat.completions.create(
+            model=self.vision_model,
+            messages=[{"role": "user", "content": content}],
+            response_format={"type": "json_object"},
+            temperature=0.7,
+            max_tokens=100 * len(images),
+            **_timeout_kwargs(timeout)
+        )
+        return parse_batch_reply(completion.choices[0].message.content, len(images))
 
     # =========================================================================
     # Stage 2: Roast Generation
     # =========================================================================
 
     @track(name="generate_roast")
-    def generate_roast(self, distraction_description: str) -> str:
+    def generate_roast(self, distraction_description: str, timeout: Optional[float] = None) -> str:
         """Generate a witty roast based on the vision analysis."""
         try:
             completion = self.client.chat.completions.create(
                 model=self.reasoning_model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": f"User is distracted. Vision Analysis: {distraction_description}"}
-                ],
+                messages=self._roast_messages(distraction_description),
                 temperature=0.8,
-                max_tokens=60
+                max_tokens=60,
+                **_timeout_kwargs(timeout)
             )
             return completion.choices[0].message.content.strip()
         except Exception:
-            return "Get back to work."
+            ERRORS.inc(stage="roast")
+            return ROAST_FALLBACK
+
+    @track(name="generate_roast_stream")
+    def stream_roast(self, distraction_description: str, on_token: Callable[[str], None],
+                     timeout: Optional[float] = None) -> str:
+        """Generate a roast with the streaming API, calling on_token for each delta."""
+        parts = []
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.reasoning_model,
+                messages=self._roast_messages(distraction_description),
+                temperature=0.8,
+                max_tokens=60,
+                stream=True,
+                **_timeout_kwargs(timeout)
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    on_token(delta)
+        except Exception:
+            ERRORS.inc(stage="roast")
+        return "".join(parts).strip() or ROAST_FALLBACK
+
+    def _roast_messages(self, distraction_description: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"User is distracted. Vision Analysis: {distraction_description}"}
+        ]
 
     # =========================================================================
-    # Stage 3: Safety Check
+    # Fused Stage: Vision + Roast in one call
     # =========================================================================
 
-    @track(name="safety_check")
-    def check_safety(self, text: str) -> bool:
-        """Verify roast is safe using Llama Guard."""
+    @track(name="fused_vision_roast")
+    def see_and_roast(self, image: FrameData, timeout: Optional[float] = None, reason: str = None,
+                      on_token: Optional[Callable[[str], None]] = None) -> Optional[Dict[str, Any]]:
+        """One multimodal call returning a validated {is_focused, activity, tease}, or None.
+
+        Non-streaming calls use Groq's JSON mode; streamed replies are parsed
+        incrementally and the tease is passed to on_token as it's written.
+        """
+        messages = self._fused_messages(image, reason)
         try:
-            completion = self.client.chat.completions.create(
-                model=self.safety_model,
-                messages=[{"role": "user", "content": text}],
+            if on_token is None:
+                completion = self.client.chat.completions.create(
+                    model=self.vision_model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=150,
+                    response_format={"type": "json_object"},
+                    **_timeout_kwargs(timeout)
+                )
+                return parse_focus_reply(completion.choices[0].message.content or "")
+            
+            parser = IncrementalJSONParser("tease", on_token)
+            stream = self.client.chat.completions.create(
+                model=self.vision_model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150,
+                stream=True,
+                **_timeout_kwargs(timeout)
             )
-            result = completion.choices[0].message.content.strip()
-            return result == "safe"
+            for chunk in stream:
+                parser.feed(chunk.choices[0].delta.content if chunk.choices else None)
+                if parser.done:
+                    break
+            return parser.result()
         except Exception:
-            return True
+            # API error, or a reply that doesn't match the schema
+            ERRORS.inc(stage="fused")
+            return None
+
+    def _fused_messages(self, image: FrameData, reason: str = None) -> List[Dict[str, Any]]:
+        hint = f" The browser flagged: {reason}." if reason else ""
+        return [
+            {"role": "system", "content": self.system_prompt + "\n\n" + FUSED_INSTRUCTIONS},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": f"Here is the user's webcam frame.{hint} Reply with the JSON object."},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{frame_base64(image)}"}},
+                ],
+            },
+        ]
+
+    def _roast_for_pool(self, prompt: str) -> str:
+        """Background pool refill: never store the error fallback."""
+        roast = self.generate_roast(prompt)
+        return None if roast == ROAST_FALLBACK else roast
+
+    # =========================================================================
+    # Stage 3: Safety Check
+    # =========================================================================
+
+    @track(name="safety_check")
+    def check_safety(self, text: str, timeout: Optional[float] = None) -> Optional[bool]:
+        """Verify roast is safe using Llama Guard (cached, batched, time-boxed).
+
+        Returns None when no verdict came back (error or timeout); callers apply
+        SAFETY_FAIL_OPEN for delivery but only admit explicitly safe roasts to the pool.
+        """
+        cached = self.cached_verdict(text)
+        if cached is not None:
+            return cached
+        
+        if self.safety_batcher:
+            verdict = self.safety_batcher.check(text, timeout)
+        else:
+            try:
+                verdict = self._moderate_batch([text], timeout)[0]
+            except Exception:
+                verdict = None
+        
+        # Errors and timeouts are not cached
+        if verdict is None:
+            ERRORS.inc(stage="safety")
+            return None
+        if not verdict:
+            UNSAFE.inc()
+        if self.verdict_cache:
+            self.verdict_cache.put(text, verdict)
+        return verdict
+
+    def cached_verdict(self, text: str) -> Optional[bool]:
+        """A verdict Llama Guard already gave for this text (no request), or None."""
+        if not self.verdict_cache:
+            return None
+        cached = self.verdict_cache.get(text)
+        if cached is False:
+            UNSAFE.inc()
+        return cached
+
+    def _moderate(self, text: str, timeout: Optional[float] = None) -> bool:
+        """One Llama Guard request, within the caller's remaining budget (at most SAFETY_TIMEOUT)."""
+        budget = min(SAFETY_TIMEOUT, time_left(), SAFETY_TIMEOUT if timeout is None else timeout)
+        if budget <= 0:
+            raise TimeoutError("no time left for a safety check")
+        completion = self.client.chat.completions.create(
+            model=self.safety_model,
+            messages=[{"role": "user", "content": text}],
+            timeout=budget,
+        )
+        result = completion.choices[0].message.content.strip()
+        return result == "safe"
+
+    def _moderate_batch(self, texts: List[str], timeout: Optional[float] = None) -> List[bool]:
+        """Moderate several roasts with one request when they are all safe."""
+        if timeout is not None:
+            # One budget for the whole check, follow-up requests included
+            with deadline_scope(time.monotonic() + min(timeout, time_left())):
+                return self._moderate_batch(texts)
+        if len(texts) == 1:
+            return [self._moderate(texts[0])]
+        
+        combined = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, 1))
+        if self._moderate(combined):
+            return [True] * len(texts)
+        
+        # Something in the batch is unsafe - find out which
+        return [self._moderate(text) for text in texts]
 
     # =========================================================================
     # Pipeline Orchestration
     # =========================================================================
 
     @track(name="process_distraction")
-    def process_distraction(self, image_b64: str) -> Dict[str, Any]:
-        """Run the full 3-stage pipeline."""
+    def process_distraction(self, image: FrameData,
+                            on_token: Optional[Callable[[str], None]] = None,
+                            deadline: Optional[Deadline] = None, reason: str = None,
+                            scope: str = None) -> Dict[str, Any]:
+        """Run the full 3-stage pipeline (streaming reasoning tokens to on_token if given).
+        
+        Stages share the event's deadline; see engine.deadline for the fallback tiers.
+        ``scope`` (the session) keeps frame-cache hits to one person's camera.
+        """
+        if not self.enabled:
+            return self._disabled_result()
+        
+        started = time.perf_counter()
+        timings = {}
+        deadline = deadline or Deadline()
+        
+        with deadline_scope(deadline.expires):
+            analyze = partial(self.analyze_image, scope=scope)
+            if self.pipeline_mode == "fused":
+                # One frame-cache lookup serves the fused call and the 3-stage fallback
+                frame_key = self.frame_cache.fingerprint(image, scope) if self.frame_cache else None
+                cached = self.frame_cache.lookup(frame_key) if frame_key is not None else None
+                if cached is not None:
+                    description, focused = cached
+                    # Frame the model already judged focused: same verdict, no calls
+                    if focused:
+                        return self.focused_result(description, timings, started, deadline, source="cache")
+                    
+                    # Frame already described: the 3-stage path only needs the roast call
+                    def analyze(image: FrameData, timeout: float) -> str:
+                        return description
+                else:
+                    result = self._fused(image, frame_key, timings, started, on_token, deadline, reason)
+                    if result is not None:
+                        return result
+                    # Roast tokens already went out: the fallback replaces them in one piece
+                    if "ttft_ms" in timings:
+                        on_token = None
+                    analyze = partial(self._analyze_uncached, frame_key=frame_key)
+            
+            # Stage 1: Vision
+            description, tier = self._see(image, timings, deadline, reason, analyze)
+            return self.process_description(description, timings, started, on_token, deadline, tier)
+
+    def focused_result(self, description: str, timings: Dict[str, float] = None, started: float = None,
+                       deadline: Optional[Deadline] = None, source: str = "cache") -> Dict[str, Any]:
+        """Result for a frame judged focused (now or earlier, from a cached verdict): no roast."""
+        timings = {} if timings is None else timings
+        timings["total_ms"] = _elapsed_ms(started or time.perf_counter())
+        result = {"is_focused": True, "activity": description, "tease": None, "safe": True,
+                  "source": source, "timings": timings}
+        return _with_tier(result, TIER_FULL, deadline or Deadline())
+
+    def process_description(self, description: str, timings: Dict[str, float] = None,
+                            started: float = None,
+                            on_token: Optional[Callable[[str], None]] = None,
+                            deadline: Optional[Deadline] = None, tier: str = TIER_FULL) -> Dict[str, Any]:
+        """Run Reasoning -> Safety for an activity description (vision already done or skipped)."""
         if not self.enabled:
-            return {
-                "is_focused": False,
-                "activity": "AI disabled - no API key",
-                "tease": "Yo, set up GROQ_API_KEY to unlock the roasts! 🔑",
-                "safe": True
-            }
+            return self._disabled_result()
         
-        # Stage 1: Vision
-        description = self.analyze_image(image_b64)
+        started = started or time.perf_counter()
+        timings = {} if timings is None else timings
+        deadline = deadline or Deadline()
         
-        # Stage 2: Reasoning
-        roast = self.generate_roast(description)
+        # Repeat distraction: serve a pre-approved roast
+        activity = classify_activity(description)
+        pooled = self.roast_pool.take(activity) if self.roast_pool else None
+        if pooled is not None:
+            timings["time_to_roast_ms"] = timings["total_ms"] = _elapsed_ms(started)
+            if on_token is not None:
+                timings["ttft_ms"] = timings["time_to_roast_ms"]
+            return _with_tier(self._pooled_result(description, pooled, timings), TIER_POOL, deadline)
+        
+        with deadline_scope(deadline.expires):
+            # Stage 2: Reasoning
+            roast = self._reason(description, timings, started, on_token, deadline)
+            if roast is None:
+                return self._degraded(description, activity, timings, started, deadline)
+            
+            return self._checked(description, activity, roast, timings, started, deadline, tier)
+
+    def _checked(self, description: str, activity: str, roast: str, timings: Dict[str, float],
+                 started: float, deadline: Deadline, tier: str) -> Dict[str, Any]:
+        """Stage 3: Safety (skipped for already-judged roasts when the budget is gone), then the result."""
+        safety_timeout = deadline.timeout("safety")
+        if safety_timeout is None:
+            verdict = self.cached_verdict(roast)
+            if verdict is None:
+                return self._degraded(description, activity, timings, started, deadline)
+        else:
+            verdict = self._timed(timings, "safety", self.check_safety, roast, safety_timeout)
+        is_safe = SAFETY_FAIL_OPEN if verdict is None else verdict
         
-        # Stage 3: Safety
-        is_safe = self.check_safety(roast)
         if not is_safe:
-            roast = "I have no words for your laziness. Back to work."
+            roast = UNSAFE_FALLBACK
+        elif verdict is True and self.roast_pool:
+            # Unchecked roasts (fail-open) are delivered once but never pooled
+            self.roast_pool.add(activity, roast)
+        
+        timings["time_to_roast_ms"] = timings["total_ms"] = _elapsed_ms(started)
             
-        return {
+        result = {
+            "is_focused": False,
+            "activity": description,
+            "tease": roast,
+            "safe": is_safe,
+            "source": "fresh",
+            "timings": timings
+        }
+        return _with_tier(result, tier, deadline)
+
+    def process_reason(self, reason: str,
+                       on_token: Optional[Callable[[str], None]] = None,
+                       deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Roast a text-only trigger (e.g. tab switch), from the pool when possible."""
+        deadline = deadline or Deadline()
+        activity = classify_activity(reason)
+        pooled = self.roast_pool.take(activity) if self.roast_pool else None
+        if pooled is not None:
+            return _with_tier(self._pooled_result(reason, pooled), TIER_POOL, deadline)
+        
+        started = time.perf_counter()
+        timings = {}
+        with deadline_scope(deadline.expires):
+            roast = self._reason(reason, timings, started, on_token, deadline)
+        if roast is None:
+            return self._degraded(reason, activity, timings, started, deadline)
+        timings["total_ms"] = _elapsed_ms(started)
+        result = {"is_focused": False, "activity": reason, "tease": roast, "source": "fresh",
+                  "timings": timings}
+        return _with_tier(result, TIER_FULL, deadline)
+
+    def _fused(self, image: FrameData, frame_key: Optional[FrameKey], timings: Dict[str, float],
+               started: float, on_token: Optional[Callable[[str], None]], deadline: Deadline,
+               reason: str = None) -> Optional[Dict[str, Any]]:
+        """Vision and roast from one call (for a frame the cache missed), then Safety.
+
+        None means fall back to the 3 stages.
+        """
+        timeout = deadline.timeout("fused")
+        if timeout is None:
+            return None
+        
+        emit = None
+        if on_token is not None:
+            def emit(delta: str):
+                if "ttft_ms" not in timings:
+                    timings["ttft_ms"] = _elapsed_ms(started)
+                on_token(delta)
+        
+        reply = self._timed(timings, "fused", self.see_and_roast, image, timeout, reason, emit)
+        if reply is None:
+            deadline.miss("fused")
+            return None
+        
+        description = reply["activity"]
+        if frame_key is not None:
+            self.frame_cache.put(frame_key, description, focused=reply["is_focused"])
+        
+        if reply["is_focused"]:
+            return self.focused_result(description, timings, started, deadline, source="fused")
+        
+        activity = classify_activity(description)
+        roast = reply["tease"].strip()
+        if not roast:
+            # Distracted but no roast in the reply: the vision half is still good
+            return self.process_description(description, timings, started, on_token, deadline)
+        
+        ROASTS.inc(source="fresh")
+        result = self._checked(description, activity, roast, timings, started, deadline, TIER_FULL)
+        if result.get("source") == "fresh":
+            result["source"] = "fused"
+        return result
+
+    def _see(self, image: FrameData, timings: Dict[str, float], deadline: Deadline,
+             reason: str = None, analyze: Callable[[FrameData, float], str] = None) -> Tuple[str, str]:
+        """Vision stage within its sub-budget; too slow or failed means a text-only roast.
+
+        ``analyze`` stands in for analyze_image when the frame cache was already checked.
+        """
+        vision_timeout = deadline.timeout("vision")
+        if vision_timeout is not None:
+            description = self._timed(timings, "vision", analyze or self.analyze_image, image, vision_timeout)
+            if not description.startswith(VISION_ERROR_PREFIX):
+                return description, TIER_FULL
+            deadline.miss("vision")
+        return reason or TEXT_ONLY_DESCRIPTION, TIER_TEXT_ONLY
+
+    def _reason(self, description: str, timings: Dict[str, float], started: float,
+                on_token: Optional[Callable[[str], None]], deadline: Deadline) -> Optional[str]:
+        """Reasoning stage, streamed when on_token is given (records ttft_ms).
+        
+        Returns None when there was no time for it or it failed, so the caller degrades.
+        """
+        timeout = deadline.timeout("reasoning")
+        if timeout is None:
+            return None
+        
+        ROASTS.inc(source="fresh")
+        if on_token is None:
+            roast = self._timed(timings, "reasoning", self.generate_roast, description, timeout)
+        else:
+            def emit(delta: str):
+                if "ttft_ms" not in timings:
+                    timings["ttft_ms"] = _elapsed_ms(started)
+                on_token(delta)
+            
+            roast = self._timed(timings, "reasoning", self.stream_roast, description, emit, timeout)
+        
+        if roast == ROAST_FALLBACK:
+            deadline.miss("reasoning")
+            return None
+        return roast
+
+    def _degraded(self, description: str, activity: str, timings: Dict[str, float],
+                  started: float, deadline: Deadline) -> Dict[str, Any]:
+        """Out of time (or the model failed): a pool roast if there is one, else the fallback line."""
+        pooled = self.roast_pool.take(activity, allow_fresh=False) if self.roast_pool else None
+        timings["time_to_roast_ms"] = timings["total_ms"] = _elapsed_ms(started)
+        if pooled is not None:
+            return _with_tier(self._pooled_result(description, pooled, timings), TIER_POOL, deadline)
+        
+        FALLBACKS.inc()
+        result = {
+            "is_focused": False,
+            "activity": description,
+            "tease": ROAST_FALLBACK,
+            "safe": True,
+            "source": "static",
+            "timings": timings
+        }
+        return _with_tier(result, TIER_STATIC, deadline)
+
+    def process_distraction_pipelined(self, image: FrameData, deadline: Optional[Deadline] = None,
+                                      reason: str = None, scope: str = None) -> Tuple[Dict[str, Any], Future]:
+        """Run Vision -> Reasoning, then overlap Safety with roast delivery.
+        
+        Returns the roast right away (``safe`` is None) plus a future that
+        resolves to the safety verdict message once Llama Guard answers.
+        """
+        done = Future()
+        done.set_result(None)
+        if not self.enabled:
+            return self._disabled_result(), done
+        
+        started = time.perf_counter()
+        timings = {}
+        deadline = deadline or Deadline()
+        
+        with deadline_scope(deadline.expires):
+            description, tier = self._see(image, timings, deadline, reason,
+                                          partial(self.analyze_image, scope=scope))
+            
+            activity = classify_activity(description)
+            pooled = self.roast_pool.take(activity) if self.roast_pool else None
+            if pooled is not None:
+                # Pool roasts were checked when generated - nothing left to overlap
+                timings["time_to_roast_ms"] = timings["total_ms"] = _elapsed_ms(started)
+                return _with_tier(self._pooled_result(description, pooled, timings), TIER_POOL, deadline), done
+            
+            roast = self._reason(description, timings, started, None, deadline)
+        if roast is None:
+            return self._degraded(description, activity, timings, started, deadline), done
+        timings["time_to_roast_ms"] = _elapsed_ms(started)
+        
+        if self._safety_pool is None:
+            self._safety_pool = ThreadPoolExecutor(
+                max_workers=SAFETY_WORKERS, thread_name_prefix="focus-safety"
+            )
+        verdict = self._safety_pool.submit(self._safety_verdict, roast, started, activity)
+        
+        result = {
             "is_focused": False,
             "activity": description,
             "tease": roast,
-            "safe": is_safe
+            "safe": None,
+            "pending_safety": True,
+            "source": "fresh",
+            "timings": timings
+        }
+        return _with_tier(result, tier, deadline), verdict
+
+    def _safety_verdict(self, roast: str, started: float, activity: str) -> Dict[str, Any]:
+        """Background safety stage for pipelined mode."""
+        timings = {}
+        verdict = self._timed(timings, "safety", self.check_safety, roast)
+        is_safe = SAFETY_FAIL_OPEN if verdict is None else verdict
+        if verdict is True and self.roast_pool:
+            self.roast_pool.add(activity, roast)
+        timings["total_ms"] = _elapsed_ms(started)
+        return {
+            "type": "safety",
+            "safe": is_safe,
+            "retract": not is_safe,
+            "tease": roast if is_safe else UNSAFE_FALLBACK,
+            "timings": timings
+        }
+
+    def warm_up(self, connections: int = None) -> int:
+        """Open pooled connections to the Groq API so the first frame skips TCP/TLS setup."""
+        if not self.enabled or self.transport is None:
+            return 0
+        if connections is None:
+            from .transport import HTTP_WARMUP
+            connections = HTTP_WARMUP
+        return self.transport.warm_up(self.client.base_url, connections)
+
+    def close(self):
+        """Stop background workers (safety, roast pool refills, vision router and batcher)."""
+        if self._safety_pool is not None:
+            self._safety_pool.shutdown(wait=False, cancel_futures=True)
+        if self.roast_pool is not None:
+            self.roast_pool.shutdown()
+        if self.safety_batcher is not None:
+            self.safety_batcher.shutdown()
+        if self.verdict_cache is not None:
+            self.verdict_cache.close()
+        if self.vision_router is not None:
+            self.vision_router.shutdown()
+        if self.vision_batcher is not None:
+            self.vision_batcher.shutdown()
+
+    @staticmethod
+    def _pooled_result(activity: str, roast: str, timings: Dict[str, float] = None) -> Dict[str, Any]:
+        ROASTS.inc(source="pool")
+        result = {
+            "is_focused": False,
+            "activity": activity,
+            "tease": roast,
+            "safe": True,
+            "source": "pool"
         }
+        if timings is not None:
+            result["timings"] = timings
+        return result
+
+    def _disabled_result(self) -> Dict[str, Any]:
+        return {
+            "is_focused": False,
+            "activity": "AI disabled - no API key",
+            "tease": "Yo, set up GROQ_API_KEY to unlock the roasts! 🔑",
+            "safe": True
+        }
+
+    @staticmethod
+    def _timed(timings: Dict[str, float], stage: str, func, *args):
+        """Call a stage and record its wall time as ``<stage>_ms`` (and in the stage histogram)."""
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            timings[f"{stage}_ms"] = round(elapsed * 1000, 1)
+            STAGE_LATENCY.observe(elapsed, stage=STAGE_NAMES.get(stage, stage))
+
+
+# Timing keys -> stage label in the latency histogram
+STAGE_NAMES = {"vision": "vision", "reasoning": "roast", "safety": "safety", "fused": "fused"}
+
+
+def _timeout_kwargs(timeout: Optional[float]) -> Dict[str, float]:
+    """Per-request timeout for the Groq SDK (omitted when there's no budget)."""
+    return {"timeout": timeout} if timeout is not None else {}
+
+
+def _with_tier(result: Dict[str, Any], tier: str, deadline: Deadline) -> Dict[str, Any]:
+    """Record which fallback tier served the result and how the budget was spent."""
+    result["tier"] = tier
+    result["deadline"] = deadline.describe()
+    return result
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
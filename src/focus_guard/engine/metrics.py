@@ -0,0 +1,258 @@
+"""
+FocusGuard AI - Metrics
+Dependency-free counters, gauges and histograms rendered in the Prometheus
+text exposition format for the /metrics endpoint.
+
+Recording is a lock plus a bisect per observation, cheap enough to leave on in production.
+"""
+
+import asyncio
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+METRICS_ENABLED = os.getenv("FOCUS_METRICS", "1") != "0"
+
+# Seconds; Groq stages sit between ~50ms and a few seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# How often the event loop is probed for scheduling lag
+LOOP_LAG_INTERVAL = float(os.getenv("FOCUS_LOOP_LAG_INTERVAL", "0.1"))
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# =============================================================================
+# Metric Types
+# =============================================================================
+
+class Metric:
+    """Base class: a named family of label-keyed series."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(header + self.samples())
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(Metric):
+    """Point-in-time value, either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from ``function`` on every scrape (unlabelled gauges only)."""
+        self._function = function
+
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(self._function())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# =============================================================================
+# Registry
+# =============================================================================
+
+class Registry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "focusguard_stage_latency_seconds", "Latency of one pipeline stage (vision, roast, safety).", ["stage"]))
+E2E_LATENCY = REGISTRY.register(Histogram(
+    "focusguard_e2e_latency_seconds", "Client message to roast sent, per message kind (frame, reason).", ["kind"]))
+ERRORS = REGISTRY.register(Counter(
+    "focusguard_errors_total", "Failed stage calls (errors and timeouts).", ["stage"]))
+FALLBACKS = REGISTRY.register(Counter(
+    "focusguard_roast_fallbacks_total", "Roasts replaced by the fallback line after a reasoning failure."))
+UNSAFE = REGISTRY.register(Counter(
+    "focusguard_unsafe_verdicts_total", "Llama Guard verdicts that flagged a roast as unsafe."))
+ROASTS = REGISTRY.register(Counter(
+    "focusguard_roasts_total", "Roasts produced, by source (fresh, pool).", ["source"]))
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    "focusguard_active_sessions", "Open /ws/focus connections."))
+INFLIGHT_CALLS = REGISTRY.register(Gauge(
+    "focusguard_inflight_calls", "Engine calls currently running on the worker pool."))
+LOOP_LAG = REGISTRY.register(Histogram(
+    "focusguard_event_loop_lag_seconds", "How late the event loop woke up a sleeping probe task.",
+    buckets=LAG_BUCKETS))
+
+
+# =============================================================================
+# Event Loop Lag
+# =============================================================================
+
+class LoopLagMonitor:
+    """Sleeps for ``interval`` in a loop and records how much later than asked it woke up.
+
+    Anything blocking the loop (sync Groq calls, JPEG work) shows up here directly.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, histogram: Histogram = LOOP_LAG):
+        self.interval = interval
+        self.histogram = histogram
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            self.histogram.observe(lag)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,119 @@
+"""
+FocusGuard AI - Focus Pre-Classifier
+Cheap CPU-only heuristics that decide whether a frame needs the vision model at all.
+
+    away  - nobody in front of the camera (dark frame or no skin-tone pixels)
+    same  - barely changed since this session's last analysed frame
+    llm   - ambiguous, send to the vision model
+"""
+
+import io
+import os
+from importlib.util import find_spec
+from typing import Any, Dict, Optional
+
+from .protocol import FrameData, frame_bytes
+
+# Optional: NumPy + Pillow, imported on first frame (every frame goes to the LLM without them)
+IMAGING_AVAILABLE = find_spec("numpy") is not None and find_spec("PIL") is not None
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+PREFILTER_ENABLED = os.getenv("FOCUS_PREFILTER", "1") != "0"
+
+ANALYSIS_SIZE = (64, 48)
+# Mean luma (0-255) below which the camera is covered or the room is dark
+DARK_THRESHOLD = float(os.getenv("FOCUS_PREFILTER_DARK", "28"))
+# Share of skin-tone pixels in the centre region below which nobody is there
+MIN_SKIN_RATIO = float(os.getenv("FOCUS_PREFILTER_MIN_SKIN", "0.03"))
+# Mean absolute luma difference below which the frame counts as unchanged
+STILL_THRESHOLD = float(os.getenv("FOCUS_PREFILTER_STILL", "4.0"))
+
+AWAY = "away"
+SAME = "same"
+LLM = "llm"
+
+AWAY_DESCRIPTION = "The person is away from their desk - nobody is in front of the camera."
+
+
+# =============================================================================
+# Classifier
+# =============================================================================
+
+class FocusPreClassifier:
+    """Per-session frame triage; keeps the last analysed frame for motion checks."""
+
+    def __init__(self, dark_threshold: float = DARK_THRESHOLD, min_skin_ratio: float = MIN_SKIN_RATIO,
+                 still_threshold: float = STILL_THRESHOLD):
+        self.dark_threshold = dark_threshold
+        self.min_skin_ratio = min_skin_ratio
+        self.still_threshold = still_threshold
+        self.enabled = IMAGING_AVAILABLE
+        self.last_luma = None
+        self.last_description = None
+        self.last_focused = False
+        self.counters = {AWAY: 0, SAME: 0, LLM: 0}
+
+    def classify(self, image: FrameData) -> str:
+        """Sort a frame into away / same / llm."""
+        features = self.features(image)
+        if features is None:
+            verdict = LLM
+        elif features["brightness"] < self.dark_threshold or features["skin_ratio"] < self.min_skin_ratio:
+            verdict = AWAY
+        elif (self.last_description is not None and features["motion"] is not None
+              and features["motion"] < self.still_threshold):
+            verdict = SAME
+        else:
+            verdict = LLM
+
+        if verdict == LLM and features is not None:
+            self.last_luma = features["luma"]
+        self.counters[verdict] += 1
+        return verdict
+
+    def remember(self, description: str, focused: bool = False):
+        """Record the vision result, and whether it was judged focused, for the last llm frame."""
+        self.last_description = description
+        self.last_focused = focused
+
+    def features(self, image: FrameData) -> Optional[Dict[str, Any]]:
+        """Brightness, centre skin ratio and motion vs. the last analysed frame."""
+        if not self.enabled:
+            return None
+        raw = frame_bytes(image)
+        if not raw:
+            return None
+        import numpy as np
+        from PIL import Image
+
+        try:
+            img = Image.open(io.BytesIO(raw))
+            img.draft("YCbCr", (ANALYSIS_SIZE[0] * 2, ANALYSIS_SIZE[1] * 2))
+            ycbcr = np.asarray(img.convert("YCbCr").resize(ANALYSIS_SIZE), dtype=np.float32)
+        except Exception:
+            return None
+
+        luma, cb, cr = ycbcr[..., 0], ycbcr[..., 1], ycbcr[..., 2]
+
+        # Skin tones cluster tightly in CbCr regardless of brightness
+        height, width = luma.shape
+        centre = (slice(height // 6, height * 5 // 6), slice(width // 5, width * 4 // 5))
+        skin = (cb[centre] >= 77) & (cb[centre] <= 127) & (cr[centre] >= 133) & (cr[centre] <= 173)
+
+        motion = None
+        if self.last_luma is not None and self.last_luma.shape == luma.shape:
+            motion = float(np.abs(luma - self.last_luma).mean())
+
+        return {
+            "luma": luma,
+            "brightness": float(luma.mean()),
+            "skin_ratio": float(skin.mean()),
+            "motion": motion,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
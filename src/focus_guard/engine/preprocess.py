@@ -0,0 +1,124 @@
+"""
+FocusGuard AI - Frame Preprocessing
+Downscales and re-encodes webcam frames before the vision call.
+Smaller frames upload faster and come back from the vision model sooner.
+"""
+
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from typing import Any, Dict, Tuple
+
+from .protocol import FrameData, frame_bytes
+
+# Optional: Pillow for JPEG decoding, imported on first frame (frames pass through untouched without it)
+PIL_AVAILABLE = find_spec("PIL") is not None
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+PREPROCESS_ENABLED = os.getenv("FOCUS_PREPROCESS", "1") != "0"
+# Longest side after downscaling; the vision model doesn't need full webcam resolution
+FRAME_MAX_SIDE = int(os.getenv("FOCUS_FRAME_MAX_SIDE", "512"))
+FRAME_QUALITY = int(os.getenv("FOCUS_FRAME_QUALITY", "60"))
+# Fraction of width/height kept around the centre (1.0 = no crop)
+FRAME_CROP = float(os.getenv("FOCUS_FRAME_CROP", "1.0"))
+# Pillow releases the GIL while decoding/resizing/encoding, so threads scale
+PREPROCESS_WORKERS = int(os.getenv("FOCUS_PREPROCESS_WORKERS", "2"))
+
+
+# =============================================================================
+# Preprocessor
+# =============================================================================
+
+class FramePreprocessor:
+    """Crop/downscale/re-encode stage with its own bounded worker pool."""
+
+    def __init__(self, max_side: int = FRAME_MAX_SIDE, quality: int = FRAME_QUALITY,
+                 crop: float = FRAME_CROP, workers: int = PREPROCESS_WORKERS):
+        self.max_side = max_side
+        self.quality = quality
+        self.crop = min(1.0, max(0.1, crop))
+        self.enabled = PIL_AVAILABLE
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="focus-preprocess")
+        self._lock = threading.Lock()
+        self.counters = {"frames": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0, "time_ms": 0.0}
+
+    async def run(self, image: FrameData) -> Tuple[FrameData, Dict[str, Any]]:
+        """Preprocess on the worker pool; returns the frame to send and per-frame stats."""
+        if not self.enabled:
+            return image, {}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self.process, image)
+
+    async def submit(self, func, *args):
+        """Run other per-frame CPU work (e.g. pre-classification) on the same pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, func, *args)
+
+    def process(self, image: FrameData) -> Tuple[FrameData, Dict[str, Any]]:
+        """Decode, crop, downscale and re-encode one frame (blocking)."""
+        started = time.perf_counter()
+        raw = frame_bytes(image)
+        if not raw:
+            return image, {}
+
+        try:
+            output = self._reencode(raw)
+        except Exception:
+            output = None
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        # Keep the original if it was already smaller than what we'd produce
+        if output is None or len(output) >= len(raw):
+            with self._lock:
+                self.counters["skipped"] += 1
+                self.counters["time_ms"] += elapsed_ms
+            return image, {"preprocess_ms": elapsed_ms, "bytes_saved": 0}
+
+        saved = len(raw) - len(output)
+        with self._lock:
+            self.counters["frames"] += 1
+            self.counters["bytes_in"] += len(raw)
+            self.counters["bytes_out"] += len(output)
+            self.counters["time_ms"] += elapsed_ms
+        return output, {"preprocess_ms": elapsed_ms, "bytes_saved": saved}
+
+    def _reencode(self, raw: bytes) -> bytes:
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(raw))
+        # JPEG DCT scaling: decode at (at least) the target size instead of full size
+        img.draft("RGB", (self.max_side, self.max_side))
+        img = img.convert("RGB")
+
+        if self.crop < 1.0:
+            width, height = img.size
+            keep_w, keep_h = int(width * self.crop), int(height * self.crop)
+            left, top = (width - keep_w) // 2, (height - keep_h) // 2
+            img = img.crop((left, top, left + keep_w, top + keep_h))
+
+        img.thumbnail((self.max_side, self.max_side), Image.BILINEAR)
+
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=self.quality, optimize=False)
+        return buffer.getvalue()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cumulative bytes saved and time spent."""
+        with self._lock:
+            counters = dict(self.counters)
+        processed = counters["frames"] + counters["skipped"]
+        counters["bytes_saved"] = counters["bytes_in"] - counters["bytes_out"]
+        counters["avg_ms"] = round(counters["time_ms"] / processed, 2) if processed else 0.0
+        counters["time_ms"] = round(counters["time_ms"], 1)
+        return counters
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
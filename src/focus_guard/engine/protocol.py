@@ -0,0 +1,113 @@
+"""
+FocusGuard AI - Focus WebSocket Protocol
+Versioned binary frame messages for /ws/focus (JSON messages remain supported).
+
+Binary layout (network byte order):
+
+    0      2        3      4              6                 6+N
+    +------+--------+------+--------------+-----------------+-----------+
+    | "FG" | version| type | reason len N | reason (UTF-8)  | JPEG ...  |
+    +------+--------+------+--------------+-----------------+-----------+
+
+Server-side TTS audio goes the other way in the same layout (type 2), with a
+JSON header ({"id", "seq", "last", "mime"}) in place of the reason and a chunk
+of the encoded clip as the payload.
+"""
+
+import base64
+import binascii
+import json
+import struct
+from typing import NamedTuple, Optional, Union
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+MAGIC = b"FG"
+PROTOCOL_VERSION = 1
+
+MSG_FRAME = 1
+MSG_AUDIO = 2
+
+HEADER = struct.Struct("!2sBBH")
+
+# Anything a frame may arrive as: base64 text (legacy JSON) or raw JPEG bytes
+FrameData = Union[str, bytes, bytearray, memoryview]
+
+
+class ProtocolError(ValueError):
+    """Malformed binary message."""
+
+
+class FrameMessage(NamedTuple):
+    version: int
+    kind: int
+    reason: str
+    image: memoryview
+
+
+# =============================================================================
+# Encoding / Decoding
+# =============================================================================
+
+def encode_frame(jpeg: bytes, reason: str = "") -> bytes:
+    """Build a binary frame message (used by tests and benchmarks; the browser does the same)."""
+    reason_bytes = reason.encode("utf-8")
+    return HEADER.pack(MAGIC, PROTOCOL_VERSION, MSG_FRAME, len(reason_bytes)) + reason_bytes + jpeg
+
+
+def encode_audio(clip_id: int, seq: int, last: bool, mime: str, chunk: bytes) -> bytes:
+    """Build one server-to-client audio chunk message."""
+    meta = json.dumps({"id": clip_id, "seq": seq, "last": last, "mime": mime}).encode("utf-8")
+    return HEADER.pack(MAGIC, PROTOCOL_VERSION, MSG_AUDIO, len(meta)) + meta + chunk
+
+
+def decode_audio(data: Union[bytes, memoryview]):
+    """(header dict, chunk) for an audio message (used by tests and benchmarks; the browser does the same)."""
+    message = decode_message(data, kinds=(MSG_AUDIO,))
+    return json.loads(message.reason), message.image
+
+
+def decode_message(data: Union[bytes, memoryview], kinds: tuple = (MSG_FRAME,)) -> FrameMessage:
+    """Parse a binary message without copying the JPEG payload."""
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ProtocolError("message shorter than header")
+
+    magic, version, kind, reason_len = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ProtocolError("bad magic")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"unsupported protocol version {version}")
+    if kind not in kinds:
+        raise ProtocolError(f"unknown message type {kind}")
+
+    start = HEADER.size + reason_len
+    if len(view) < start:
+        raise ProtocolError("truncated reason")
+
+    reason = str(view[HEADER.size:start], "utf-8", "replace")
+    return FrameMessage(version, kind, reason, view[start:])
+
+
+# =============================================================================
+# Frame Helpers
+# =============================================================================
+
+def frame_bytes(image: FrameData) -> Optional[bytes]:
+    """Raw JPEG bytes for a frame in either representation (None if malformed)."""
+    if isinstance(image, str):
+        try:
+            return base64.b64decode(image, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+    return image
+
+
+def frame_base64(image: FrameData) -> str:
+    """Base64 text for a frame in either representation (for the Groq data URL)."""
+    if isinstance(image, str):
+        return image
+    return base64.b64encode(image).decode("ascii")
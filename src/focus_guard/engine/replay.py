@@ -0,0 +1,373 @@
+"""
+FocusGuard AI - Record/Replay Response Store
+Sits between the agents and the Groq / Gemini SDK clients. With FOCUS_REPLAY=record
+every successful model call is appended to an on-disk log; with
+FOCUS_REPLAY=replay the same calls are answered from that log, with no network or
+API key, after the recorded latency times FOCUS_REPLAY_SPEED (0 = no waiting).
+
+A request's fingerprint is the model, the prompt text and the SHA-256 of each
+frame, so the same frame and prompt always find the same recording. Calls seen
+several times while recording are replayed in their recorded order, wrapping around.
+
+On disk (FOCUS_REPLAY_DIR):
+    responses.log  records of [uint32 length][zlib-compressed JSON], append-only
+    responses.idx  one [32-byte fingerprint][uint64 offset][uint32 length] entry per record
+The index is rebuilt from the log if it is missing or behind (e.g. after a crash).
+Record with a single server worker; the log has no cross-process locking.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from .protocol import frame_bytes
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+DATA_DIR = os.getenv("FOCUS_DATA_DIR", ".focusguard")
+
+REPLAY_MODE = os.getenv("FOCUS_REPLAY", "off")  # off | record | replay
+REPLAY_DIR = os.getenv("FOCUS_REPLAY_DIR", os.path.join(DATA_DIR, "replay"))
+# Multiplier on recorded latencies when replaying (0.5 = twice as fast, 0 = instant)
+REPLAY_SPEED = float(os.getenv("FOCUS_REPLAY_SPEED", "1.0"))
+
+RECORD = "record"
+REPLAY = "replay"
+
+LOG_NAME = "responses.log"
+INDEX_NAME = "responses.idx"
+LENGTH = struct.Struct(">I")
+INDEX_ENTRY = struct.Struct(">32sQI")
+
+
+class ReplayMiss(LookupError):
+    """Replay mode and nothing was recorded for this request."""
+
+
+# =============================================================================
+# Fingerprints
+# =============================================================================
+
+def _canonical(value: Any) -> Any:
+    """JSON-able form of a request with every image replaced by its hash."""
+    if isinstance(value, dict):
+        if value.get("type") == "image_url":
+            url = value.get("image_url", {}).get("url", "")
+            data = url.split(",", 1)[1] if url.startswith("data:") else url
+            return {"image": hashlib.sha256(bytes(frame_bytes(data) or data.encode("utf-8"))).hexdigest()}
+        return {key: _canonical(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"image": hashlib.sha256(bytes(value)).hexdigest()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # google-genai Content / Part objects
+    inline = getattr(value, "inline_data", None)
+    if inline is not None and getattr(inline, "data", None) is not None:
+        return {"image": hashlib.sha256(bytes(inline.data)).hexdigest()}
+    if getattr(value, "text", None) is not None:
+        return value.text
+    if getattr(value, "parts", None) is not None:
+        return [_canonical(part) for part in value.parts]
+    return repr(value)
+
+
+def fingerprint(model: str, prompt: Any, **options) -> bytes:
+    """32-byte key for a model call: model, prompt (frames as hashes) and output-shaping options."""
+    payload = json.dumps({"model": model, "prompt": _canonical(prompt), "options": _canonical(options)},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class ResponseStore:
+    """Append-only log of recorded responses plus a fixed-width index, loaded into memory."""
+
+    def __init__(self, directory: str = REPLAY_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self._lock = threading.Lock()
+        self._index = {}  # fingerprint -> [(offset, length), ...] in recording order
+        self._cursor = {}  # fingerprint -> next recording to replay
+        self.counters = {"recorded": 0, "hits": 0, "misses": 0}
+        self._load()
+        self._log = open(self.log_path, "ab")
+        self._idx = open(self.index_path, "ab")
+
+    def _load(self):
+        indexed_end = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+            usable = len(raw) - len(raw) % INDEX_ENTRY.size
+            for key, offset, length in INDEX_ENTRY.iter_unpack(raw[:usable]):
+                self._index.setdefault(key, []).append((offset, length))
+                indexed_end = max(indexed_end, offset + length)
+            if usable != len(raw):
+                with open(self.index_path, "r+b") as f:
+                    f.truncate(usable)
+
+        log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if log_size > indexed_end:
+            self._recover(indexed_end, log_size)
+
+    def _recover(self, start: int, end: int):
+        """Index records written after the last index entry (the index write didn't happen)."""
+        entries = []
+        with open(self.log_path, "rb") as f:
+            f.seek(start)
+            offset = start
+            while offset + LENGTH.size <= end:
+                (size,) = LENGTH.unpack(f.read(LENGTH.size))
+                body = f.read(size)
+                if len(body) < size:
+                    break  # torn final write
+                try:
+                    record = json.loads(zlib.decompress(body))
+                except (zlib.error, ValueError):
+                    break
+                length = LENGTH.size + size
+                key = bytes.fromhex(record["fp"])
+                self._index.setdefault(key, []).append((offset, length))
+                entries.append(INDEX_ENTRY.pack(key, offset, length))
+                offset += length
+        if offset < end:
+            print(f"Warning: Dropping {end - offset} unreadable bytes at the end of {self.log_path}")
+            with open(self.log_path, "r+b") as f:
+                f.truncate(offset)
+        with open(self.index_path, "ab") as f:
+            f.write(b"".join(entries))
+
+    def put(self, key: bytes, record: Dict[str, Any]):
+        """Append one recording."""
+        body = zlib.compress(json.dumps(dict(record, fp=key.hex()), separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            offset = self._log.tell()
+            self._log.write(LENGTH.pack(len(body)) + body)
+            self._log.flush()
+            length = LENGTH.size + len(body)
+            # Index entry last: a crash in between is repaired from the log on the next open
+            self._idx.write(INDEX_ENTRY.pack(key, offset, length))
+            self._idx.flush()
+            self._index.setdefault(key, []).append((offset, length))
+            self.counters["recorded"] += 1
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """Next recording for this fingerprint (cycling through repeats), or None."""
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                self.counters["misses"] += 1
+                return None
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = (position + 1) % len(entries)
+            self.counters["hits"] += 1
+            offset, length = entries[position]
+        with open(self.log_path, "rb") as f:
+            f.seek(offset + LENGTH.size)
+            return json.loads(zlib.decompress(f.read(length - LENGTH.size)))
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._index.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, requests=len(self._index), recordings=len(self), directory=self.directory)
+
+    def close(self):
+        with self._lock:
+            self._log.close()
+            self._idx.close()
+
+
+# =============================================================================
+# Client Wrappers
+# =============================================================================
+
+def _completion(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _chunk(delta: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+
+class _Player:
+    """Waits out recorded latencies, scaled, and within the caller's timeout."""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+
+    def wait_until(self, started: float, offset: float, timeout: Optional[float]):
+        due = offset * self.speed
+        if timeout is not None and due > timeout:
+            time.sleep(max(0.0, started + timeout - time.monotonic()))
+            raise TimeoutError(f"recorded response took {offset:.2f}s (timeout {timeout:.2f}s)")
+        remaining = started + due - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class ReplayCompletions:
+    """Stands in for ``client.chat.completions`` of the Groq SDK."""
+
+    def __init__(self, client, store: ResponseStore, mode: str, speed: float):
+        self._client = client
+        self._store = store
+        self._mode = mode
+        self._player = _Player(speed)
+
+    def create(self, model: str, messages: List[Dict[str, Any]], stream: bool = False,
+               timeout: Optional[float] = None, **kwargs):
+        key = fingerprint(model, messages, response_format=kwargs.get("response_format"))
+        if self._mode == REPLAY:
+            record = self._store.get(key)
+            if record is None:
+                raise ReplayMiss(f"no recorded response for {model}")
+            return self._replay_stream(record, timeout) if stream else self._replay(record, timeout)
+
+        started = time.monotonic()
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        response = self._client.chat.completions.create(model=model, messages=messages, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(key, model, response, started)
+        self._store.put(key, {"model": model, "latency": time.monotonic() - started,
+                              "content": response.choices[0].message.content, "chunks": None})
+        return response
+
+    def _replay(self, record: Dict[str, Any], timeout: Optional[float]):
+        started = time.monotonic()
+        chunks = record["chunks"]
+        self._player.wait_until(started, chunks[-1][0] if chunks else record["latency"], timeout)
+        return _completion(record["content"])
+
+    def _replay_stream(self, record: Dict[str, Any], timeout: Optional[float]) -> Iterator[SimpleNamespace]:
+        started = time.monotonic()
+        chunks = record["chunks"] or [[record["latency"], record["content"]]]
+        # Time to first token counts against the timeout, as with the real SDK
+        self._player.wait_until(started, chunks[0][0], timeout)
+
+        def play():
+            for offset, delta in chunks:
+                self._player.wait_until(started, offset, None)
+                yield _chunk(delta)
+        return play()
+
+    def _record_stream(self, key: bytes, model: str, stream, started: float) -> Iterator[SimpleNamespace]:
+        chunks = []
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    chunks.append([time.monotonic() - started, delta])
+                yield chunk
+        finally:
+            # Also on early exit (fused mode stops at the closing brace): what was read is what gets replayed
+            if chunks:
+                self._store.put(key, {"model": model, "latency": chunks[0][0],
+                                      "content": "".join(delta for _, delta in chunks), "chunks": chunks})
+
+
+class ReplayGroqClient:
+    """Groq client wrapper: records or replays ``chat.completions.create``."""
+
+    def __init__(self, client, store: ResponseStore, mode: str, speed: float = REPLAY_SPEED):
+        self._client = client
+        self.chat = SimpleNamespace(completions=ReplayCompletions(client, store, mode, speed))
+
+    def __getattr__(self, name):
+        if self._client is None:
+            raise AttributeError(name)
+        return getattr(self._client, name)
+
+
+class ReplayGeminiModels:
+    """Stands in for ``client.models`` of google-genai."""
+
+    def __init__(self, client, store: ResponseStore, mode: str, speed: float):
+        self._client = client
+        self._store = store
+        self._mode = mode
+        self._player = _Player(speed)
+
+    def generate_content(self, model: str, contents: Any, config: Any = None, **kwargs):
+        key = fingerprint(model, contents)
+        if self._mode == REPLAY:
+            record = self._store.get(key)
+            if record is None:
+                raise ReplayMiss(f"no recorded response for {model}")
+            timeout = getattr(getattr(config, "http_options", None), "timeout", None)
+            self._player.wait_until(time.monotonic(), record["latency"], timeout / 1000 if timeout else None)
+            return SimpleNamespace(text=record["content"])
+
+        started = time.monotonic()
+        response = self._client.models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        if response.text:
+            self._store.put(key, {"model": model, "latency": time.monotonic() - started,
+                                  "content": response.text, "chunks": None})
+        return response
+
+
+class ReplayGeminiClient:
+    """google-genai client wrapper: records or replays ``models.generate_content``."""
+
+    def __init__(self, client, store: ResponseStore, mode: str, speed: float = REPLAY_SPEED):
+        self._client = client
+        self.models = ReplayGeminiModels(client, store, mode, speed)
+
+
+# =============================================================================
+# Process-wide Store
+# =============================================================================
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def replay_store(mode: str = None) -> Optional[ResponseStore]:
+    """The process-wide ResponseStore when FOCUS_REPLAY is record or replay, else None."""
+    global _store
+    mode = REPLAY_MODE if mode is None else mode
+    if mode not in (RECORD, REPLAY):
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ResponseStore()
+        return _store
+
+
+def wrap_groq_client(client, mode: str = None):
+    """``client`` behind the record/replay layer (unchanged when FOCUS_REPLAY is off)."""
+    mode = REPLAY_MODE if mode is None else mode
+    store = replay_store(mode)
+    return ReplayGroqClient(client, store, mode, REPLAY_SPEED) if store is not None else client
+
+
+def wrap_gemini_client(client, mode: str = None):
+    """Same as wrap_groq_client, for google-genai clients."""
+    mode = REPLAY_MODE if mode is None else mode
+    store = replay_store(mode)
+    return ReplayGeminiClient(client, store, mode, REPLAY_SPEED) if store is not None else client
+
+
+def close_replay_store():
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
@@ -0,0 +1,146 @@
+"""
+FocusGuard AI - Roast Pool
+Per-activity ring buffers of pre-generated, safety-checked roasts.
+Repeat distractions are served instantly instead of waiting on Reasoning + Safety.
+"""
+
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+ROAST_POOL_ENABLED = os.getenv("FOCUS_ROAST_POOL", "1") != "0"
+ROAST_POOL_CAPACITY = int(os.getenv("FOCUS_ROAST_POOL_CAPACITY", "6"))
+ROAST_POOL_LOW_WATER = int(os.getenv("FOCUS_ROAST_POOL_LOW_WATER", "2"))
+# Share of requests that skip the pool and get a fresh roast anyway
+ROAST_POOL_FRESH_RATIO = float(os.getenv("FOCUS_ROAST_POOL_FRESH_RATIO", "0.2"))
+
+# Activity classes, checked in order; first keyword match wins
+ACTIVITY_KEYWORDS = {
+    "tab_switch": ("switched tab", "tabs/windows", "tab switch", "alt+tab"),
+    "sleeping": ("sleep", "eyes closed", "dozing", "napping", "head down"),
+    "phone": ("phone", "scrolling", "texting", "smartphone"),
+    "away": ("away", "no one", "nobody", "empty", "not present", "left the", "absent"),
+}
+DEFAULT_CLASS = "other"
+
+# Prompts used when refilling a class in the background
+CLASS_PROMPTS = {
+    "tab_switch": "User switched tabs/windows instead of working",
+    "sleeping": "The person appears to be sleeping at their desk",
+    "phone": "The person is looking at their phone instead of the screen",
+    "away": "The person is away from their desk",
+    "other": "The person is distracted and not focused on the screen",
+}
+
+
+def classify_activity(text: str) -> str:
+    """Map a vision description or trigger reason to an activity class."""
+    lowered = (text or "").lower()
+    for activity, keywords in ACTIVITY_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return activity
+    return DEFAULT_CLASS
+
+
+# =============================================================================
+# Pool
+# =============================================================================
+
+class RoastPool:
+    """Serves pre-approved roasts per activity class and refills in the background."""
+
+    def __init__(self, generate: Callable[[str], str], check_safety: Callable[[str], Optional[bool]],
+                 capacity: int = ROAST_POOL_CAPACITY, low_water: int = ROAST_POOL_LOW_WATER,
+                 fresh_ratio: float = ROAST_POOL_FRESH_RATIO):
+        self.generate = generate
+        self.check_safety = check_safety
+        self.capacity = capacity
+        self.low_water = low_water
+        self.fresh_ratio = fresh_ratio
+        self._buffers = {activity: deque(maxlen=capacity) for activity in CLASS_PROMPTS}
+        self._refilling = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="focus-roast-pool")
+        self.counters = {"hits": 0, "misses": 0, "fresh": 0, "refilled": 0, "rejected": 0}
+        # Called with each roast that enters the pool (e.g. to render its audio ahead of time)
+        self.on_add: Optional[Callable[[str], None]] = None
+
+    def take(self, activity: str, allow_fresh: bool = True) -> Optional[str]:
+        """Pop a ready roast for this class, or None if the caller should generate one.
+
+        allow_fresh=False skips the fresh-roast roll (used when there's no time to generate).
+        """
+        activity = activity if activity in self._buffers else DEFAULT_CLASS
+        with self._lock:
+            if allow_fresh and self.fresh_ratio and random.random() < self.fresh_ratio:
+                self.counters["fresh"] += 1
+                roast = None
+            elif self._buffers[activity]:
+                self.counters["hits"] += 1
+                roast = self._buffers[activity].popleft()
+            else:
+                self.counters["misses"] += 1
+                roast = None
+            low = len(self._buffers[activity]) < self.low_water
+
+        if low:
+            self.refill(activity)
+        return roast
+
+    def add(self, activity: str, roast: str):
+        """Store an already safety-checked roast (oldest is dropped when full)."""
+        activity = activity if activity in self._buffers else DEFAULT_CLASS
+        with self._lock:
+            if roast in self._buffers[activity]:
+                return
+            self._buffers[activity].append(roast)
+        if self.on_add is not None:
+            self.on_add(roast)
+
+    def refill(self, activity: str):
+        """Top up a class in the background (no-op if a refill is already queued)."""
+        with self._lock:
+            if activity in self._refilling:
+                return
+            self._refilling.add(activity)
+        self._pool.submit(self._refill, activity)
+
+    def warm(self):
+        """Queue a refill for every class."""
+        for activity in self._buffers:
+            self.refill(activity)
+
+    def _refill(self, activity: str):
+        try:
+            prompt = CLASS_PROMPTS[activity]
+            attempts = self.capacity * 2
+            while len(self._buffers[activity]) < self.capacity and attempts > 0:
+                attempts -= 1
+                roast = self.generate(prompt)
+                # Only an explicit "safe" verdict gets in; None means the check failed
+                if not roast or self.check_safety(roast) is not True:
+                    self.counters["rejected"] += 1
+                    continue
+                self.add(activity, roast)
+                self.counters["refilled"] += 1
+        finally:
+            with self._lock:
+                self._refilling.discard(activity)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and per-class fill levels."""
+        return dict(
+            self.counters,
+            sizes={activity: len(buffer) for activity, buffer in self._buffers.items()},
+        )
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,347 @@
+"""
+FocusGuard AI - Vision Backend Router
+Sends each vision request to whichever backend/model is fastest right now, from
+rolling latency and error stats, and optionally hedges slow requests.
+
+    FOCUS_VISION_BACKENDS=groq:meta-llama/llama-4-scout-17b-16e-instruct,gemini:gemini-2.0-flash
+
+Hedging: when the chosen backend hasn't answered after its p95 latency, the
+same request goes to the next-best backend; the first answer wins and the
+other is cancelled (dropped if still queued, ignored if already on the wire).
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional
+
+from .deadline import deadline_scope
+from .protocol import FrameData, frame_bytes
+from .replay import REPLAY, REPLAY_MODE, wrap_gemini_client
+
+# Optional: google-genai for the Gemini backend
+GEMINI_AVAILABLE = find_spec("google") is not None and find_spec("google.genai") is not None
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Comma-separated backend:model list; empty keeps the single Groq vision model (no router)
+VISION_BACKENDS = os.getenv("FOCUS_VISION_BACKENDS", "")
+HEDGE_ENABLED = os.getenv("FOCUS_HEDGE", "0") == "1"
+# Hedge after this latency quantile of the primary backend...
+HEDGE_QUANTILE = float(os.getenv("FOCUS_HEDGE_QUANTILE", "0.95"))
+# ...but never sooner than this (seconds), and after this while the backend has no history
+HEDGE_MIN_DELAY = float(os.getenv("FOCUS_HEDGE_MIN_DELAY", "0.05"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("FOCUS_HEDGE_DEFAULT_DELAY", "1.0"))
+
+# Requests remembered per backend
+ROUTER_WINDOW = int(os.getenv("FOCUS_ROUTER_WINDOW", "100"))
+# Backends with fewer samples than this are tried first, so each gets measured
+ROUTER_MIN_SAMPLES = int(os.getenv("FOCUS_ROUTER_MIN_SAMPLES", "5"))
+# Share of requests sent to a random backend, so stats of slower ones stay fresh
+ROUTER_EXPLORE = float(os.getenv("FOCUS_ROUTER_EXPLORE", "0.05"))
+ROUTER_WORKERS = int(os.getenv("FOCUS_ROUTER_WORKERS", "16"))
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+VISION_PROMPT = "Describe what the person is doing. Are they focused on screen, looking at phone, sleeping, or away?"
+
+
+class NoBackendAvailable(RuntimeError):
+    """Every backend failed (or there was no time left to try another)."""
+
+
+# =============================================================================
+# Rolling Stats
+# =============================================================================
+
+class LatencyStats:
+    """Latency and outcome of the last ``window`` requests to one backend/model."""
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self._samples = deque(maxlen=window)  # (seconds, ok)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self.in_flight -= 1
+            self._samples.append((seconds, ok))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Latency quantile of successful requests (None without any)."""
+        with self._lock:
+            latencies = sorted(seconds for seconds, ok in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(not ok for _, ok in self._samples) / len(self._samples)
+
+    def expected(self) -> float:
+        """Median latency inflated by the error rate: the expected cost of sending a request here."""
+        median = self.quantile(0.5)
+        if median is None:
+            return float("inf") if self._samples else 0.0
+        return median / max(0.05, 1.0 - self.error_rate())
+
+    def snapshot(self) -> Dict[str, Any]:
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+        return {
+            "samples": len(self),
+            "p50_ms": ms(self.quantile(0.5)),
+            "p95_ms": ms(self.quantile(0.95)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "error_rate": round(self.error_rate(), 3),
+            "in_flight": self.in_flight,
+        }
+
+
+# =============================================================================
+# Backends
+# =============================================================================
+
+class VisionBackend:
+    """One provider + model that turns a frame into an activity description."""
+
+    provider = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    def describe(self, image: FrameData, timeout: Optional[float] = None) -> str:
+        """Blocking call; raises on any failure."""
+        raise NotImplementedError
+
+
+class GroqVisionBackend(VisionBackend):
+    """A Groq vision model, through the agent's pooled client."""
+
+    provider = "groq"
+
+    def __init__(self, agent, model: str = None):
+        super().__init__(model or agent.vision_model)
+        self.agent = agent
+
+    def describe(self, image: FrameData, timeout: Optional[float] = None) -> str:
+        return self.agent.groq_vision(image, timeout, model=self.model)
+
+
+class GeminiVisionBackend(VisionBackend):
+    """A Gemini model via google-genai (``pip install google-genai``, GEMINI_API_KEY)."""
+
+    provider = "gemini"
+
+    def __init__(self, model: str = "gemini-2.0-flash", api_key: str = None):
+        super().__init__(model)
+        self.api_key = api_key or GEMINI_API_KEY
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from .transport import gemini_client
+                self._client = wrap_gemini_client(gemini_client(self.api_key) if self.api_key else None)
+            return self._client
+
+    def describe(self, image: FrameData, timeout: Optional[float] = None) -> str:
+        from google.genai import types
+
+        config = None
+        if timeout is not None:
+            config = types.GenerateContentConfig(http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+        response = self._get_client().models.generate_content(
+            model=self.model,
+            contents=[types.Content(role="user", parts=[
+                types.Part.from_text(text=VISION_PROMPT),
+                types.Part.from_bytes(data=bytes(frame_bytes(image) or b""), mime_type="image/jpeg"),
+            ])],
+            config=config,
+        )
+        if not response.text:
+            raise ValueError("empty Gemini response")
+        return response.text
+
+
+def create_backends(agent, spec: str = VISION_BACKENDS) -> List[VisionBackend]:
+    """Backends from ``provider:model`` entries; unavailable ones are skipped with a warning."""
+    backends = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        provider, _, model = entry.partition(":")
+        if provider == "groq":
+            backends.append(GroqVisionBackend(agent, model or None))
+        elif provider == "gemini":
+            if not GEMINI_AVAILABLE or not (GEMINI_API_KEY or REPLAY_MODE == REPLAY):
+                print("Warning: Gemini vision backend needs google-genai and GEMINI_API_KEY. Skipping it.")
+                continue
+            backends.append(GeminiVisionBackend(model or "gemini-2.0-flash"))
+        else:
+            print(f"Warning: Unknown vision backend {entry!r}. Skipping it.")
+    return backends
+
+
+# =============================================================================
+# Router
+# =============================================================================
+
+class BackendRouter:
+    """Latency-aware choice among backends, with optional hedged requests."""
+
+    def __init__(self, backends: List[VisionBackend], hedge: bool = HEDGE_ENABLED,
+                 hedge_quantile: float = HEDGE_QUANTILE, hedge_min_delay: float = HEDGE_MIN_DELAY,
+                 hedge_default_delay: float = HEDGE_DEFAULT_DELAY, window: int = ROUTER_WINDOW,
+                 min_samples: int = ROUTER_MIN_SAMPLES, explore: float = ROUTER_EXPLORE,
+                 workers: int = ROUTER_WORKERS):
+        if not backends:
+            raise ValueError("BackendRouter needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.min_samples = min_samples
+        self.explore = explore
+        self.stats_by_key = {backend.key: LatencyStats(window) for backend in backends}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="focus-router")
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "cancelled": 0}
+
+    def rank(self) -> List[VisionBackend]:
+        """Backends best first: unmeasured ones, then by expected latency."""
+        def score(backend):
+            stats = self.stats_by_key[backend.key]
+            return (len(stats) >= self.min_samples, stats.expected(), stats.in_flight)
+
+        ranked = sorted(self.backends, key=score)
+        if len(ranked) > 1 and self.explore and random.random() < self.explore:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def hedge_delay(self, backend: VisionBackend) -> float:
+        stats = self.stats_by_key[backend.key]
+        if len(stats) < self.min_samples:
+            return self.hedge_default_delay
+        delay = stats.quantile(self.hedge_quantile)
+        return max(self.hedge_min_delay, delay if delay is not None else self.hedge_default_delay)
+
+    def call(self, image: FrameData, timeout: Optional[float] = None) -> str:
+        """Description from the first backend to answer; raises NoBackendAvailable."""
+        self.counters["requests"] += 1
+        expires = time.monotonic() + timeout if timeout is not None else None
+        queue = self.rank()
+        running = {}  # future -> backend
+        errors = []
+
+        def launch():
+            backend = queue.pop(0)
+            running[self._submit(backend, image, expires)] = backend
+            return backend
+
+        primary = launch()
+        # With one backend, a hedge is a second request to it
+        hedge_target = queue[0] if queue else primary
+        hedge_at = time.monotonic() + self.hedge_delay(primary) if self.hedge else None
+
+        while running:
+            now = time.monotonic()
+            if expires is not None and now >= expires:
+                break
+            wake = [t for t in (hedge_at, expires) if t is not None]
+            done, _ = wait(list(running), timeout=max(0.0, min(wake) - now) if wake else None,
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                backend = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    if backend is not primary:
+                        self.counters["hedge_wins"] += 1
+                    self._cancel(running)
+                    return future.result()
+                errors.append(f"{backend.key}: {error}")
+
+            if hedge_at is not None and time.monotonic() >= hedge_at and running:
+                # Primary is slower than usual: race it against the next-best backend
+                hedge_at = None
+                self.counters["hedged"] += 1
+                if queue and queue[0] is hedge_target:
+                    launch()
+                else:
+                    running[self._submit(hedge_target, image, expires)] = hedge_target
+            elif not running and queue:
+                # Everything so far failed: fail over to the next backend
+                self.counters["failovers"] += 1
+                hedge_at = None
+                launch()
+
+        self._cancel(running)
+        raise NoBackendAvailable("; ".join(errors) or "vision backends timed out")
+
+    def _submit(self, backend: VisionBackend, image: FrameData, expires: Optional[float]) -> Future:
+        stats = self.stats_by_key[backend.key]
+
+        def run():
+            timeout = max(0.0, expires - time.monotonic()) if expires is not None else None
+            stats.start()
+            started = time.perf_counter()
+            ok = False
+            try:
+                # Transport retries on this worker thread stay within the caller's deadline
+                with deadline_scope(expires):
+                    description = backend.describe(image, timeout)
+                ok = True
+                return description
+            finally:
+                # Losers of a hedge are recorded too, so the stats see the real tail
+                stats.record(time.perf_counter() - started, ok)
+
+        return self._pool.submit(run)
+
+    def _cancel(self, running: Dict[Future, VisionBackend]):
+        """Drop requests still queued; ones already sent finish in the background and are ignored."""
+        for future in running:
+            if future.cancel():
+                self.counters["cancelled"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            self.counters,
+            hedge=self.hedge,
+            backends={key: stats.snapshot() for key, stats in self.stats_by_key.items()},
+        )
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_vision_router(agent, spec: str = VISION_BACKENDS) -> Optional[BackendRouter]:
+    """Router for FOCUS_VISION_BACKENDS, or None when there's one backend and no hedging."""
+    if not spec and HEDGE_ENABLED:
+        # Hedge the default Groq vision model against itself
+        spec = f"groq:{agent.vision_model}"
+    backends = create_backends(agent, spec)
+    if not backends or (len(backends) == 1 and not HEDGE_ENABLED):
+        return None
+    return BackendRouter(backends)
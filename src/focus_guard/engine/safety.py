@@ -0,0 +1,220 @@
+"""
+FocusGuard AI - Safety Subsystem
+Verdict cache (persisted to SQLite) and a micro-batcher for Llama Guard checks.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from .deadline import deadline_scope
+from .shared import SharedBackend
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+DATA_DIR = os.getenv("FOCUS_DATA_DIR", ".focusguard")
+
+SAFETY_CACHE_PATH = os.getenv("FOCUS_SAFETY_CACHE_PATH", os.path.join(DATA_DIR, "safety_verdicts.db"))
+SAFETY_CACHE_SIZE = int(os.getenv("FOCUS_SAFETY_CACHE_SIZE", "5000"))
+# Longest a write-through waits for another worker's lock on the cache file (then it is skipped)
+SAFETY_CACHE_BUSY_TIMEOUT = float(os.getenv("FOCUS_SAFETY_CACHE_BUSY_TIMEOUT", "0.25"))
+
+# Roasts arriving within this window are moderated in one request
+SAFETY_BATCH_WINDOW = float(os.getenv("FOCUS_SAFETY_BATCH_WINDOW", "0.02"))
+SAFETY_BATCH_MAX = int(os.getenv("FOCUS_SAFETY_BATCH_MAX", "8"))
+# Hard budget for a safety verdict, including time spent waiting for the batch
+SAFETY_TIMEOUT = float(os.getenv("FOCUS_SAFETY_TIMEOUT", "1.5"))
+# Verdict used when moderation errors out or runs past the budget
+SAFETY_FAIL_OPEN = os.getenv("FOCUS_SAFETY_FAIL_OPEN", "1") != "0"
+
+
+def content_key(text: str) -> str:
+    """Stable hash of the normalised roast text."""
+    normalised = " ".join(text.split()).lower()
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# Verdict Cache
+# =============================================================================
+
+class VerdictCache:
+    """Bounded LRU of safety verdicts, written through to a SQLite file.
+
+    With a ``shared`` backend, verdicts from other server workers are picked up on a local miss.
+    Several workers may share the file; the disk write-through is best-effort.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = SAFETY_CACHE_SIZE,
+                 shared: SharedBackend = None, busy_timeout: float = SAFETY_CACHE_BUSY_TIMEOUT):
+        self.path = path or SAFETY_CACHE_PATH
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()  # content key -> verdict
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.write_errors = 0
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=busy_timeout)
+        # WAL: readers in other workers don't block a write-through
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, safe INTEGER NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, safe FROM verdicts ORDER BY used_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, safe in reversed(rows):
+            self._entries[key] = bool(safe)
+
+    def get(self, text: str) -> Optional[bool]:
+        """Cached verdict for this text, or None."""
+        key = content_key(text)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        stored = self.shared.get(f"verdict:{key}") if self.shared is not None else None
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries[key] = stored == "1"
+            return self._entries[key]
+
+    def put(self, text: str, safe: bool):
+        """Store a verdict in memory and on disk, evicting the least recently used."""
+        key = content_key(text)
+        with self._lock:
+            self._entries[key] = safe
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+
+        # Outside the memory lock: a busy file never holds up cache reads
+        with self._db_lock:
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO verdicts (key, safe, used_at) VALUES (?, ?, ?)",
+                        (key, int(safe), time.time()),
+                    )
+                    if evicted:
+                        self._db.executemany("DELETE FROM verdicts WHERE key = ?", [(k,) for k in evicted])
+            except sqlite3.Error as e:
+                # The verdict is still cached in memory; only persistence is skipped
+                self.write_errors += 1
+                print(f"Warning: Could not persist safety verdict: {e}")
+        if self.shared is not None:
+            self.shared.set(f"verdict:{key}", "1" if safe else "0")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "write_errors": self.write_errors, "shared": self.shared is not None}
+
+    def close(self):
+        self._db.close()
+
+
+# =============================================================================
+# Micro-Batcher
+# =============================================================================
+
+class SafetyBatcher:
+    """Groups concurrent safety checks into one moderation call per window.
+
+    ``moderate`` takes a list of texts and returns one verdict per text.
+    """
+
+    def __init__(self, moderate: Callable[[List[str]], List[bool]],
+                 window: float = SAFETY_BATCH_WINDOW, max_batch: int = SAFETY_BATCH_MAX,
+                 timeout: float = SAFETY_TIMEOUT):
+        self.moderate = moderate
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = []  # (text, expires, future)
+        self._cond = threading.Condition()
+        self._worker = None
+        self._dispatch = ThreadPoolExecutor(max_workers=4, thread_name_prefix="focus-safety-batch")
+        self.counters = {"requests": 0, "batches": 0, "batched": 0, "timeouts": 0, "errors": 0}
+
+    def check(self, text: str, timeout: Optional[float] = None) -> Optional[bool]:
+        """Verdict for one text, or None if moderation failed or ran out of budget."""
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        future = Future()
+        with self._cond:
+            self.counters["requests"] += 1
+            self._queue.append((text, time.monotonic() + timeout, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._collect, daemon=True, name="focus-safety-batcher")
+                self._worker.start()
+            self._cond.notify()
+
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self.counters["timeouts"] += 1
+            return None
+        except Exception:
+            self.counters["errors"] += 1
+            return None
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # Hold the batch open for one window (or until it is full)
+                deadline = time.monotonic() + self.window
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+
+            self.counters["batches"] += 1
+            self.counters["batched"] += len(batch)
+            self._dispatch.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            # The request may run until the most patient caller gives up
+            with deadline_scope(max(expires for _, expires, _ in batch)):
+                verdicts = dict(zip(texts, self.moderate(texts)))
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for text, _, future in batch:
+            future.set_result(verdicts[text])
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, pending=len(self._queue))
+
+    def shutdown(self):
+        self._dispatch.shutdown(wait=False, cancel_futures=True)
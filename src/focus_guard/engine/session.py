@@ -0,0 +1,320 @@
+"""
+FocusGuard AI - Focus Sessions
+Per-socket state, newest-frame-wins coalescing, and a fair global Groq budget
+(optionally shared by every server worker through engine.shared).
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+from .shared import SharedBackend
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Shared Groq budget across every session (requests/second and burst). 0 disables.
+GROQ_RATE = float(os.getenv("FOCUS_GROQ_RATE", "10"))
+GROQ_BURST = float(os.getenv("FOCUS_GROQ_BURST", "30"))
+
+# Approximate Groq requests per message: Vision + Reasoning + Safety for frames,
+# Reasoning only for text triggers
+FRAME_COST = 3
+REASON_COST = 1
+
+# Frames compared when deciding whether a session's activity is stable
+STABLE_FRAMES = int(os.getenv("FOCUS_CAPTURE_STABLE_FRAMES", "3"))
+
+
+def request_cost(message: Dict[str, Any]) -> int:
+    """Groq requests a client message is expected to consume."""
+    return FRAME_COST if message.get("image") else REASON_COST
+
+
+# =============================================================================
+# Session State
+# =============================================================================
+
+class FocusSession:
+    """State for one /ws/focus connection.
+
+    At most one message is processed at a time; while it runs, only the newest
+    incoming message is kept and older ones are dropped.
+    """
+
+    def __init__(self, session_id: int, user: str = "anonymous"):
+        self.id = session_id
+        self.user = user
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+        self.last_roast_time = None
+        self.pending = None
+        self.busy = False
+        self.worker = None
+        self.prefilter = None
+        self.capture_level = 0  # last capture level sent to the app
+        self.activities = deque(maxlen=STABLE_FRAMES)
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def submit(self, message: Dict[str, Any]) -> bool:
+        """Queue the newest message; True when the caller must start a worker."""
+        self.received += 1
+        self.last_activity = time.time()
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = message
+        if self.busy:
+            return False
+        self.busy = True
+        return True
+
+    def take(self) -> Optional[Dict[str, Any]]:
+        """Hand the pending message to the worker."""
+        message, self.pending = self.pending, None
+        if message is not None:
+            self.processed += 1
+        return message
+
+    def mark_roasted(self):
+        self.last_roast_time = time.time()
+
+    def record_activity(self, activity: str):
+        """Activity class seen in the latest frame."""
+        self.activities.append(activity)
+
+    @property
+    def stable(self) -> bool:
+        """The last STABLE_FRAMES frames all showed the same activity."""
+        return len(self.activities) == self.activities.maxlen and len(set(self.activities)) == 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "pending": self.pending is not None,
+            "busy": self.busy,
+            "last_activity": self.last_activity,
+            "last_roast_time": self.last_roast_time,
+            "capture_level": self.capture_level,
+        }
+
+
+# =============================================================================
+# Shared Budget
+# =============================================================================
+
+class SharedRateLimit:
+    """Groq budget shared by all workers: at most ``burst`` requests per ``burst / rate`` window.
+
+    A fixed window keeps it to one atomic counter per window on any backend.
+    """
+
+    def __init__(self, backend: SharedBackend, rate: float = GROQ_RATE, burst: float = GROQ_BURST,
+                 name: str = "groq"):
+        self.backend = backend
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.window = self.burst / rate
+        self.name = name
+
+    def take(self, cost: float) -> float:
+        """Take ``cost`` requests; 0 when granted, else seconds until the next window."""
+        now = time.time()
+        index = int(now // self.window)
+        key = f"ratelimit:{self.name}:{index}"
+        used = self.backend.incr(key, cost, ttl=self.window * 2)
+        if used <= self.burst:
+            return 0.0
+        # Over budget: hand the tokens back so a denied attempt costs nothing
+        self.backend.incr(key, -cost)
+        return max((index + 1) * self.window - now, 0.001)
+
+
+# =============================================================================
+# Fair Token Bucket
+# =============================================================================
+
+class TokenBucket:
+    """Global request budget; when tokens run short, waiting sessions are served round-robin.
+
+    With ``shared`` the tokens come from a SharedRateLimit instead of this process;
+    its backend calls (SQLite locks, Redis round trips) run in the default executor.
+    """
+
+    def __init__(self, rate: float = GROQ_RATE, burst: float = GROQ_BURST,
+                 shared: SharedRateLimit = None):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.shared = shared
+        self.updated = time.monotonic()
+        self._waiters = OrderedDict()  # session id -> deque of (cost, future)
+        self._timer = None
+        self._loop = None
+        self._granting = None  # running grant pass
+        self.granted = 0
+        self.waited = 0
+
+    async def acquire(self, session_id: int, cost: float = 1):
+        """Wait until the budget allows ``cost`` requests for this session."""
+        if self.rate <= 0:
+            return
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # New event loop (e.g. a fresh test client): drop state bound to the old one
+            self._loop, self._timer, self._granting = loop, None, None
+            self._waiters.clear()
+
+        cost = min(cost, self.capacity)
+        if not self._waiters and await self._take(cost) == 0:
+            self.granted += 1
+            return
+
+        future = loop.create_future()
+        self._waiters.setdefault(session_id, deque()).append((cost, future))
+        self.waited += 1
+        self._schedule_grant()
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._discard(session_id, future)
+            raise
+
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._waiters.values())
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def _take(self, cost: float) -> float:
+        """Take ``cost`` tokens; 0 when granted, else seconds until there could be enough."""
+        if self.shared is not None:
+            return await self._loop.run_in_executor(None, self.shared.take, cost)
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return max((cost - self.tokens) / self.rate, 0.001)
+
+    def _schedule_grant(self):
+        """Start a grant pass unless one is already running (it picks up new waiters)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._granting is None or self._granting.done():
+            self._granting = self._loop.create_task(self._grant())
+
+    async def _grant(self):
+        delay = None
+        while self._waiters:
+            session_id, queue = next(iter(self._waiters.items()))
+            cost, future = queue[0]
+            if future.done():
+                queue.popleft()
+            else:
+                delay = await self._take(cost)
+                if delay > 0:
+                    break
+                if future.done():
+                    # Cancelled while the shared budget answered; _discard already dequeued it
+                    continue
+                self.granted += 1
+                queue.popleft()
+                future.set_result(None)
+            # Rotate: this session goes to the back of the line
+            del self._waiters[session_id]
+            if queue:
+                self._waiters[session_id] = queue
+
+        if self._waiters and self._timer is None:
+            if delay is None or delay == 0:
+                delay = 0.001
+            self._timer = self._loop.call_later(delay, self._schedule_grant)
+
+    def _discard(self, session_id: int, future: asyncio.Future):
+        queue = self._waiters.get(session_id)
+        if not queue:
+            return
+        for item in list(queue):
+            if item[1] is future:
+                queue.remove(item)
+        if not queue:
+            del self._waiters[session_id]
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "shared": self.shared is not None,
+            "tokens": None if self.shared else round(self.tokens, 2),
+            "queue_depth": self.queue_depth(),
+            "granted": self.granted,
+            "waited": self.waited,
+        }
+
+
+def budget_for(backend: SharedBackend) -> TokenBucket:
+    """Groq budget for this process: shared through ``backend`` when other workers can see it."""
+    if backend.shared and GROQ_RATE > 0:
+        return TokenBucket(shared=SharedRateLimit(backend))
+    return TokenBucket()
+
+
+# =============================================================================
+# Manager
+# =============================================================================
+
+class SessionManager:
+    """Tracks live sessions and owns the shared Groq budget."""
+
+    def __init__(self, budget: TokenBucket = None):
+        self.budget = budget or TokenBucket()
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self.closed_dropped = 0
+        # Set on shutdown: running pipelines finish, nothing new starts
+        self.draining = False
+
+    def open(self, user: str = "anonymous") -> FocusSession:
+        session = FocusSession(next(self._ids), user)
+        self.sessions[session.id] = session
+        return session
+
+    def close(self, session: FocusSession):
+        self.sessions.pop(session.id, None)
+        self.closed_dropped += session.dropped
+        if session.worker is not None:
+            session.worker.cancel()
+
+    async def drain(self, timeout: float) -> int:
+        """Stop starting new messages and wait for in-flight ones; returns how many are still running."""
+        self.draining = True
+        workers = [session.worker for session in self.sessions.values()
+                   if session.worker is not None and not session.worker.done()]
+        if not workers:
+            return 0
+        _, running = await asyncio.wait(workers, timeout=timeout)
+        return len(running)
+
+    def stats(self) -> Dict[str, Any]:
+        live = list(self.sessions.values())
+        return {
+            "active": len(live),
+            "draining": self.draining,
+            "busy": sum(session.busy for session in live),
+            "pending": sum(session.pending is not None for session in live),
+            "dropped": self.closed_dropped + sum(session.dropped for session in live),
+            "budget": self.budget.stats(),
+        }
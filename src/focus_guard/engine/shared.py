@@ -0,0 +1,258 @@
+"""
+FocusGuard AI - Shared State
+Key/value store with atomic counters for state every server worker must see:
+safety verdicts and the Groq rate-limit budget.
+
+    memory   this process only (default; fine for a single worker)
+    sqlite   one WAL-mode file shared by all workers on a host
+    redis    any Redis-compatible server (redis://host:port/db, needs ``pip install redis``)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+SHARED_BACKEND = os.getenv("FOCUS_SHARED_BACKEND", "memory")
+SHARED_PATH = os.getenv(
+    "FOCUS_SHARED_PATH", os.path.join(os.getenv("FOCUS_DATA_DIR", ".focusguard"), "shared.db"))
+# Namespace for keys in a Redis shared with other apps
+SHARED_PREFIX = os.getenv("FOCUS_SHARED_PREFIX", "focusguard:")
+
+# Expired SQLite rows are purged every this many writes
+PURGE_EVERY = 256
+
+
+# =============================================================================
+# Backends
+# =============================================================================
+
+class SharedBackend:
+    """String values with an optional TTL, plus counters that are incremented atomically."""
+
+    name = "base"
+    # False when other processes can't see the data (callers then keep state local)
+    shared = True
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: float = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: float = 1, ttl: float = None) -> float:
+        """Add ``amount`` and return the new value; ``ttl`` applies when the counter is created."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "shared": self.shared}
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(SharedBackend):
+    """Dict in this process."""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._values = {}  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else str(entry[0])
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str, amount: float = 1, ttl: float = None) -> float:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                entry = (0.0, time.monotonic() + ttl if ttl else None)
+            value = float(entry[0]) + amount
+            self._values[key] = (value, entry[1])
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), keys=len(self._values))
+
+
+class SQLiteBackend(SharedBackend):
+    """Table in a SQLite file; ``BEGIN IMMEDIATE`` makes counters atomic across processes."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = None):
+        self.path = path or SHARED_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS shared ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM shared WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, str(value), time.time() + ttl if ttl else None),
+            )
+            self._written()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM shared WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: float = 1, ttl: float = None) -> float:
+        with self._lock:
+            now = time.time()
+            # Take the write lock up front so read-modify-write can't interleave with other workers
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM shared WHERE key = ?", (key,)).fetchone()
+                if row is None or (row[1] is not None and row[1] <= now):
+                    current, expires_at = 0.0, now + ttl if ttl else None
+                else:
+                    current, expires_at = float(row[0]), row[1]
+                value = current + amount
+                self._db.execute(
+                    "INSERT OR REPLACE INTO shared (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, repr(value), expires_at),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._written()
+            return value
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self._db.execute("DELETE FROM shared WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), path=self.path)
+
+    def close(self):
+        self._db.close()
+
+
+class RedisBackend(SharedBackend):
+    """Any client with redis-py's get/set/delete/incrbyfloat/pexpire (Redis, Valkey, KeyDB, ...)."""
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = SHARED_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = SHARED_PREFIX) -> "RedisBackend":
+        import redis
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        self.client.set(self.prefix + key, str(value), px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str, amount: float = 1, ttl: float = None) -> float:
+        value = float(self.client.incrbyfloat(self.prefix + key, amount))
+        # This call created the counter: start its expiry
+        if ttl and value == amount:
+            self.client.pexpire(self.prefix + key, int(ttl * 1000))
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), prefix=self.prefix)
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+def create_backend(spec: str = SHARED_BACKEND) -> SharedBackend:
+    """Backend from a spec: ``memory``, ``sqlite``, ``sqlite:///path/to.db`` or ``redis://...``."""
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            return RedisBackend.from_url(spec)
+        except ImportError:
+            print("Warning: FOCUS_SHARED_BACKEND is a Redis URL but redis is not installed. Using memory.")
+            return MemoryBackend()
+    if spec == "sqlite":
+        return SQLiteBackend()
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):])
+    if spec != "memory":
+        print(f"Warning: Unknown FOCUS_SHARED_BACKEND {spec!r}. Using memory.")
+    return MemoryBackend()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_backend() -> SharedBackend:
+    """The process-wide backend from FOCUS_SHARED_BACKEND, created on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = create_backend()
+        return _shared
+
+
+def close_shared_backend():
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
+            _shared = None
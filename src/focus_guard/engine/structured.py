@@ -0,0 +1,212 @@
+"""
+FocusGuard AI - Structured Output
+Schema, validation and parsing for the fused vision+roast reply: one JSON
+object with ``is_focused``, ``activity`` and ``tease``.
+
+Models wrap JSON in code fences or prose often enough that json.loads on the
+raw text isn't good enough; extract_json finds the first complete object, and
+IncrementalJSONParser does the same over a token stream while handing out the
+roast text as it is generated.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+
+# =============================================================================
+# Schema
+# =============================================================================
+
+FOCUS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_focused": {"type": "boolean"},
+        "activity": {"type": "string", "minLength": 1},
+        "tease": {"type": "string"},
+    },
+    "required": ["is_focused", "activity", "tease"],
+}
+
+TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+}
+
+
+class SchemaError(ValueError):
+    """Reply missing, unparseable or not matching the schema."""
+
+
+def validate(data: Any, schema: Dict[str, Any] = FOCUS_SCHEMA, path: str = "$") -> Any:
+    """Check ``data`` against a JSON-schema subset (type, properties, required, minLength).
+
+    Returns the data with unknown object keys dropped; raises SchemaError.
+    """
+    expected = TYPES[schema["type"]]
+    # bool is an int in Python, but not in JSON
+    if not isinstance(data, expected) or (isinstance(data, bool) and schema["type"] in ("integer", "number")):
+        raise SchemaError(f"{path}: expected {schema['type']}, got {type(data).__name__}")
+
+    if schema["type"] == "string" and len(data.strip()) < schema.get("minLength", 0):
+        raise SchemaError(f"{path}: shorter than {schema['minLength']}")
+
+    if schema["type"] == "object":
+        properties = schema.get("properties", {})
+        missing = [key for key in schema.get("required", ()) if key not in data]
+        if missing:
+            raise SchemaError(f"{path}: missing {', '.join(missing)}")
+        return {key: validate(data[key], sub, f"{path}.{key}") for key, sub in properties.items() if key in data}
+    return data
+
+
+def extract_json(text: str) -> Dict[str, Any]:
+    """First complete JSON object in ``text`` (skips code fences and surrounding prose)."""
+    decoder = json.JSONDecoder()
+    start = text.find("{") if text else -1
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    raise SchemaError("no JSON object in reply")
+
+
+def parse_focus_reply(text: str) -> Dict[str, Any]:
+    """Validated fused reply from raw model text; raises SchemaError."""
+    return validate(extract_json(text))
+
+
+# =============================================================================
+# Incremental Parser
+# =============================================================================
+
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class IncrementalJSONParser:
+    """Parses one JSON object from a token stream.
+
+    Text before the object (prose, a ```json fence) is skipped, the object is
+    complete as soon as its closing brace arrives, and the top-level string
+    field ``stream_field`` is passed to ``on_field`` piece by piece while it
+    is still being generated.
+    """
+
+    def __init__(self, stream_field: str = None, on_field: Optional[Callable[[str], None]] = None):
+        self.stream_field = stream_field
+        self.on_field = on_field
+        self.text = []
+        self.value = None
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = None  # None, "" after a backslash, or the \\u digits so far
+        self._high = None  # \\u high surrogate waiting for its low half
+        self._string = []
+        self._is_key = False
+        self._expect_key = False
+        self._key = None
+
+    @property
+    def done(self) -> bool:
+        return self.value is not None
+
+    def feed(self, delta: str):
+        """Consume the next piece of model output."""
+        if self.done or not delta:
+            return
+        self.text.append(delta)
+        streamed = []
+        for char in delta:
+            self._pos += 1
+            self._step(char, streamed)
+            if self.done:
+                break
+        if streamed and self.on_field is not None:
+            self.on_field("".join(streamed))
+
+    def _step(self, char: str, streamed: List[str]):
+        if self._depth == 0:
+            if char == "{":
+                self._start, self._depth, self._expect_key = self._pos - 1, 1, True
+            return
+
+        if self._in_string:
+            decoded = self._decode(char)
+            if decoded is None:
+                return
+            if decoded is False:
+                # Closing quote
+                self._in_string = False
+                if self._is_key:
+                    self._key = "".join(self._string)
+                return
+            self._string.append(decoded)
+            if not self._is_key and self._depth == 1 and self._key == self.stream_field:
+                streamed.append(decoded)
+            return
+
+        if char == '"':
+            self._in_string, self._string = True, []
+            self._is_key = self._depth == 1 and self._expect_key
+        elif char == ":" and self._depth == 1:
+            self._expect_key = False
+        elif char == "," and self._depth == 1:
+            self._expect_key, self._key = True, None
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish()
+
+    def _decode(self, char: str):
+        """Next character of a string: its value, None (inside an escape) or False (end of string)."""
+        if self._escape is None:
+            if char == "\\":
+                self._escape = ""
+                return None
+            self._high = None
+            return False if char == '"' else char
+        if self._escape == "" and char != "u":
+            self._escape = self._high = None
+            return ESCAPES.get(char, char)
+        self._escape += char
+        if len(self._escape) < 5:  # "u" + 4 hex digits
+            return None
+        digits, self._escape = self._escape[1:], None
+        try:
+            code = int(digits, 16)
+        except ValueError:
+            return ""
+        if 0xD800 <= code < 0xDC00:
+            # First half of a non-BMP character (emoji): wait for the second
+            self._high = code
+            return None
+        high, self._high = self._high, None
+        if 0xDC00 <= code < 0xE000:
+            # A lone surrogate can't be UTF-8 encoded for the socket, so it is dropped
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00)) if high is not None else ""
+        return chr(code)
+
+    def _finish(self):
+        # _pos counts characters fed so far, so the object is text[_start:_pos]
+        try:
+            value = json.loads("".join(self.text)[self._start:self._pos])
+        except ValueError:
+            value = None
+        # Not valid JSON after all (e.g. a stray brace in prose): look for the next object
+        self.value = value if isinstance(value, dict) else None
+
+    def result(self, schema: Dict[str, Any] = FOCUS_SCHEMA) -> Dict[str, Any]:
+        """The validated object once the stream has ended; raises SchemaError."""
+        value = self.value if self.done else extract_json("".join(self.text))
+        return validate(value, schema)
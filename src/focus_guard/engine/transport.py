@@ -0,0 +1,236 @@
+"""
+FocusGuard AI - Shared HTTP Transport
+One pooled, keep-alive HTTP client for every engine agent, with connection
+warm-up and jittered retries that honour Groq's rate-limit headers.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .deadline import time_left
+
+# Optional: h2 enables HTTP/2 (a single multiplexed connection per host)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Max open connections to the Groq API (covers engine workers + background pools)
+HTTP_POOL_SIZE = int(os.getenv("FOCUS_HTTP_POOL_SIZE", "32"))
+HTTP_KEEPALIVE = float(os.getenv("FOCUS_HTTP_KEEPALIVE", "60"))
+HTTP2_ENABLED = os.getenv("FOCUS_HTTP2", "1") != "0" and HTTP2_AVAILABLE
+# Connections opened at startup, before the first user frame (0 disables)
+HTTP_WARMUP = int(os.getenv("FOCUS_HTTP_WARMUP", "4"))
+
+# Retries for 429 / 5xx / dropped connections; the SDK's own retries are turned off
+HTTP_RETRIES = int(os.getenv("FOCUS_HTTP_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("FOCUS_RETRY_BASE_DELAY", "0.25"))
+# A server asking us to wait longer than this gets the error returned instead
+RETRY_MAX_DELAY = float(os.getenv("FOCUS_RETRY_MAX_DELAY", "4.0"))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from a header such as "7.66s", "2m59.56s", "250ms" or "3"."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _UNITS[unit] for number, unit in parts)
+
+
+def retry_delay(headers: httpx.Headers) -> Optional[float]:
+    """Wait requested by the server, from Retry-After or Groq's x-ratelimit-* headers."""
+    if "retry-after-ms" in headers:
+        delay = parse_duration(headers["retry-after-ms"])
+        return delay / 1000 if delay is not None else None
+    delay = parse_duration(headers.get("retry-after"))
+    if delay is not None:
+        return delay
+    # Whichever limit ran out says when it resets
+    for kind in ("tokens", "requests"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            delay = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if delay is not None:
+                return delay
+    return None
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter, so concurrent sessions don't retry in lockstep."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# =============================================================================
+# Retrying Transport
+# =============================================================================
+
+class RetryTransport(httpx.HTTPTransport):
+    """Pooled transport that retries transient failures and counts new connections."""
+
+    def __init__(self, retries: int = HTTP_RETRIES, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, **kwargs):
+        super().__init__(**kwargs)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "retries": 0, "rate_limited": 0, "errors": 0, "connections_opened": 0}
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._count("requests")
+        request.extensions = dict(request.extensions, trace=self._trace)
+        attempt = 0
+        while True:
+            try:
+                response = super().handle_request(request)
+            except (httpx.ConnectError, httpx.RemoteProtocolError):
+                # Refused connection or a keep-alive socket the server already closed
+                self._count("errors")
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                if attempt >= self.retries or delay >= time_left():
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    return response
+                if response.status_code == 429:
+                    self._count("rate_limited")
+                requested = retry_delay(response.headers)
+                if requested is not None and requested > self.max_delay:
+                    return response
+                if requested is not None:
+                    delay = requested + random.uniform(0, self.base_delay)
+                else:
+                    delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                # The caller's deadline would pass before the retry: hand back the error now
+                if delay >= time_left():
+                    return response
+                response.close()
+
+            self._count("retries")
+            attempt += 1
+            time.sleep(delay)
+
+    def _trace(self, event: str, info: Dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            self._count("connections_opened")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counters = dict(self.counters)
+        counters["connections_open"] = len(self._pool.connections)
+        return counters
+
+
+# =============================================================================
+# Shared Client
+# =============================================================================
+
+class SharedTransport:
+    """Process-wide HTTP client handed to every Groq client (``Groq(http_client=...)``)."""
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, keepalive: float = HTTP_KEEPALIVE,
+                 http2: bool = HTTP2_ENABLED, retries: int = HTTP_RETRIES):
+        self.pool_size = pool_size
+        self.transport = RetryTransport(
+            retries=retries,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=keepalive,
+            ),
+        )
+        self.http_client = httpx.Client(transport=self.transport, timeout=httpx.Timeout(30.0, connect=5.0))
+        self.http2 = http2
+        self.warmed = 0
+
+    def warm_up(self, base_url: str, connections: int = HTTP_WARMUP) -> int:
+        """Open up to ``connections`` keep-alive connections to ``base_url`` concurrently.
+
+        Any HTTP response (even 404) means TCP + TLS are done and the socket is pooled.
+        """
+        connections = min(connections, self.pool_size)
+        if connections <= 0:
+            return 0
+
+        def touch(_):
+            try:
+                self.http_client.head(str(base_url), timeout=5.0)
+                return True
+            except Exception:
+                return False
+
+        # One thread per connection so the requests don't queue on a single socket
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="focus-warmup") as pool:
+            opened = sum(pool.map(touch, range(connections)))
+        self.warmed += opened
+        return opened
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.transport.stats(), pool_size=self.pool_size, http2=self.http2, warmed=self.warmed)
+
+    def close(self):
+        self.http_client.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_transport() -> SharedTransport:
+    """The process-wide transport, created on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedTransport()
+        return _shared
+
+
+def gemini_client(api_key: str):
+    """google-genai client on the shared pool, so Gemini calls get the same keep-alive and retries."""
+    from google import genai
+    from google.genai import types
+
+    try:
+        http_options = types.HttpOptions(httpx_client=shared_transport().http_client)
+    except (TypeError, ValueError):
+        # google-genai releases without the httpx_client option manage their own transport
+        print("Warning: This google-genai version can't use the shared HTTP pool. Using its own.")
+        http_options = None
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def close_shared_transport():
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
+            _shared = None
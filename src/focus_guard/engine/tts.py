@@ -0,0 +1,267 @@
+"""
+FocusGuard AI - Server-side TTS
+Renders roast audio offline in worker processes and keeps the encoded clips in
+a size-bounded LRU cache on disk, keyed by (text, voice, rate).
+
+pyttsx3's runAndWait() blocks (and its drivers aren't thread-safe), so each
+worker process owns one engine and renders to a file. Roasts added to the roast
+pool are rendered ahead of time, so pool-served roasts play with no synthesis wait.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from importlib.util import find_spec
+from typing import Any, Callable, Dict, Optional
+
+# Optional: pyttsx3 (and a system speech engine such as espeak) for server-side audio
+PYTTSX3_AVAILABLE = find_spec("pyttsx3") is not None
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# browser: the app speaks roasts with the Web Speech API; server: clips stream over /ws/focus
+TTS_MODE = os.getenv("FOCUS_TTS", "browser")
+TTS_VOICE = os.getenv("FOCUS_TTS_VOICE", "")  # pyttsx3 voice id ("" = engine default)
+TTS_RATE = int(os.getenv("FOCUS_TTS_RATE", "160"))
+TTS_WORKERS = int(os.getenv("FOCUS_TTS_WORKERS", "2"))
+# Longest a roast waits for its clip before the app falls back to browser speech
+TTS_TIMEOUT = float(os.getenv("FOCUS_TTS_TIMEOUT", "3.0"))
+TTS_CACHE_DIR = os.getenv(
+    "FOCUS_TTS_CACHE_DIR", os.path.join(os.getenv("FOCUS_DATA_DIR", ".focusguard"), "tts"))
+TTS_CACHE_MB = float(os.getenv("FOCUS_TTS_CACHE_MB", "64"))
+
+# Bytes per WebSocket audio message
+CHUNK_SIZE = 32 * 1024
+CLIP_SUFFIX = ".clip"
+
+
+def clip_mime(data: bytes) -> str:
+    """Media type of a rendered clip (espeak/SAPI write WAV, macOS NSSpeech writes AIFF)."""
+    if data[:4] == b"RIFF":
+        return "audio/wav"
+    if data[:4] == b"FORM":
+        return "audio/aiff"
+    return "application/octet-stream"
+
+
+# =============================================================================
+# Rendering (runs in worker processes)
+# =============================================================================
+
+_engine = None
+
+
+def render_clip(text: str, voice: str, rate: int) -> bytes:
+    """Render text to an audio file with this process's pyttsx3 engine and return its bytes."""
+    global _engine
+    if _engine is None:
+        import pyttsx3
+        _engine = pyttsx3.init()
+    _engine.setProperty("rate", rate)
+    if voice:
+        _engine.setProperty("voice", voice)
+
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        _engine.save_to_file(text, path)
+        _engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+# =============================================================================
+# Clip Cache
+# =============================================================================
+
+class ClipCache:
+    """Encoded clips as files in one directory, evicted least-recently-used past ``max_bytes``.
+
+    Writes are atomic (temp file + rename), so worker processes can share a directory.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = int(TTS_CACHE_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self.bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+        # Pick up clips from earlier runs, oldest access first
+        existing = []
+        for name in os.listdir(directory):
+            if name.endswith(CLIP_SUFFIX):
+                stat = os.stat(os.path.join(directory, name))
+                existing.append((stat.st_mtime, name[:-len(CLIP_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self.bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CLIP_SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._entries:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))  # mtime is the LRU order after a restart
+        except OSError:
+            # Evicted by another worker
+            with self._lock:
+                self.bytes -= self._entries.pop(key, 0)
+                self.counters["misses"] += 1
+            return None
+        with self._lock:
+            self.counters["hits"] += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self.bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self.counters["stored"] += 1
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.counters["evicted"] += 1
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, clips=len(self._entries), bytes=self.bytes, max_bytes=self.max_bytes)
+
+
+# =============================================================================
+# Service
+# =============================================================================
+
+class TTSService:
+    """Cached, deduplicated clip rendering on a process pool (created on first use)."""
+
+    def __init__(self, cache: ClipCache = None, voice: str = TTS_VOICE, rate: int = TTS_RATE,
+                 workers: int = TTS_WORKERS, render: Callable[[str, str, int], bytes] = render_clip,
+                 pool=None):
+        self.cache = cache if cache is not None else ClipCache()
+        self.voice = voice
+        self.rate = rate
+        self.workers = workers
+        self.render = render
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> Future, so one text is rendered once however many ask
+        self.counters = {"rendered": 0, "prerendered": 0, "errors": 0}
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.voice}\0{self.rate}\0{text}".encode("utf-8")).hexdigest()
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn: forking a process that runs uvicorn and engine threads isn't safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def submit(self, text: str) -> Future:
+        """Future for the clip's bytes: already done on a cache hit, shared while rendering."""
+        key = self.key(text)
+        data = self.cache.get(key)
+        if data is not None:
+            done = Future()
+            done.set_result(data)
+            return done
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._pending[key] = self._executor().submit(self.render, text, self.voice, self.rate)
+        # Outside the lock: a render that already finished runs the callback right here
+        future.add_done_callback(lambda f: self._rendered(key, f))
+        return future
+
+    def _rendered(self, key: str, future: Future):
+        try:
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None or not future.result():
+                self.counters["errors"] += 1
+                if error is not None:
+                    print(f"Warning: TTS render failed: {error}")
+                return
+            self.counters["rendered"] += 1
+            try:
+                self.cache.put(key, future.result())
+            except OSError as e:
+                print(f"Warning: Could not cache TTS clip: {e}")
+        finally:
+            # Only after the clip is on disk, so nobody starts a second render in between
+            with self._lock:
+                self._pending.pop(key, None)
+
+    async def clip(self, text: str, timeout: float = TTS_TIMEOUT) -> Optional[bytes]:
+        """The clip for ``text``, or None if it can't be rendered in time."""
+        if not text:
+            return None
+        try:
+            # A cache hit reads the clip from disk: keep that off the event loop
+            future = await asyncio.get_running_loop().run_in_executor(None, self.submit, text)
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except Exception:
+            # Timed out or failed: the render (if any) keeps going and lands in the cache
+            return None
+
+    def prerender(self, text: str):
+        """Render in the background (e.g. roasts entering the pool); safe from any thread."""
+        if not text:
+            return
+        try:
+            self.submit(text)
+            self.counters["prerendered"] += 1
+        except RuntimeError:
+            pass  # pool shut down
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, pending=len(self._pending), voice=self.voice, rate=self.rate,
+                    cache=self.cache.stats())
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_tts_service(mode: str = TTS_MODE) -> Optional[TTSService]:
+    """The server's TTSService when FOCUS_TTS=server and pyttsx3 is installed, else None."""
+    if mode != "server":
+        return None
+    if not PYTTSX3_AVAILABLE:
+        print("Warning: FOCUS_TTS=server but pyttsx3 is not installed. Using browser speech.")
+        return None
+    return TTSService()
@@ -1,18 +1,22 @@
 import os
-import json
-from google import genai
 from google.genai import types
 from typing import Dict, Any
 
+from .replay import REPLAY, REPLAY_MODE, wrap_gemini_client
+from .structured import SchemaError, extract_json
+from .transport import gemini_client
+
 class VisionAgent:
     """Agent specialized in detecting user focus and 'doom scrolling' via Computer Vision."""
     
     def __init__(self, model_name: str = "gemini-2.0-flash"):
         api_key = os.getenv("GROG_API_KEY")
-        if not api_key:
+        if not api_key and REPLAY_MODE != REPLAY:
             raise ValueError("GROG_API_KEY is required.")
         
-        self.client = genai.Client(api_key=api_key)
+        # Shared keep-alive pool and retries (engine.transport); FOCUS_REPLAY=record|replay
+        # puts the response store (engine.replay) in front
+        self.client = wrap_gemini_client(gemini_client(api_key) if api_key else None)
         self.model_name = model_name
 
     def analyze(self, image_path: str) -> Dict[str, Any]:
@@ -57,7 +61,6 @@ class VisionAgent:
     def _parse_json(self, text: str) -> Dict[str, Any]:
         """Clean and parse JSON from Gemini response."""
         try:
-            cleaned = text.strip().strip('`').replace('json', '', 1).strip()
-            return json.loads(cleaned)
-        except:
+            return extract_json(text)
+        except SchemaError:
             return {"error": "Parse failed", "is_focused": True, "tease": None}
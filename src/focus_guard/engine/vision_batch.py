@@ -0,0 +1,168 @@
+"""
+FocusGuard AI - Vision Batcher
+Groups single-frame vision calls from different sessions into one multi-image
+request that asks for one description per image, then hands each description
+back to the caller that sent the frame.
+
+A frame waits at most FOCUS_VISION_BATCH_WAIT for company, so batching adds a
+bounded amount of latency in exchange for fewer requests (and less rate-limit
+spend) under load. A batch that fails or comes back with the wrong number of
+descriptions is retried frame by frame.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from .deadline import deadline_scope
+from .protocol import FrameData
+from .structured import SchemaError, extract_json
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+VISION_BATCH_ENABLED = os.getenv("FOCUS_VISION_BATCH", "0") == "1"
+# Longest a frame is held back waiting for frames from other sessions
+VISION_BATCH_WAIT = float(os.getenv("FOCUS_VISION_BATCH_WAIT", "0.05"))
+# Groq's vision models take up to 5 images per request
+VISION_BATCH_MAX = int(os.getenv("FOCUS_VISION_BATCH_MAX", "5"))
+# Used when the caller has no budget of its own
+VISION_BATCH_TIMEOUT = float(os.getenv("FOCUS_VISION_BATCH_TIMEOUT", "5.0"))
+
+VISION_BATCH_PROMPT = (
+    "You are given {count} webcam frames from different people, labelled Image 1 to Image {count}. "
+    "For each one, describe what the person is doing. Are they focused on screen, looking at phone, "
+    "sleeping, or away? Reply with a JSON object: "
+    '{{"descriptions": ["<Image 1>", ..., "<Image {count}>"]}}, one string per image, in order.'
+)
+
+
+def parse_batch_reply(text: str, count: int) -> List[str]:
+    """The ``count`` descriptions in a batch reply; raises SchemaError."""
+    descriptions = extract_json(text).get("descriptions")
+    if not isinstance(descriptions, list) or len(descriptions) != count:
+        raise SchemaError(f"expected {count} descriptions, got {descriptions!r:.80}")
+    if not all(isinstance(d, str) and d.strip() for d in descriptions):
+        raise SchemaError("empty or non-string description")
+    return [d.strip() for d in descriptions]
+
+
+# =============================================================================
+# Batcher
+# =============================================================================
+
+class VisionBatcher:
+    """Collects concurrent vision calls into multi-image requests.
+
+    ``describe_batch`` takes a list of frames and a timeout and returns one
+    description per frame; ``describe_one`` is the single-frame call used for
+    batches of one and for retries.
+    """
+
+    def __init__(self, describe_batch: Callable[[List[FrameData], Optional[float]], List[str]],
+                 describe_one: Callable[[FrameData, Optional[float]], str],
+                 max_wait: float = VISION_BATCH_WAIT, max_batch: int = VISION_BATCH_MAX,
+                 timeout: float = VISION_BATCH_TIMEOUT):
+        self.describe_batch = describe_batch
+        self.describe_one = describe_one
+        self.max_wait = max_wait
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        self._queue = []  # (frame, expires, future)
+        self._cond = threading.Condition()
+        self._worker = None
+        self._dispatch = ThreadPoolExecutor(max_workers=16, thread_name_prefix="focus-vision-batch")
+        self.counters = {"requests": 0, "batches": 0, "batched": 0, "singles": 0,
+                         "retried": 0, "timeouts": 0, "errors": 0}
+
+    def describe(self, image: FrameData, timeout: Optional[float] = None) -> str:
+        """Description of one frame; raises on failure or when ``timeout`` runs out."""
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        with self._cond:
+            self.counters["requests"] += 1
+            self._queue.append((image, time.monotonic() + timeout, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._collect, daemon=True, name="focus-vision-batcher")
+                self._worker.start()
+            self._cond.notify()
+
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            self.counters["timeouts"] += 1
+            raise TimeoutError(f"no vision result within {timeout:.2f}s")
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # Hold the batch open for max_wait after its first frame (or until it is full)
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+
+            try:
+                self._dispatch.submit(self._run_batch, batch)
+            except RuntimeError:
+                # Shut down
+                for _, _, future in batch:
+                    future.set_exception(RuntimeError("vision batcher is shut down"))
+                return
+
+    def _run_batch(self, batch):
+        # The request may run until the most patient caller gives up
+        expires = max(item_expires for _, item_expires, _ in batch)
+        timeout = max(0.0, expires - time.monotonic())
+
+        if len(batch) == 1:
+            self.counters["singles"] += 1
+            self._run_one(batch[0])
+            return
+
+        self.counters["batches"] += 1
+        self.counters["batched"] += len(batch)
+        try:
+            with deadline_scope(expires):
+                descriptions = self.describe_batch([frame for frame, _, _ in batch], timeout)
+            if len(descriptions) != len(batch):
+                raise SchemaError(f"expected {len(batch)} descriptions, got {len(descriptions)}")
+        except Exception as e:
+            print(f"Warning: Batched vision call failed ({e}); retrying {len(batch)} frames singly")
+            self.counters["retried"] += len(batch)
+            for item in batch:
+                self._dispatch.submit(self._run_one, item)
+            return
+
+        for (_, _, future), description in zip(batch, descriptions):
+            future.set_result(description)
+
+    def _run_one(self, item):
+        frame, expires, future = item
+        try:
+            with deadline_scope(expires):
+                future.set_result(self.describe_one(frame, max(0.0, expires - time.monotonic())))
+        except Exception as e:
+            future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self.counters["batches"]
+        return dict(self.counters, pending=len(self._queue), max_wait_ms=round(self.max_wait * 1000, 1),
+                    max_batch=self.max_batch,
+                    mean_batch=round(self.counters["batched"] / batches, 2) if batches else None)
+
+    def shutdown(self):
+        self._dispatch.shutdown(wait=False, cancel_futures=True)
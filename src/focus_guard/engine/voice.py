@@ -1,8 +1,8 @@
 """
 Backend Voice Agent using pyttsx3.
 
-NOTE: Currently the app uses browser Web Speech API for TTS.
-This module is kept for potential server-side TTS implementation.
+NOTE: speak() blocks until playback ends, so the server doesn't use it;
+server-side TTS (FOCUS_TTS=server) renders clips in worker processes, see engine.tts.
 """
 import pyttsx3
 
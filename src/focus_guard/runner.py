@@ -0,0 +1,58 @@
+"""
+FocusGuard AI - Server Runner
+Runs the app under uvicorn with one or more worker processes.
+
+On shutdown each worker stops accepting connections, lets in-flight pipelines
+deliver their roast (up to FOCUS_DRAIN_TIMEOUT), then closes its sockets.
+"""
+
+import os
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+APP = "focus_guard.server:app"
+
+# Worker processes; use FOCUS_SHARED_BACKEND=sqlite or redis:// so they share one Groq budget
+WORKERS = int(os.getenv("FOCUS_WORKERS", "1"))
+# Seconds a stopping worker waits for running pipelines
+DRAIN_TIMEOUT = float(os.getenv("FOCUS_DRAIN_TIMEOUT", "10"))
+
+
+# =============================================================================
+# Server
+# =============================================================================
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that drains focus sessions before closing WebSockets."""
+
+    async def shutdown(self, sockets=None):
+        # Stop accepting first; open sockets stay up while their pipelines finish
+        for server in self.servers:
+            server.close()
+
+        from focus_guard.server import session_manager
+
+        running = await session_manager.drain(DRAIN_TIMEOUT)
+        if running:
+            print(f"Warning: {running} pipeline(s) still running after {DRAIN_TIMEOUT}s drain")
+        await super().shutdown(sockets)
+
+
+def serve(host: str = "0.0.0.0", port: int = 5000, workers: int = WORKERS, log_level: str = "info"):
+    """Run the app; with ``workers`` > 1 each worker is a process sharing one listening socket."""
+    config = uvicorn.Config(
+        APP, host=host, port=port, workers=workers, log_level=log_level,
+        timeout_graceful_shutdown=DRAIN_TIMEOUT,
+    )
+    server = DrainingServer(config=config)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
@@ -3,13 +3,42 @@ FocusGuard AI - FastAPI Server
 Handles HTTP routes and WebSocket connections for real-time focus monitoring.
 """
 
+import asyncio
+import itertools
+import json
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, PlainTextResponse
 from dotenv import load_dotenv
 
-from focus_guard.engine.groq_agent import GroqAgent
+from focus_guard.assets import (
+    NO_CACHE, REVALIDATE_CACHE, STATIC_MODE, AssetManifest, NoCacheStaticFiles, ProductionStaticFiles,
+)
+from focus_guard.engine.capture import (
+    CAPTURE_CONTROL_ENABLED, CAPTURE_UPDATE_INTERVAL, CaptureController, capture_settings,
+)
+from focus_guard.engine.deadline import Deadline, TIER_TEXT_ONLY
+from focus_guard.engine.events import (
+    BUCKETS, EVENTS_ENABLED, RECOVERED, SESSION_END, SESSION_START, EventStore, clean_user,
+)
+from focus_guard.engine.executor import EngineExecutor
+from focus_guard.engine.groq_agent import GroqAgent, STREAM_ROASTS, VISION_ERROR_PREFIX
+from focus_guard.engine.metrics import (
+    ACTIVE_SESSIONS, E2E_LATENCY, INFLIGHT_CALLS, METRICS_ENABLED, REGISTRY, LoopLagMonitor,
+)
+from focus_guard.engine.prefilter import (
+    AWAY, AWAY_DESCRIPTION, LLM, PREFILTER_ENABLED, SAME, FocusPreClassifier,
+)
+from focus_guard.engine.preprocess import FramePreprocessor, PREPROCESS_ENABLED
+from focus_guard.engine.protocol import ProtocolError, decode_message, encode_audio
+from focus_guard.engine.replay import close_replay_store, replay_store
+from focus_guard.engine.roast_pool import classify_activity
+from focus_guard.engine.session import FocusSession, SessionManager, budget_for, request_cost
+from focus_guard.engine.shared import close_shared_backend, shared_backend
+from focus_guard.engine.tts import CHUNK_SIZE, clip_mime, create_tts_service
 
 load_dotenv()
 
@@ -17,16 +46,111 @@ load_dotenv()
 # App Configuration
 # =============================================================================
 
-app = FastAPI(title="FocusGuard AI")
-
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
 
-# Initialize AI agent (graceful fallback if no API key)
-try:
-    groq_agent = GroqAgent()
-except Exception as e:
-    print(f"Warning: Could not initialize GroqAgent: {e}")
-    groq_agent = None
+# prod: hashed, immutable, precompressed assets (built at startup); dev: no caching at all
+static_assets = AssetManifest(STATIC_DIR) if STATIC_MODE == "prod" else None
+
+# AI agent, built at startup (in the background) or by the first message that needs it.
+# Importing the Groq SDK and opening connections stays off the import path.
+groq_agent = None
+_agent_lock = threading.Lock()
+
+
+def get_groq_agent():
+    """The shared GroqAgent, created on first use (graceful fallback if no API key)."""
+    global groq_agent
+    if groq_agent is None:
+        with _agent_lock:
+            if groq_agent is None:
+                try:
+                    agent = GroqAgent()
+                    # Server TTS: pooled roasts get their audio rendered before anyone needs it
+                    if tts_service is not None and agent.roast_pool is not None:
+                        agent.roast_pool.on_add = tts_service.prerender
+                    groq_agent = agent
+                except Exception as e:
+                    print(f"Warning: Could not initialize GroqAgent: {e}")
+    return groq_agent
+
+
+async def ensure_groq_agent():
+    """get_groq_agent() without blocking the event loop while the SDK imports."""
+    if groq_agent is not None:
+        return groq_agent
+    return await asyncio.get_running_loop().run_in_executor(None, get_groq_agent)
+
+
+# Blocking Groq calls run here so one slow request never stalls other sockets
+engine_executor = EngineExecutor()
+
+# Per-socket state plus the Groq request budget shared by every session
+# (and by every worker process when FOCUS_SHARED_BACKEND is sqlite or redis)
+session_manager = SessionManager(budget_for(shared_backend()))
+
+# Append-only focus history per user, behind the /api/users/... dashboard endpoints.
+# Opened at startup (not import), so importing the app never touches the data directory.
+event_store = None
+
+# FOCUS_TTS=server: roast audio rendered in worker processes, cached on disk, streamed over /ws/focus
+tts_service = create_tts_service()
+_clip_ids = itertools.count(1)
+
+# Capture interval/size/quality pushed to each app as load changes (engine.capture)
+capture_controller = CaptureController() if CAPTURE_CONTROL_ENABLED else None
+_sockets = {}  # session id -> WebSocket, for control pushes
+
+# Frames are downscaled on their own pool before reaching the vision model
+frame_preprocessor = FramePreprocessor() if PREPROCESS_ENABLED else None
+
+# Gauges are read from the live objects at scrape time
+ACTIVE_SESSIONS.set_function(lambda: len(session_manager.sessions))
+INFLIGHT_CALLS.set_function(lambda: engine_executor.stats()["in_flight"])
+
+# Reports event-loop stalls (focusguard_event_loop_lag_seconds)
+loop_monitor = LoopLagMonitor()
+
+
+def warm_up_engine():
+    """Build the agent and open Groq connections (runs off the event loop)."""
+    agent = get_groq_agent()
+    if agent is not None:
+        agent.warm_up()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving right away; the agent is built and warmed in the background."""
+    global event_store
+    loop_monitor.start()
+    if EVENTS_ENABLED and event_store is None:
+        event_store = EventStore()
+    if static_assets is not None:
+        static_assets.build()
+    asyncio.get_running_loop().run_in_executor(None, warm_up_engine)
+    capture_task = asyncio.create_task(capture_control_loop()) if capture_controller is not None else None
+    yield
+    # Release engine worker threads and pooled connections
+    loop_monitor.stop()
+    if capture_task is not None:
+        capture_task.cancel()
+    engine_executor.shutdown()
+    if frame_preprocessor is not None:
+        frame_preprocessor.shutdown()
+    if groq_agent is not None:
+        groq_agent.close()
+    if event_store is not None:
+        event_store.close()
+        event_store = None
+    if tts_service is not None:
+        tts_service.shutdown()
+    from focus_guard.engine.transport import close_shared_transport
+    close_shared_transport()
+    close_shared_backend()
+    close_replay_store()
+
+
+app = FastAPI(title="FocusGuard AI", lifespan=lifespan)
 
 
 # =============================================================================
@@ -39,11 +163,86 @@ async def health_check():
     return {"status": "healthy", "service": "FocusGuard AI"}
 
 
+@app.get("/stats")
+async def engine_stats():
+    """Engine counters (sessions, worker pool, preprocessing, loop lag, HTTP pool, caches, roast pool, safety batcher, vision router and batcher, TTS, capture control, record/replay)."""
+    components = ("transport", "frame_cache", "roast_pool", "verdict_cache", "safety_batcher", "vision_router",
+                  "vision_batcher")
+    stats = {
+        "sessions": session_manager.stats(),
+        "static": static_assets.stats() if static_assets is not None and static_assets.built else None,
+        "shared": shared_backend().stats(),
+        "events": event_store.stats() if event_store is not None else None,
+        "tts": tts_service.stats() if tts_service is not None else None,
+        "capture": capture_controller.stats() if capture_controller is not None else None,
+        "replay": replay_store().stats() if replay_store() is not None else None,
+        "executor": engine_executor.stats(),
+        "preprocess": frame_preprocessor.stats() if frame_preprocessor else None,
+        "event_loop": {"max_lag_ms": round(loop_monitor.max_lag * 1000, 1)},
+    }
+    for name in components:
+        component = getattr(groq_agent, name, None)
+        stats[name] = component.stats() if component else None
+    return stats
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition: stage/e2e latency histograms, error counters, gauges."""
+    if not METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# =============================================================================
+# History API (dashboard)
+# =============================================================================
+
+async def query_history(query):
+    """Run an event-store query off the event loop."""
+    if event_store is None:
+        raise HTTPException(status_code=404, detail="Event history is disabled")
+    return await asyncio.get_running_loop().run_in_executor(None, query)
+
+
+@app.get("/api/users/{user}/stats")
+async def user_stats(user: str, start: float = 0, end: float = None, top: int = 5):
+    """Focus ratio, distractions per hour, roasts and top activities for a time range."""
+    summary = await query_history(lambda: event_store.summary(user, start, end))
+    activities = await query_history(lambda: event_store.top_activities(user, start, end, top))
+    return {"user": clean_user(user), "start": start, "end": end,
+            "summary": summary, "top_activities": activities}
+
+
+@app.get("/api/users/{user}/timeline")
+async def user_timeline(user: str, bucket: str = "hour", start: float = 0, end: float = None,
+                        limit: int = 48, offset: int = 0):
+    """Per-hour or per-day stats, newest first; follow ``next_offset`` for older pages."""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {sorted(BUCKETS)}")
+    timeline = await query_history(
+        lambda: event_store.timeline(user, bucket, start, end, limit, max(0, offset)))
+    return dict(timeline, user=clean_user(user), bucket=bucket)
+
+
+@app.get("/api/users/{user}/distractions")
+async def user_distractions(user: str, limit: int = 50, cursor: int = None):
+    """Recent distraction log, newest first; follow ``next_cursor`` for older pages."""
+    log = await query_history(lambda: event_store.distractions(user, limit, cursor))
+    return dict(log, user=clean_user(user))
+
+
+@app.delete("/api/users/{user}/history")
+async def delete_user_history(user: str):
+    """Erase everything recorded for this user (dashboard "Clear All")."""
+    deleted = await query_history(lambda: event_store.delete_user(user))
+    return {"user": clean_user(user), "deleted": deleted}
+
+
 # =============================================================================
 # Middleware
 # =============================================================================
 
-@app.middleware("http")
 async def add_no_cache_header(request, call_next):
     """Disable caching for development."""
     response = await call_next(request)
@@ -51,64 +250,65 @@ async def add_no_cache_header(request, call_next):
     if response.status_code == 304:
         response.status_code = 200
         
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Cache-Control"] = NO_CACHE
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
     
     return response
 
 
+if STATIC_MODE == "dev":
+    app.middleware("http")(add_no_cache_header)
+
+
 # =============================================================================
 # Static Files
 # =============================================================================
 
-class NoCacheStaticFiles(StaticFiles):
-    """Static file handler with cache disabled."""
-    
-    def file_response(self, *args, **kwargs):
-        response = super().file_response(*args, **kwargs)
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        return response
-
-
 if os.path.exists(STATIC_DIR):
-    app.mount("/static", NoCacheStaticFiles(directory=STATIC_DIR), name="static")
+    if static_assets is not None:
+        app.mount("/static", ProductionStaticFiles(static_assets), name="static")
+    else:
+        app.mount("/static", NoCacheStaticFiles(directory=STATIC_DIR), name="static")
 
 
 # =============================================================================
 # Page Routes
 # =============================================================================
 
-def serve_page(filename: str) -> FileResponse:
-    """Helper to serve HTML pages with no-cache headers."""
+def serve_page(request: Request, filename: str):
+    """Helper to serve HTML pages: no-cache in dev, ETag-revalidated with hashed asset URLs in prod."""
+    if static_assets is not None:
+        page, _ = static_assets.lookup(filename)
+        return page.response(request, REVALIDATE_CACHE)
     path = os.path.join(STATIC_DIR, filename)
     response = FileResponse(path)
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Cache-Control"] = NO_CACHE
     return response
 
 
 @app.get("/")
-async def landing():
+async def landing(request: Request):
     """Landing page."""
-    return serve_page("landing.html")
+    return serve_page(request, "landing.html")
 
 
 @app.get("/app")
-async def demo_app():
+async def demo_app(request: Request):
     """Main focus application."""
-    return serve_page("app.html")
+    return serve_page(request, "app.html")
 
 
 @app.get("/dashboard")
-async def dashboard():
+async def dashboard(request: Request):
     """Session history dashboard."""
-    return serve_page("dashboard.html")
+    return serve_page(request, "dashboard.html")
 
 
 @app.get("/settings")
-async def settings():
+async def settings(request: Request):
     """User settings page."""
-    return serve_page("settings.html")
+    return serve_page(request, "settings.html")
 
 
 # =============================================================================
@@ -120,26 +320,300 @@ async def websocket_focus(websocket: WebSocket):
     """Real-time focus monitoring via WebSocket."""
     await websocket.accept()
     
+    session = session_manager.open(clean_user(websocket.query_params.get("user")))
+    session.prefilter = FocusPreClassifier() if PREFILTER_ENABLED else None
+    record_event(session, SESSION_START)
+    _sockets[session.id] = websocket
+    
     try:
+        # Tell the app to play streamed clips instead of using browser speech
+        if tts_service is not None:
+            await websocket.send_json({"type": "control", "tts": "server"})
+        
         while True:
-            data = await websocket.receive_json()
-            image_data = data.get("image")
-            reason = data.get("reason")
+            try:
+                data = await receive_focus_message(websocket)
+            except (ProtocolError, ValueError) as e:
+                await websocket.send_json({"error": f"Bad message: {e}"})
+                continue
             
-            result = {}
+            # Client-side events (e.g. refocused after a roast) only go to the history
+            if data.get("event") == RECOVERED:
+                record_event(session, RECOVERED, seconds=data.get("seconds"))
+                continue
             
-            if image_data:
-                # Remove data URL prefix if present
-                if "," in image_data:
-                    image_data = image_data.split(",")[1]
-                result = groq_agent.process_distraction(image_data)
-            elif reason:
-                # Text-only trigger (e.g., tab switch)
-                roast = groq_agent.generate_roast(reason)
-                result = {"is_focused": False, "activity": reason, "tease": roast}
+            # Shutting down: in-flight pipelines finish, new messages are ignored
+            if session_manager.draining:
+                continue
             
-            if result:
-                await websocket.send_json(result)
+            # Newest message wins: while a call is in flight older ones are dropped
+            if session.submit(data):
+                session.worker = asyncio.create_task(run_session(websocket, session))
                 
     except WebSocketDisconnect:
         pass
+    finally:
+        _sockets.pop(session.id, None)
+        session_manager.close(session)
+        record_event(session, SESSION_END, seconds=time.time() - session.created_at)
+
+
+def record_event(session: FocusSession, kind: str, seconds=0.0):
+    """Append a session event to the history (no-op when the event store is off)."""
+    if event_store is None:
+        return
+    try:
+        seconds = max(0.0, float(seconds or 0.0))
+    except (TypeError, ValueError):
+        seconds = 0.0
+    event_store.append(session.user, kind, seconds=seconds)
+
+
+async def run_session(websocket: WebSocket, session: FocusSession):
+    """Process a session's messages one at a time, within the shared Groq budget."""
+    try:
+        while session.pending is not None and not session_manager.draining:
+            await session_manager.budget.acquire(session.id, request_cost(session.pending))
+            await handle_focus_message(websocket, session.take(), session)
+    finally:
+        # Also on cancellation or an unexpected error, so the next message starts a worker
+        session.busy = False
+
+
+async def receive_focus_message(websocket: WebSocket) -> dict:
+    """Read one client message: binary frame (see engine.protocol) or legacy JSON."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    
+    if message.get("bytes") is not None:
+        frame = decode_message(message["bytes"])
+        return {"image": frame.image, "reason": frame.reason}
+    data = json.loads(message["text"])
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    return data
+
+
+class RoastStream:
+    """Forwards reasoning tokens from an engine worker thread to the socket, in order."""
+    
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.sent = 0
+        self.sender = asyncio.create_task(self._send_loop())
+    
+    def push(self, delta: str):
+        """Called from the worker thread for every token delta."""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, delta)
+    
+    async def _send_loop(self):
+        while True:
+            delta = await self.queue.get()
+            if delta is None:
+                return
+            await self.websocket.send_json({"type": "roast_delta", "delta": delta})
+            self.sent += 1
+    
+    async def close(self):
+        """Flush remaining deltas before the final message goes out."""
+        self.queue.put_nowait(None)
+        await self.sender
+    
+    def engine_kwargs(self) -> dict:
+        return {"on_token": self.push}
+
+
+async def handle_focus_message(websocket: WebSocket, data: dict, session: FocusSession):
+    """Run the pipeline for one client message and send the result back."""
+    prefilter = session.prefilter
+    groq_agent = await ensure_groq_agent()
+    stream = None
+    started = time.perf_counter()
+    # One time budget for the whole event; stages degrade instead of running over
+    deadline = Deadline()
+    try:
+        image_data = data.get("image")
+        reason = data.get("reason")
+        
+        result = {}
+        
+        if image_data:
+            # Remove data URL prefix if present (JSON clients)
+            if isinstance(image_data, str) and "," in image_data:
+                image_data = image_data.split(",", 1)[1]
+            
+            frame_stats = {}
+            if frame_preprocessor is not None:
+                image_data, frame_stats = await frame_preprocessor.run(image_data)
+            
+            # Only ambiguous frames go to the vision model
+            triage = await triage_frame(prefilter, image_data)
+            if triage == LLM and groq_agent.pipeline_mode == "pipelined":
+                result = await run_pipelined(websocket, groq_agent, image_data, frame_stats, started,
+                                             deadline, reason, frame_scope(session))
+                remember_description(prefilter, result)
+                session.mark_roasted()
+                if event_store is not None:
+                    event_store.record_result(session.user, result, reason)
+                await update_capture(websocket, session, result)
+                return
+            
+            stream = RoastStream(websocket) if STREAM_ROASTS else None
+            options = stream.engine_kwargs() if stream else {}
+            options["deadline"] = deadline
+            
+            if triage == AWAY:
+                result = await engine_executor.run(
+                    groq_agent.process_description, AWAY_DESCRIPTION, **options)
+            elif triage == SAME and prefilter.last_focused:
+                # Unchanged since a frame the model judged focused: keep that verdict
+                result = groq_agent.focused_result(prefilter.last_description, deadline=deadline,
+                                                   source="prefilter")
+            elif triage == SAME:
+                result = await engine_executor.run(
+                    groq_agent.process_description, prefilter.last_description, **options)
+            else:
+                if reason:
+                    options["reason"] = reason
+                result = await engine_executor.run(groq_agent.process_distraction, image_data,
+                                                   scope=frame_scope(session), **options)
+                remember_description(prefilter, result)
+            
+            add_frame_stats(result, frame_stats)
+            if isinstance(result, dict):
+                result["prefilter"] = triage
+        elif reason:
+            # Text-only trigger (e.g., tab switch)
+            stream = RoastStream(websocket) if STREAM_ROASTS else None
+            options = stream.engine_kwargs() if stream else {}
+            result = await engine_executor.run(groq_agent.process_reason, reason, deadline=deadline, **options)
+        
+        if stream is not None:
+            await stream.close()
+            if isinstance(result, dict):
+                # Final message: full roast plus the safety verdict
+                result["type"] = "roast_final"
+                result["streamed"] = stream.sent > 0
+            stream = None
+        
+        if result:
+            await websocket.send_json(result)
+            E2E_LATENCY.observe(time.perf_counter() - started, kind="frame" if image_data else "reason")
+            session.mark_roasted()
+            if event_store is not None:
+                event_store.record_result(session.user, result, reason)
+            await send_roast_audio(websocket, result)
+            if image_data:
+                await update_capture(websocket, session, result)
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away while the pipeline was running
+        pass
+    finally:
+        if stream is not None:
+            stream.sender.cancel()
+
+
+async def run_pipelined(websocket: WebSocket, agent: GroqAgent, image_data, frame_stats: dict,
+                        started: float, deadline: Deadline, reason: str = None, scope: str = None):
+    """Send the roast as soon as it exists, then the safety verdict."""
+    options = {"reason": reason} if reason else {}
+    result, verdict = await engine_executor.run(
+        agent.process_distraction_pipelined, image_data, deadline=deadline, scope=scope, **options)
+    add_frame_stats(result, frame_stats)
+    await websocket.send_json(result)
+    E2E_LATENCY.observe(time.perf_counter() - started, kind="frame")
+    await send_roast_audio(websocket, result)
+    
+    verdict = await asyncio.wrap_future(verdict)
+    if verdict:
+        await websocket.send_json(verdict)
+    return result
+
+
+def capture_load() -> float:
+    """Current load for capture control: messages waiting for the Groq budget or a worker."""
+    return capture_controller.load(session_manager.budget.queue_depth() + engine_executor.stats()["waiting"])
+
+
+async def push_capture(websocket: WebSocket, session: FocusSession, load: float):
+    """Send the session's capture settings if its level changed."""
+    level = capture_controller.recommend(session.capture_level, session.stable, load)
+    if level == session.capture_level:
+        return
+    session.capture_level = level
+    await websocket.send_json({"type": "control", "capture": capture_settings(level)})
+
+
+async def update_capture(websocket: WebSocket, session: FocusSession, result: dict):
+    """Feed a frame's result to capture control and push any change to this socket."""
+    if capture_controller is None or not isinstance(result, dict):
+        return
+    capture_controller.observe_result(result)
+    activity = "focused" if result.get("is_focused") else classify_activity(result.get("activity"))
+    session.record_activity(activity)
+    await push_capture(websocket, session, capture_load())
+
+
+async def capture_control_loop():
+    """Re-evaluate load every CAPTURE_UPDATE_INTERVAL and push level changes to every socket."""
+    while True:
+        await asyncio.sleep(CAPTURE_UPDATE_INTERVAL)
+        load = capture_load()
+        for session_id, websocket in list(_sockets.items()):
+            session = session_manager.sessions.get(session_id)
+            if session is None:
+                continue
+            try:
+                await push_capture(websocket, session, load)
+            except (WebSocketDisconnect, RuntimeError):
+                pass  # closing; the endpoint cleans up
+
+
+async def send_roast_audio(websocket: WebSocket, result: dict):
+    """Server TTS: stream the roast's clip in binary chunks, or ask the app to speak it if there's none in time."""
+    if tts_service is None or not isinstance(result, dict) or not result.get("tease"):
+        return
+    text = result["tease"]
+    clip = await tts_service.clip(text)
+    if clip is None:
+        await websocket.send_json({"type": "speak", "text": text})
+        return
+    clip_id, mime = next(_clip_ids), clip_mime(clip)
+    for seq, offset in enumerate(range(0, len(clip), CHUNK_SIZE)):
+        last = offset + CHUNK_SIZE >= len(clip)
+        await websocket.send_bytes(encode_audio(clip_id, seq, last, mime, clip[offset:offset + CHUNK_SIZE]))
+
+
+async def triage_frame(prefilter: FocusPreClassifier, image_data) -> str:
+    """Pre-classify a frame off the event loop (away / same / llm)."""
+    if prefilter is None:
+        return LLM
+    if frame_preprocessor is not None:
+        return await frame_preprocessor.submit(prefilter.classify, image_data)
+    return await engine_executor.run(prefilter.classify, image_data)
+
+
+def frame_scope(session: FocusSession) -> str:
+    """Frame-cache scope for a session: cached descriptions never cross between cameras."""
+    return f"{session.user}/{session.id}"
+
+
+def remember_description(prefilter: FocusPreClassifier, result: dict):
+    """Keep the latest vision description so unchanged frames can reuse it."""
+    if prefilter is None or not isinstance(result, dict):
+        return
+    # Text-only results never saw the frame, so there's nothing to reuse
+    if result.get("tier") == TIER_TEXT_ONLY:
+        return
+    description = result.get("activity")
+    if isinstance(description, str) and not description.startswith(VISION_ERROR_PREFIX):
+        prefilter.remember(description, focused=result.get("is_focused") is True)
+
+
+def add_frame_stats(result: dict, frame_stats: dict):
+    """Attach per-frame preprocessing cost/savings to the result timings."""
+    if frame_stats and isinstance(result, dict):
+        result.setdefault("timings", {}).update(frame_stats)
@@ -45,6 +45,12 @@ var isDistracted = false; // Track current distraction state
 var warningVisible = false; // Track if warning popup is visible
 var floatingCamVisible = false; // Track floating cam state
 var focusHistory = []; // Buffer for focus smoothing
+var streamText = ""; // Roast text received so far (streaming mode)
+var streamSpoken = 0; // How much of streamText has been handed to TTS
+var serverTTS = false; // Server renders roast audio and streams it (FOCUS_TTS=server)
+var audioChunks = {}; // Clip id -> chunks received so far
+var roastAudio = null; // Server clip currently playing
+var capture = null; // Server-recommended capture settings (see engine/capture.py)
 var FOCUS_BUFFER_SIZE = 8; // Number of frames to average (prevents flickering)
 
 // =============================================================================
@@ -54,7 +60,23 @@ var FOCUS_BUFFER_SIZE = 8; // Number of frames to average (prevents flickering)
 var SETTINGS_KEY = "focusguard_settings";
 // Auto-detect ws:// or wss:// based on page protocol (fixes HTTPS deployment)
 var WS_PROTOCOL = window.location.protocol === "https:" ? "wss:" : "ws:";
-var WS_URL = WS_PROTOCOL + "//" + window.location.host + "/ws/focus";
+// Anonymous per-browser id: the server keeps this user's history (see /api/users/{id}/stats)
+var USER_KEY = "focusguard_user";
+var USER_ID = localStorage.getItem(USER_KEY);
+if (!USER_ID) {
+    USER_ID = "u" + Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+    localStorage.setItem(USER_KEY, USER_ID);
+}
+var WS_URL = WS_PROTOCOL + "//" + window.location.host + "/ws/focus?user=" + encodeURIComponent(USER_ID);
+
+// Binary frame protocol (see focus_guard/engine/protocol.py)
+var PROTOCOL_VERSION = 1;
+var MSG_FRAME = 1;
+var MSG_AUDIO = 2;
+var JPEG_QUALITY = 0.7;
+// Capture level 0: every new session starts here until the server says otherwise
+var CAPTURE_DEFAULTS = { level: 0, interval_ms: 0, max_side: 0, quality: JPEG_QUALITY };
+capture = CAPTURE_DEFAULTS;
 
 // Local asset paths
 var PRAISE_MEMES = [
@@ -262,11 +284,44 @@ function speak(text) {
     window.speechSynthesis.speak(utterance);
 }
 
+function speakRoast(text) {
+    // With server TTS the clip arrives over the socket instead
+    if (!serverTTS) speak(text);
+}
+
+function handleAudioChunk(buffer) {
+    // Header: "FG" | version | type | meta length, then JSON meta and a chunk of the clip
+    var view = new DataView(buffer);
+    if (buffer.byteLength < 6 || view.getUint8(3) !== MSG_AUDIO) return;
+    var metaEnd = 6 + view.getUint16(4);
+    var meta = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 6, metaEnd - 6)));
+    var chunks = audioChunks[meta.id] || (audioChunks[meta.id] = []);
+    chunks[meta.seq] = new Uint8Array(buffer, metaEnd);
+    if (!meta.last) return;
+
+    delete audioChunks[meta.id];
+    // Roast already dismissed (user refocused): drop the audio
+    if (!roastModal.classList.contains("active")) return;
+    stopRoastAudio();
+    var url = URL.createObjectURL(new Blob(chunks, { type: meta.mime }));
+    roastAudio = new Audio(url);
+    roastAudio.onended = function() { URL.revokeObjectURL(url); };
+    roastAudio.play().catch(function() {});
+}
+
+function stopRoastAudio() {
+    if (roastAudio) {
+        roastAudio.pause();
+        roastAudio = null;
+    }
+}
+
 // =============================================================================
 // Roast Functions
 // =============================================================================
 
-function triggerRoast(text) {
+function triggerRoast(text, options) {
+    options = options || {};
     lastRoastTime = Date.now();
     roasts++;
     roastCounterEl.textContent = roasts;
@@ -283,7 +338,7 @@ function triggerRoast(text) {
 
     roastTextEl.textContent = '"' + text + '"';
     roastModal.classList.add("active");
-    speak(text);
+    if (!options.silent) speakRoast(text);
     
     setTimeout(function() { 
         roastModal.classList.remove("active");
@@ -291,6 +346,57 @@ function triggerRoast(text) {
     }, 6000);
 }
 
+function handleRoastDelta(delta) {
+    if (!streamText) {
+        // First token: open the roast modal right away
+        triggerRoast("", { silent: true });
+    }
+    streamText += delta;
+    roastTextEl.textContent = '"' + streamText + '"';
+
+    // Start speaking as soon as a full phrase is available
+    var pending = streamText.slice(streamSpoken);
+    var match = pending.match(/^[\s\S]*[.!?,;:](\s|$)/);
+    if (match) {
+        speakRoast(match[0].trim());
+        streamSpoken += match[0].length;
+    }
+}
+
+function finishStreamedRoast(data) {
+    if (!streamText) {
+        // Nothing was shown (user refocused before the first token)
+        resetRoastStream();
+        return;
+    }
+    if (data.safe === false) {
+        retractRoast(data.tease);
+    } else {
+        var rest = streamText.slice(streamSpoken).trim();
+        if (rest) speakRoast(rest);
+        roastTextEl.textContent = '"' + data.tease + '"';
+        log("Roast: " + data.tease);
+        saveActivityLog("[ROAST] " + data.tease, "roast");
+    }
+    resetRoastStream();
+}
+
+function resetRoastStream() {
+    streamText = "";
+    streamSpoken = 0;
+}
+
+function retractRoast(replacement) {
+    // Roast failed the safety check after delivery - stop speaking it
+    window.speechSynthesis.cancel();
+    stopRoastAudio();
+    if (roastModal.classList.contains("active")) {
+        roastTextEl.textContent = '"' + replacement + '"';
+    }
+    log("Roast retracted by safety check.");
+    saveActivityLog("[ROAST] " + replacement, "roast");
+}
+
 // =============================================================================
 // Focus Smoothing (prevents flickering)
 // =============================================================================
@@ -317,6 +423,9 @@ function updateRecovery() {
     if (lastRoastTime > 0) {
         var diff = (Date.now() - lastRoastTime) / 1000;
         recoveryTimes.push(diff);
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ event: "recovered", seconds: diff }));
+        }
         var sum = recoveryTimes.reduce(function(a, b) { return a + b; }, 0);
         var avg = sum / recoveryTimes.length;
         if (recoveryRateEl) recoveryRateEl.textContent = avg.toFixed(1);
@@ -469,25 +578,63 @@ var camera = new Camera(videoElement, {
 function sendDistraction(reason) {
     var now = Date.now();
     settings = getSettings();
-    var cooldown = (settings.roastCooldown || 12) * 1000;
+    // Under load the server asks for fewer frames than the user's cooldown allows
+    var cooldown = Math.max((settings.roastCooldown || 12) * 1000, capture.interval_ms || 0);
     
     if (now - lastTriggerTime < cooldown) return;
     if (!ws || ws.readyState !== WebSocket.OPEN) return;
 
     lastTriggerTime = now;
     
+    // Downscale to the server-recommended size (0 = camera resolution)
+    var scale = 1;
+    var longest = Math.max(videoElement.videoWidth, videoElement.videoHeight);
+    if (capture.max_side && longest > capture.max_side) scale = capture.max_side / longest;
     var tempCanvas = document.createElement("canvas");
-    tempCanvas.width = videoElement.videoWidth;
-    tempCanvas.height = videoElement.videoHeight;
-    tempCanvas.getContext("2d").drawImage(videoElement, 0, 0);
-    var imageData = tempCanvas.toDataURL("image/jpeg", 0.7);
-
-    ws.send(JSON.stringify({ image: imageData, reason: reason }));
+    tempCanvas.width = Math.round(videoElement.videoWidth * scale);
+    tempCanvas.height = Math.round(videoElement.videoHeight * scale);
+    tempCanvas.getContext("2d").drawImage(videoElement, 0, 0, tempCanvas.width, tempCanvas.height);
+    sendFrame(tempCanvas, reason);
     monitorStatus.innerHTML = "<span class='status-warning'>Detecting Distraction...</span>";
     log("Trigger: " + reason);
     saveActivityLog("[WARNING] " + reason, "warning");
 }
 
+function sendFrame(canvas, reason) {
+    // Legacy path: base64 data URL inside JSON
+    if (!canvas.toBlob) {
+        var imageData = canvas.toDataURL("image/jpeg", capture.quality || JPEG_QUALITY);
+        ws.send(JSON.stringify({ image: imageData, reason: reason }));
+        return;
+    }
+
+    canvas.toBlob(function(jpeg) {
+        if (!jpeg || !ws || ws.readyState !== WebSocket.OPEN) return;
+        ws.send(encodeFrameMessage(jpeg, reason));
+    }, "image/jpeg", capture.quality || JPEG_QUALITY);
+}
+
+function applyCaptureSettings(next) {
+    if (next.level !== capture.level) {
+        log(next.level > capture.level
+            ? "Server busy: capturing less often (level " + next.level + ")"
+            : "Server load eased: capture level " + next.level);
+    }
+    capture = next;
+}
+
+function encodeFrameMessage(jpeg, reason) {
+    // Header: "FG" | version | type | reason length (uint16, big-endian)
+    var reasonBytes = new TextEncoder().encode(reason || "").slice(0, 65535);
+    var header = new DataView(new ArrayBuffer(6));
+    header.setUint8(0, 70);
+    header.setUint8(1, 71);
+    header.setUint8(2, PROTOCOL_VERSION);
+    header.setUint8(3, MSG_FRAME);
+    header.setUint16(4, reasonBytes.length);
+    return new Blob([header, reasonBytes, jpeg]);
+}
+
 // =============================================================================
 // Activity Logging
 // =============================================================================
@@ -526,10 +673,45 @@ document.getElementById("startBtn").onclick = function() {
     }, 500);
 
     // Initialize WebSocket
+    capture = CAPTURE_DEFAULTS;
     ws = new WebSocket(WS_URL);
+    ws.binaryType = "arraybuffer";
     
     ws.onmessage = function(e) {
+        // Server TTS audio for the roast on screen
+        if (e.data instanceof ArrayBuffer) {
+            handleAudioChunk(e.data);
+            return;
+        }
         var data = JSON.parse(e.data);
+        
+        if (data.type === "control") {
+            if (data.tts) serverTTS = data.tts === "server";
+            if (data.capture) applyCaptureSettings(data.capture);
+            return;
+        }
+        // Server TTS had no clip in time: speak it here
+        if (data.type === "speak") {
+            if (roastModal.classList.contains("active")) speak(data.text);
+            return;
+        }
+        
+        // Pipelined mode: late safety verdict for the roast already shown
+        if (data.type === "safety") {
+            if (data.retract) retractRoast(data.tease);
+            return;
+        }
+        
+        // Streaming mode: partial roast tokens, then a final message with the verdict
+        if (data.type === "roast_delta") {
+            if (isDistracted) handleRoastDelta(data.delta);
+            return;
+        }
+        if (data.type === "roast_final" && data.streamed) {
+            finishStreamedRoast(data);
+            return;
+        }
+        
         if (!data.tease) return;
         
         // Only show roast if currently distracted
@@ -4,6 +4,10 @@
 
 var STORAGE_KEY = "focusguard_sessions";
 var LOG_KEY = "focusguard_logs";
+// Anonymous per-browser id set by app.js; the server keeps this user's history
+var USER_ID = localStorage.getItem("focusguard_user");
+var API_BASE = USER_ID ? "/api/users/" + encodeURIComponent(USER_ID) : null;
+var HISTORY_DAYS = 30;
 
 // Load and display data
 document.addEventListener("DOMContentLoaded", function() {
@@ -17,7 +21,68 @@ document.addEventListener("DOMContentLoaded", function() {
     }
 });
 
+// =============================================================================
+// Server History (/api/users/{id}/...)
+// =============================================================================
+
+function fetchHistory(path) {
+    if (!API_BASE || !window.fetch) return Promise.reject(new Error("no server history"));
+    return fetch(API_BASE + path, { cache: "no-store" }).then(function(response) {
+        if (!response.ok) throw new Error("HTTP " + response.status);
+        return response.json();
+    });
+}
+
 function loadDashboardData() {
+    Promise.all([
+        fetchHistory("/stats"),
+        fetchHistory("/timeline?bucket=day&limit=" + HISTORY_DAYS)
+    ]).then(function(responses) {
+        renderServerStats(responses[0].summary);
+        renderServerHistory(responses[1].items);
+    }).catch(function() {
+        // Offline, history disabled, or never connected: fall back to this browser's records
+        loadLocalDashboardData();
+    });
+}
+
+function renderServerStats(summary) {
+    var focusedMinutes = Math.floor((summary.focused_seconds || 0) / 60);
+    var distractedSeconds = (summary.session_seconds || 0) - (summary.focused_seconds || 0);
+    document.getElementById("totalFocusTime").textContent =
+        Math.floor(focusedMinutes / 60) + "h " + (focusedMinutes % 60) + "m";
+    document.getElementById("totalSessions").textContent = summary.sessions || 0;
+    document.getElementById("totalRoasts").textContent = summary.roasts || 0;
+    document.getElementById("avgRecovery").textContent = summary.distractions
+        ? (distractedSeconds / summary.distractions).toFixed(1) + "s"
+        : "0s";
+}
+
+function renderServerHistory(days) {
+    // One entry per day with activity, newest first (already ordered by the server)
+    renderHistory(days.map(function(day) {
+        var roastsPerSession = day.sessions ? day.roasts / day.sessions : day.roasts;
+        return {
+            date: new Date(day.start * 1000).toISOString(),
+            duration: Math.floor((day.focused_seconds || 0) / 60),
+            roasts: day.roasts,
+            grade: gradeFor(roastsPerSession),
+            daily: true
+        };
+    }));
+}
+
+function gradeFor(roasts) {
+    // Same scale as the end-of-session grade in app.js
+    var grades = ["F", "D-", "C", "B", "A+"];
+    return grades[Math.max(0, 4 - Math.floor(roasts / 2))] || "F";
+}
+
+// =============================================================================
+// Local Fallback (localStorage)
+// =============================================================================
+
+function loadLocalDashboardData() {
     var sessions = JSON.parse(localStorage.getItem(STORAGE_KEY) || "[]");
     
     // Calculate totals
@@ -68,14 +133,12 @@ function renderHistory(sessions) {
     var html = "";
     sessions.forEach(function(s) {
         var gradeClass = getGradeClass(s.grade);
-        var date = new Date(s.date).toLocaleDateString("vi-VN", {
-            weekday: "short",
-            year: "numeric",
-            month: "short",
-            day: "numeric",
-            hour: "2-digit",
-            minute: "2-digit"
-        });
+        var dateOptions = { weekday: "short", year: "numeric", month: "short", day: "numeric" };
+        if (!s.daily) {
+            dateOptions.hour = "2-digit";
+            dateOptions.minute = "2-digit";
+        }
+        var date = new Date(s.date).toLocaleDateString("vi-VN", dateOptions);
 
         html += '<div class="history-item">' +
             '<div>' +
@@ -101,10 +164,26 @@ function getGradeClass(grade) {
 }
 
 function loadActivityLog() {
-    var logs = JSON.parse(localStorage.getItem(LOG_KEY) || "[]");
+    fetchHistory("/distractions?limit=50").then(function(log) {
+        renderActivityLog(log.items.map(function(item) {
+            var description = item.description || item.activity;
+            return {
+                time: new Date(item.ts * 1000).toLocaleTimeString(),
+                message: (item.roasted ? "[ROAST] " : "[WARNING] ") + description,
+                type: item.roasted ? "roast" : "warning"
+            };
+        }));
+    }).catch(function() {
+        // Show last 50 local logs
+        var logs = JSON.parse(localStorage.getItem(LOG_KEY) || "[]");
+        renderActivityLog(logs.slice(-50).reverse());
+    });
+}
+
+function renderActivityLog(entries) {
     var container = document.getElementById("activityLog");
 
-    if (logs.length === 0) {
+    if (entries.length === 0) {
         container.innerHTML = '<div class="empty-state">' +
             '<span class="empty-icon">--</span>' +
             '<p>Activity log will appear here after your sessions.</p>' +
@@ -112,28 +191,43 @@ function loadActivityLog() {
         return;
     }
 
-    // Show last 50 logs
-    var recentLogs = logs.slice(-50).reverse();
-    
     var html = "";
-    recentLogs.forEach(function(log) {
+    entries.forEach(function(log) {
         var typeClass = log.type === "roast" ? "log-roast" : 
                        log.type === "praise" ? "log-praise" : "";
         html += '<div class="log-entry">' +
             '<span class="log-time">[' + log.time + ']</span>' +
-            '<span class="' + typeClass + '">' + log.message + '</span>' +
+            '<span class="' + typeClass + '">' + escapeHtml(log.message) + '</span>' +
             '</div>';
     });
     container.innerHTML = html;
 }
 
+function escapeHtml(text) {
+    var div = document.createElement("div");
+    div.textContent = text == null ? "" : String(text);
+    return div.innerHTML;
+}
+
 function clearHistory() {
-    if (confirm("Are you sure you want to clear all history? This cannot be undone.")) {
+    if (!confirm("Are you sure you want to clear all history? This cannot be undone.")) return;
+
+    // Server history first (this browser's user only), then the local records
+    var cleared = API_BASE && window.fetch
+        ? fetch(API_BASE + "/history", { method: "DELETE" }).then(function(response) {
+            // 404: history is disabled on the server, so there is nothing stored there
+            if (!response.ok && response.status !== 404) throw new Error("HTTP " + response.status);
+        })
+        : Promise.resolve();
+
+    cleared.then(function() {
         localStorage.removeItem(STORAGE_KEY);
         localStorage.removeItem(LOG_KEY);
         loadDashboardData();
         loadActivityLog();
-    }
+    }).catch(function() {
+        alert("Could not clear the history on the server. Please try again.");
+    });
 }
 
 // Export for use in app.js
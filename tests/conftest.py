@@ -0,0 +1,25 @@
+"""
+FocusGuard AI - Shared test fixtures
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_safety_cache(monkeypatch):
+    """Keep safety verdicts in memory so tests never share or write a cache file."""
+    import focus_guard.engine.safety as safety
+    monkeypatch.setattr(safety, "SAFETY_CACHE_PATH", ":memory:")
+
+
+@pytest.fixture(autouse=True)
+def isolated_event_store(monkeypatch, tmp_path):
+    """Write focus history under tmp_path, never into the repo's data directory."""
+    import focus_guard.engine.events as events
+    monkeypatch.setattr(events, "EVENTS_PATH", str(tmp_path / "events.db"))
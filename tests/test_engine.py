@@ -0,0 +1,2201 @@
+"""
+FocusGuard AI - Engine Tests
+Run with: pytest tests/test_engine.py -v
+"""
+
+import asyncio
+import base64
+import io
+import itertools
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+from unittest.mock import Mock, patch
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def completion(content):
+    """Build a fake chat completion response."""
+    response = Mock()
+    response.choices = [Mock(message=Mock(content=content))]
+    return response
+
+
+@pytest.fixture
+def mock_groq_client():
+    """Create a mock Groq client."""
+    with patch("focus_guard.engine.groq_agent.Groq") as mock:
+        mock_instance = Mock()
+        mock.return_value = mock_instance
+        yield mock_instance
+
+
+@pytest.fixture
+def agent(mock_groq_client):
+    """Create a GroqAgent with mocked client."""
+    with patch.dict(os.environ, {"GROQ_API_KEY": "test-key"}):
+        from focus_guard.engine.groq_agent import GroqAgent
+        return GroqAgent()
+
+
+def replies_by_model(vision="User is on phone", roast="Lock in bro", safety="safe", safety_delay=0.0):
+    """side_effect that answers each stage by model name."""
+    def create(model, **kwargs):
+        if "guard" in model:
+            time.sleep(safety_delay)
+            return completion(safety)
+        if "scout" in model:
+            return completion(vision)
+        return completion(roast)
+    return create
+
+
+def jpeg_frame(shade=0, block=(20, 20, 40, 40), noise=0):
+    """Synthetic 64x64 JPEG (base64) with a dark block on a light background."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("L", (64, 64), 200 - noise)
+    ImageDraw.Draw(img).rectangle(block, fill=shade)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=80)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class TestEngineExecutor:
+    """Test the bounded executor offload path."""
+
+    def test_blocking_calls_run_concurrently(self):
+        """Test slow calls overlap instead of serialising on the loop."""
+        from focus_guard.engine.executor import EngineExecutor
+
+        executor = EngineExecutor(max_workers=4)
+
+        async def main():
+            started = time.perf_counter()
+            await asyncio.gather(*(executor.run(time.sleep, 0.1) for _ in range(4)))
+            return time.perf_counter() - started
+
+        assert asyncio.run(main()) < 0.3
+        executor.shutdown()
+
+    def test_event_loop_stays_responsive(self):
+        """Test the loop keeps ticking while a blocking call runs."""
+        from focus_guard.engine.executor import EngineExecutor
+
+        executor = EngineExecutor(max_workers=1)
+
+        async def main():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(ticker())
+            await executor.run(time.sleep, 0.2)
+            task.cancel()
+            return ticks
+
+        assert asyncio.run(main()) > 5
+        executor.shutdown()
+
+    def test_pool_is_bounded(self):
+        """Test no more than max_workers calls run at once."""
+        from focus_guard.engine.executor import EngineExecutor
+
+        executor = EngineExecutor(max_workers=2)
+        lock = threading.Lock()
+        active, peak = 0, 0
+
+        def work():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        async def main():
+            await asyncio.gather(*(executor.run(work) for _ in range(6)))
+
+        asyncio.run(main())
+        assert peak == 2
+        assert executor.stats()["in_flight"] == 0
+        executor.shutdown()
+
+    def test_inline_mode(self):
+        """Test max_workers=0 runs calls directly."""
+        from focus_guard.engine.executor import EngineExecutor
+
+        executor = EngineExecutor(max_workers=0)
+        assert asyncio.run(executor.run(lambda x: x * 2, 21)) == 42
+
+
+class TestPipelinedMode:
+    """Test stage timings and the pipelined (overlapped safety) mode."""
+
+    def test_sequential_reports_stage_timings(self, agent, mock_groq_client):
+        """Test every stage records its latency."""
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model()
+
+        result = agent.process_distraction("frame")
+
+        for stage in ("vision_ms", "reasoning_ms", "safety_ms", "time_to_roast_ms", "total_ms"):
+            assert stage in result["timings"]
+        assert result["safe"] is True
+
+    def test_pipelined_returns_before_safety(self, agent, mock_groq_client):
+        """Test the roast is available while Llama Guard is still running."""
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(safety_delay=0.3)
+
+        started = time.perf_counter()
+        result, verdict = agent.process_distraction_pipelined("frame")
+        assert time.perf_counter() - started < 0.3
+        assert result["tease"] == "Lock in bro"
+        assert result["safe"] is None
+
+        message = verdict.result(timeout=2)
+        assert message == {
+            "type": "safety", "safe": True, "retract": False,
+            "tease": "Lock in bro", "timings": message["timings"],
+        }
+
+    def test_pipelined_retracts_unsafe_roast(self, agent, mock_groq_client):
+        """Test an unsafe verdict retracts the delivered roast."""
+        from focus_guard.engine.groq_agent import UNSAFE_FALLBACK
+
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(safety="unsafe\nS1")
+
+        _, verdict = agent.process_distraction_pipelined("frame")
+        message = verdict.result(timeout=2)
+
+        assert message["retract"] is True
+        assert message["tease"] == UNSAFE_FALLBACK
+
+    def test_streamed_roast_reports_ttft(self, agent, mock_groq_client):
+        """Test roast deltas reach the callback and time-to-first-token is recorded."""
+        chunks = [Mock(choices=[Mock(delta=Mock(content=text))]) for text in ("Lock", " in", " bro", None)]
+
+        def create(model, **kwargs):
+            if kwargs.get("stream"):
+                return iter(chunks)
+            return replies_by_model()(model, **kwargs)
+
+        mock_groq_client.chat.completions.create.side_effect = create
+        deltas = []
+
+        result = agent.process_distraction("frame", on_token=deltas.append)
+
+        assert deltas == ["Lock", " in", " bro"]
+        assert result["tease"] == "Lock in bro"
+        assert result["safe"] is True
+        assert result["timings"]["ttft_ms"] <= result["timings"]["time_to_roast_ms"]
+
+    def test_broken_stream_falls_back(self, agent, mock_groq_client):
+        """Test a stream that fails before any token yields the fallback roast."""
+        from focus_guard.engine.groq_agent import ROAST_FALLBACK
+
+        mock_groq_client.chat.completions.create.side_effect = Exception("stream reset")
+
+        assert agent.stream_roast("User is on phone", lambda delta: None) == ROAST_FALLBACK
+
+
+
+class TestFrameCache:
+    """Test the perceptual-hash frame cache."""
+
+    def test_near_duplicate_frames_hit(self):
+        """Test a slightly different frame reuses the cached description."""
+        from focus_guard.engine.frame_cache import FrameCache
+
+        cache = FrameCache(threshold=6)
+        cache.put(cache.fingerprint(jpeg_frame()), "User is on phone")
+
+        assert cache.get(cache.fingerprint(jpeg_frame(noise=3))) == "User is on phone"
+        assert cache.stats()["hits"] == 1
+
+    def test_different_scene_misses(self):
+        """Test a different scene does not match."""
+        from focus_guard.engine.frame_cache import FrameCache
+
+        cache = FrameCache(threshold=6)
+        cache.put(cache.fingerprint(jpeg_frame()), "User is on phone")
+
+        assert cache.get(cache.fingerprint(jpeg_frame(block=(0, 40, 63, 63)))) is None
+        assert cache.stats()["misses"] == 1
+
+    def test_ttl_and_lru_bounds(self):
+        """Test entries expire and the cache never exceeds its size."""
+        from focus_guard.engine.frame_cache import FrameCache
+
+        cache = FrameCache(max_entries=2, ttl=0.05, threshold=0)
+        for key in (1, 2, 3):
+            cache.put((None, key), str(key))
+        assert cache.stats()["entries"] == 2
+        assert cache.get((None, 1)) is None
+
+        time.sleep(0.06)
+        assert cache.get((None, 3)) is None
+        assert cache.stats()["entries"] == 0
+
+    def test_invalid_frame_bypasses_cache(self):
+        """Test undecodable payloads are not hashed."""
+        from focus_guard.engine.frame_cache import FrameCache
+
+        assert FrameCache().fingerprint("not-a-jpeg") is None
+
+    def test_sessions_do_not_share_descriptions(self, agent, mock_groq_client):
+        """Test a near-identical frame from another session still gets its own vision call."""
+        mock_groq_client.chat.completions.create.side_effect = [
+            completion("User is on phone"), completion("User is eating")]
+
+        assert agent.analyze_image(jpeg_frame(), scope="alice/1") == "User is on phone"
+        assert agent.analyze_image(jpeg_frame(noise=2), scope="bob/2") == "User is eating"
+        assert agent.analyze_image(jpeg_frame(noise=1), scope="alice/1") == "User is on phone"
+        assert mock_groq_client.chat.completions.create.call_count == 2
+
+    def test_analyze_image_skips_duplicate_call(self, agent, mock_groq_client):
+        """Test the vision model is called once for repeated frames."""
+        mock_groq_client.chat.completions.create.return_value = completion("User is on phone")
+
+        assert agent.analyze_image(jpeg_frame()) == "User is on phone"
+        assert agent.analyze_image(jpeg_frame(noise=2)) == "User is on phone"
+        mock_groq_client.chat.completions.create.assert_called_once()
+
+
+
+class TestRoastPool:
+    """Test the per-activity roast pool."""
+
+    def test_classify_activity(self):
+        """Test descriptions and reasons map to activity classes."""
+        from focus_guard.engine.roast_pool import classify_activity
+
+        assert classify_activity("The person is looking at a phone") == "phone"
+        assert classify_activity("User switched tabs/windows") == "tab_switch"
+        assert classify_activity("Eyes closed, appears to be sleeping") == "sleeping"
+        assert classify_activity("The chair is empty") == "away"
+        assert classify_activity("Person is eating a sandwich") == "other"
+
+    def test_miss_triggers_refill_then_hits(self):
+        """Test an empty class is refilled in the background and then served."""
+        from focus_guard.engine.roast_pool import RoastPool
+
+        pool = RoastPool(lambda prompt: f"roast {time.perf_counter()}", lambda text: True,
+                         capacity=3, fresh_ratio=0)
+        assert pool.take("phone") is None
+
+        deadline = time.time() + 2
+        while pool.stats()["sizes"]["phone"] < 3 and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert pool.take("phone").startswith("roast")
+        assert pool.stats()["hits"] == 1
+        pool.shutdown()
+
+    def test_unsafe_roasts_are_not_pooled(self):
+        """Test refills drop roasts that fail the safety check."""
+        from focus_guard.engine.roast_pool import RoastPool
+
+        pool = RoastPool(lambda prompt: "unsafe roast", lambda text: False, capacity=2, fresh_ratio=0)
+        pool._refill("away")
+
+        assert pool.stats()["sizes"]["away"] == 0
+        assert pool.stats()["rejected"] == 4
+        pool.shutdown()
+
+    def test_fresh_ratio_bypasses_pool(self):
+        """Test fresh_ratio=1 always asks for a fresh roast."""
+        from focus_guard.engine.roast_pool import RoastPool
+
+        pool = RoastPool(lambda prompt: None, lambda text: True, fresh_ratio=1.0)
+        pool.add("phone", "Put it down")
+
+        assert pool.take("phone") is None
+        assert pool.stats()["fresh"] == 1
+        pool.shutdown()
+
+    def test_pool_hit_skips_reasoning_and_safety(self, agent, mock_groq_client):
+        """Test a pooled roast only costs the vision call."""
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model()
+        agent.roast_pool.fresh_ratio = 0
+        agent.roast_pool.low_water = 0
+        agent.roast_pool.add("phone", "Phone down, bestie")
+
+        result = agent.process_distraction("frame")
+
+        assert result["tease"] == "Phone down, bestie"
+        assert result["source"] == "pool"
+        assert mock_groq_client.chat.completions.create.call_count == 1
+
+    def test_failed_safety_check_keeps_roast_out_of_pool(self, agent, mock_groq_client):
+        """Test a roast delivered without a verdict (fail-open) is never pooled."""
+        def create(model, **kwargs):
+            if "guard" in model:
+                raise ConnectionError("guard down")
+            return replies_by_model()(model, **kwargs)
+        mock_groq_client.chat.completions.create.side_effect = create
+        agent.roast_pool.fresh_ratio = 1.0
+
+        result = agent.process_distraction("frame")
+        agent.roast_pool._refill("phone")
+
+        assert result["tease"] == "Lock in bro"
+        assert agent.roast_pool.stats()["sizes"]["phone"] == 0
+        assert agent.roast_pool.stats()["rejected"] >= 2 * agent.roast_pool.capacity
+
+
+
+class TestSafety:
+    """Test the safety verdict cache and micro-batcher."""
+
+    def test_verdict_cache_persists(self, tmp_path):
+        """Test verdicts survive a restart via the SQLite file."""
+        from focus_guard.engine.safety import VerdictCache
+
+        path = str(tmp_path / "verdicts.db")
+        cache = VerdictCache(path)
+        cache.put("Lock in bro", True)
+        cache.put("bad roast", False)
+        cache.close()
+
+        reopened = VerdictCache(path)
+        assert reopened.get("lock in  BRO") is True
+        assert reopened.get("bad roast") is False
+        assert reopened.get("never seen") is None
+
+    def test_verdict_cache_is_bounded(self, tmp_path):
+        """Test the least recently used verdict is evicted."""
+        from focus_guard.engine.safety import VerdictCache
+
+        cache = VerdictCache(str(tmp_path / "verdicts.db"), max_entries=2)
+        cache.put("a", True)
+        cache.put("b", True)
+        cache.get("a")
+        cache.put("c", True)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is True
+        assert cache._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] == 2
+
+    def test_locked_cache_file_does_not_fail_check(self, tmp_path):
+        """Test a write lock held by another worker only skips the write-through."""
+        from focus_guard.engine.safety import VerdictCache
+
+        path = str(tmp_path / "verdicts.db")
+        cache = VerdictCache(path, busy_timeout=0.05)
+        other = sqlite3.connect(path)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            cache.put("Lock in bro", True)
+        finally:
+            other.rollback()
+            other.close()
+
+        assert cache.get("Lock in bro") is True
+        assert cache.stats()["write_errors"] == 1
+
+    def test_concurrent_checks_share_one_batch(self):
+        """Test checks arriving together are moderated in one call."""
+        from focus_guard.engine.safety import SafetyBatcher
+
+        calls = []
+
+        def moderate(texts):
+            calls.append(list(texts))
+            return [not text.startswith("bad") for text in texts]
+
+        batcher = SafetyBatcher(moderate, window=0.05, max_batch=8)
+        results = {}
+        threads = [
+            threading.Thread(target=lambda t=t: results.__setitem__(t, batcher.check(t)))
+            for t in ("one", "two", "bad three")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == {"one": True, "two": True, "bad three": False}
+        assert len(calls) == 1
+        batcher.shutdown()
+
+    def test_slow_moderation_hits_timeout(self):
+        """Test the timeout budget caps how long a check can wait."""
+        from focus_guard.engine.safety import SafetyBatcher
+
+        batcher = SafetyBatcher(lambda texts: time.sleep(1) or [True], window=0, timeout=0.1)
+
+        started = time.perf_counter()
+        assert batcher.check("slow") is None
+        assert time.perf_counter() - started < 0.5
+        assert batcher.stats()["timeouts"] == 1
+        batcher.shutdown()
+
+    def test_check_safety_uses_cache(self, agent, mock_groq_client):
+        """Test a repeated roast only costs one Llama Guard call."""
+        mock_groq_client.chat.completions.create.return_value = completion("safe")
+
+        assert agent.check_safety("Lock in bro") is True
+        assert agent.check_safety("Lock in bro") is True
+        mock_groq_client.chat.completions.create.assert_called_once()
+
+    def test_unsafe_batch_falls_back_to_individual_checks(self, agent, mock_groq_client):
+        """Test an unsafe combined verdict is resolved per roast."""
+        def create(model, messages, **kwargs):
+            return completion("unsafe\nS1" if "bad" in messages[0]["content"] else "safe")
+
+        mock_groq_client.chat.completions.create.side_effect = create
+
+        assert agent._moderate_batch(["fine roast", "bad roast"]) == [True, False]
+        assert mock_groq_client.chat.completions.create.call_count == 3
+
+    def test_moderation_uses_remaining_budget(self, agent, mock_groq_client):
+        """Test a late check asks Llama Guard for no more than the time left."""
+        from focus_guard.engine.deadline import deadline_scope
+
+        mock_groq_client.chat.completions.create.return_value = completion("safe")
+
+        with deadline_scope(time.monotonic() + 0.3):
+            assert agent._moderate("Lock in bro") is True
+        assert agent.check_safety("Put the phone down", timeout=0.2) is True
+
+        budgets = [call.kwargs["timeout"] for call in mock_groq_client.chat.completions.create.call_args_list]
+        assert budgets[0] <= 0.3
+        assert budgets[1] <= 0.2
+
+    def test_batched_moderation_uses_caller_budget(self):
+        """Test a safety batch runs within its most patient caller's budget."""
+        from focus_guard.engine.deadline import time_left
+        from focus_guard.engine.safety import SafetyBatcher
+
+        budgets = []
+        batcher = SafetyBatcher(lambda texts: budgets.append(time_left()) or [True], window=0)
+
+        assert batcher.check("Lock in bro", timeout=0.5) is True
+        assert 0 < budgets[0] <= 0.5
+        batcher.shutdown()
+
+
+
+class TestFrameProtocol:
+    """Test the binary /ws/focus frame format."""
+
+    def test_round_trip_without_copy(self):
+        """Test decode returns a view into the original buffer."""
+        from focus_guard.engine.protocol import decode_message, encode_frame
+
+        payload = encode_frame(b"\xff\xd8jpeg-bytes", "Looking at phone")
+        message = decode_message(payload)
+
+        assert message.reason == "Looking at phone"
+        assert bytes(message.image) == b"\xff\xd8jpeg-bytes"
+        assert isinstance(message.image, memoryview)
+        assert message.image.obj is payload
+
+    @pytest.mark.parametrize("payload", [b"FG", b"XX\x01\x01\x00\x00", b"FG\x09\x01\x00\x00", b"FG\x01\x01\x00\x09ab"])
+    def test_malformed_messages_rejected(self, payload):
+        """Test short, foreign, future-version and truncated messages raise."""
+        from focus_guard.engine.protocol import ProtocolError, decode_message
+
+        with pytest.raises(ProtocolError):
+            decode_message(payload)
+
+    def test_frame_helpers_accept_both_formats(self):
+        """Test base64 text and raw bytes resolve to the same frame."""
+        from focus_guard.engine.protocol import frame_base64, frame_bytes
+
+        raw = b"\xff\xd8jpeg"
+        text = base64.b64encode(raw).decode()
+
+        assert frame_bytes(text) == raw
+        assert frame_base64(memoryview(raw)) == text
+        assert frame_bytes("not base64!") is None
+
+    def test_raw_frames_share_cache_with_base64(self, agent, mock_groq_client):
+        """Test a binary frame hits the cache entry of the same JSON frame."""
+        mock_groq_client.chat.completions.create.return_value = completion("User is on phone")
+        frame = jpeg_frame()
+
+        agent.analyze_image(frame)
+        assert agent.analyze_image(memoryview(base64.b64decode(frame))) == "User is on phone"
+        mock_groq_client.chat.completions.create.assert_called_once()
+
+
+
+def large_jpeg(width=1280, height=720):
+    """Detailed webcam-sized JPEG (raw bytes)."""
+    from PIL import Image
+
+    img = Image.radial_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+class TestFramePreprocessor:
+    """Test server-side downscaling before the vision call."""
+
+    def test_downscales_large_frames(self):
+        """Test frames are shrunk to the target size and report savings."""
+        from PIL import Image
+        from focus_guard.engine.preprocess import FramePreprocessor
+
+        preprocessor = FramePreprocessor(max_side=320, quality=60)
+        raw = large_jpeg()
+        output, stats = preprocessor.process(raw)
+
+        assert max(Image.open(io.BytesIO(output)).size) <= 320
+        assert stats["bytes_saved"] == len(raw) - len(output) > 0
+        assert "preprocess_ms" in stats
+        assert preprocessor.stats()["frames"] == 1
+        preprocessor.shutdown()
+
+    def test_center_crop(self):
+        """Test the crop option keeps the centre of the frame."""
+        from PIL import Image
+        from focus_guard.engine.preprocess import FramePreprocessor
+
+        preprocessor = FramePreprocessor(max_side=2000, crop=0.5)
+        output, _ = preprocessor.process(large_jpeg(800, 600))
+
+        assert Image.open(io.BytesIO(output)).size == (400, 300)
+        preprocessor.shutdown()
+
+    def test_small_or_invalid_frames_pass_through(self):
+        """Test frames that can't be improved are sent unchanged."""
+        from focus_guard.engine.preprocess import FramePreprocessor
+
+        preprocessor = FramePreprocessor(max_side=512)
+        small = jpeg_frame()
+
+        assert preprocessor.process(small)[0] is small
+        assert preprocessor.process("not-a-jpeg")[0] == "not-a-jpeg"
+        preprocessor.shutdown()
+
+    def test_runs_off_the_event_loop(self):
+        """Test async preprocessing happens on the dedicated pool."""
+        from focus_guard.engine.preprocess import FramePreprocessor
+
+        preprocessor = FramePreprocessor(max_side=320)
+        seen = []
+        original = preprocessor._reencode
+
+        def spy(raw):
+            seen.append(threading.current_thread().name)
+            return original(raw)
+
+        preprocessor._reencode = spy
+        asyncio.run(preprocessor.run(large_jpeg()))
+
+        assert seen[0].startswith("focus-preprocess")
+        preprocessor.shutdown()
+
+
+
+def scene_jpeg(face=True, brightness=110, shift=0):
+    """Raw JPEG of a grey room, optionally with a skin-tone 'face' in the middle."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (320, 240), (brightness, brightness, brightness))
+    if face:
+        ImageDraw.Draw(img).ellipse((110 + shift, 50, 210 + shift, 190), fill=(224, 172, 140))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class TestPreClassifier:
+    """Test the cheap frame triage before the vision model."""
+
+    def test_dark_or_empty_frames_are_away(self):
+        """Test covered cameras and empty rooms skip the LLM."""
+        from focus_guard.engine.prefilter import AWAY, FocusPreClassifier
+
+        classifier = FocusPreClassifier()
+
+        assert classifier.classify(scene_jpeg(brightness=5, face=False)) == AWAY
+        assert classifier.classify(scene_jpeg(face=False)) == AWAY
+
+    def test_unchanged_frame_reuses_last_description(self):
+        """Test a still frame after an analysed one is marked same."""
+        from focus_guard.engine.prefilter import LLM, SAME, FocusPreClassifier
+
+        classifier = FocusPreClassifier()
+
+        assert classifier.classify(scene_jpeg()) == LLM
+        classifier.remember("User is on phone")
+        assert classifier.classify(scene_jpeg()) == SAME
+        assert classifier.classify(scene_jpeg(shift=80)) == LLM
+        assert classifier.stats() == {"away": 0, "same": 1, "llm": 2}
+
+    def test_nothing_is_same_before_a_description(self):
+        """Test frames need a remembered vision result before being reused."""
+        from focus_guard.engine.prefilter import LLM, FocusPreClassifier
+
+        classifier = FocusPreClassifier()
+
+        assert classifier.classify(scene_jpeg()) == LLM
+        assert classifier.classify(scene_jpeg()) == LLM
+
+    def test_undecodable_frames_go_to_llm(self):
+        """Test the heuristics never drop a frame they can't read."""
+        from focus_guard.engine.prefilter import LLM, FocusPreClassifier
+
+        assert FocusPreClassifier().classify(b"garbage") == LLM
+
+    def test_eval_harness_reports_call_reduction(self, tmp_path):
+        """Test the offline evaluation over a labelled folder."""
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+        from eval_prefilter import evaluate
+        from focus_guard.engine.prefilter import FocusPreClassifier
+
+        frames = {"a_phone_1.jpg": scene_jpeg(), "b_phone_2.jpg": scene_jpeg(),
+                  "c_away_3.jpg": scene_jpeg(face=False)}
+        for name, data in frames.items():
+            (tmp_path / name).write_bytes(data)
+        (tmp_path / "labels.csv").write_text("a_phone_1.jpg,phone\nb_phone_2.jpg,phone\nc_away_3.jpg,away\n")
+
+        report = evaluate(str(tmp_path), FocusPreClassifier())
+
+        assert report["verdicts"] == {"llm": 1, "same": 1, "away": 1}
+        assert report["call_reduction"] == pytest.approx(2 / 3)
+        assert report["agreement"] == 1.0
+
+
+
+class TestSessions:
+    """Test per-socket state, coalescing and the shared Groq budget."""
+
+    def test_newest_message_wins_while_busy(self):
+        """Test messages arriving during a call replace each other."""
+        from focus_guard.engine.session import FocusSession
+
+        session = FocusSession(1)
+
+        assert session.submit({"reason": "first"}) is True
+        assert session.take() == {"reason": "first"}
+        assert session.submit({"reason": "second"}) is False
+        assert session.submit({"reason": "third"}) is False
+
+        assert session.take() == {"reason": "third"}
+        assert session.dropped == 1
+        assert session.stats()["processed"] == 2
+
+    def test_request_cost(self):
+        """Test frames cost more of the budget than text triggers."""
+        from focus_guard.engine.session import FRAME_COST, REASON_COST, request_cost
+
+        assert request_cost({"image": b"jpeg"}) == FRAME_COST
+        assert request_cost({"reason": "tab"}) == REASON_COST
+
+    def test_bucket_throttles_after_burst(self):
+        """Test requests beyond the burst wait for refill."""
+        from focus_guard.engine.session import TokenBucket
+
+        bucket = TokenBucket(rate=20, burst=2)
+
+        async def main():
+            started = time.perf_counter()
+            for _ in range(4):
+                await bucket.acquire(1)
+            return time.perf_counter() - started
+
+        elapsed = asyncio.run(main())
+        assert 0.08 <= elapsed < 0.5
+        assert bucket.stats()["waited"] == 2
+
+    def test_bucket_shares_budget_round_robin(self):
+        """Test a busy session can't starve the others."""
+        from focus_guard.engine.session import TokenBucket
+
+        bucket = TokenBucket(rate=50, burst=1)
+        order = []
+
+        async def client(session_id, count):
+            for _ in range(count):
+                await bucket.acquire(session_id)
+                order.append(session_id)
+
+        async def main():
+            await bucket.acquire(0)  # drain the burst
+            await asyncio.gather(client("spammer", 3), client("spammer", 3), client("quiet", 1))
+
+        asyncio.run(main())
+        assert order.index("quiet") <= 2
+        assert bucket.queue_depth() == 0
+
+    def test_cancelled_waiter_leaves_queue(self):
+        """Test disconnecting sessions don't keep budget reserved."""
+        from focus_guard.engine.session import TokenBucket
+
+        bucket = TokenBucket(rate=1, burst=1)
+
+        async def main():
+            await bucket.acquire(1)
+            task = asyncio.create_task(bucket.acquire(2))
+            await asyncio.sleep(0.01)
+            assert bucket.queue_depth() == 1
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return bucket.queue_depth()
+
+        assert asyncio.run(main()) == 0
+
+    def test_manager_tracks_drops(self):
+        """Test drop counts survive session close."""
+        from focus_guard.engine.session import SessionManager, TokenBucket
+
+        manager = SessionManager(TokenBucket(rate=0))
+        session = manager.open()
+        session.submit({"reason": "a"})
+        session.submit({"reason": "b"})
+        assert manager.stats()["active"] == 1
+
+        manager.close(session)
+        stats = manager.stats()
+        assert stats["active"] == 0
+        assert stats["dropped"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
+
+
+class TestTransport:
+    """Test the shared pooled HTTP transport against a local HTTP server."""
+
+    @pytest.fixture
+    def http_server(self):
+        """Keep-alive HTTP/1.1 server recording the client port of every request."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        state = {"ports": [], "fail": 0}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self):
+                state["ports"].append(self.client_address[1])
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                if state["fail"]:
+                    state["fail"] -= 1
+                    status, body = 429, b'{"error": "rate limited"}'
+                else:
+                    status, body = 200, (
+                        b'{"id": "x", "object": "chat.completion", "created": 0, "model": "m",'
+                        b' "choices": [{"index": 0, "finish_reason": "stop",'
+                        b' "message": {"role": "assistant", "content": "safe"}}]}'
+                    )
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    self.send_header("retry-after-ms", "10")
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            do_GET = do_POST = do_HEAD = _reply
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        state["url"] = f"http://127.0.0.1:{server.server_address[1]}"
+        yield state
+        server.shutdown()
+        server.server_close()
+
+    def test_groq_calls_reuse_one_connection(self, http_server):
+        """Test sequential SDK calls share one keep-alive connection."""
+        from groq import Groq
+        from focus_guard.engine.transport import SharedTransport
+
+        transport = SharedTransport(pool_size=4)
+        client = Groq(api_key="k", base_url=http_server["url"], http_client=transport.http_client, max_retries=0)
+        for _ in range(5):
+            reply = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}])
+            assert reply.choices[0].message.content == "safe"
+
+        assert len(set(http_server["ports"])) == 1
+        assert transport.stats()["connections_opened"] == 1
+        transport.close()
+
+    def test_warm_up_opens_connections_ahead_of_time(self, http_server):
+        """Test requests after warm-up run on already-open sockets."""
+        from focus_guard.engine.transport import SharedTransport
+
+        transport = SharedTransport(pool_size=4)
+        assert transport.warm_up(http_server["url"], connections=3) == 3
+        warm_ports = set(http_server["ports"])
+        opened = transport.stats()["connections_opened"]
+
+        transport.http_client.get(http_server["url"])
+        assert http_server["ports"][-1] in warm_ports
+        assert transport.stats()["connections_opened"] == opened
+        transport.close()
+
+    def test_rate_limit_retry_honours_header(self, http_server):
+        """Test a 429 is retried after the server's retry-after-ms."""
+        from focus_guard.engine.transport import SharedTransport
+
+        http_server["fail"] = 2
+        transport = SharedTransport(pool_size=2, retries=2)
+
+        response = transport.http_client.get(http_server["url"])
+
+        assert response.status_code == 200
+        stats = transport.stats()
+        assert stats["rate_limited"] == 2
+        assert stats["retries"] == 2
+        transport.close()
+
+    def test_retries_stop_at_the_caller_deadline(self, http_server):
+        """Test a retry that would overrun the event deadline returns the error instead."""
+        from focus_guard.engine.deadline import deadline_scope
+        from focus_guard.engine.transport import SharedTransport
+
+        http_server["fail"] = 1
+        transport = SharedTransport(pool_size=2, retries=2)
+
+        with deadline_scope(time.monotonic() + 0.01):
+            response = transport.http_client.get(http_server["url"])
+
+        assert response.status_code == 429
+        assert transport.stats()["retries"] == 0
+        transport.close()
+
+    def test_gemini_clients_share_the_pool(self):
+        """Test google-genai clients are built on the shared transport, or their own on old SDKs."""
+        from types import ModuleType
+        from focus_guard.engine import transport
+
+        class HttpOptions:
+            def __init__(self, **kwargs):
+                self.__dict__.update(kwargs)
+
+        google, genai, genai_types = ModuleType("google"), ModuleType("google.genai"), ModuleType("google.genai.types")
+        google.genai, genai.types, genai.Client, genai_types.HttpOptions = genai, genai_types, Mock(), HttpOptions
+        modules = {"google": google, "google.genai": genai, "google.genai.types": genai_types}
+        with patch.dict(sys.modules, modules), patch.dict(os.environ, {"GROG_API_KEY": "test-key"}):
+            sys.modules.pop("focus_guard.engine.vision", None)
+            from focus_guard.engine.vision import VisionAgent
+
+            VisionAgent()
+            options = genai.Client.call_args.kwargs["http_options"]
+            assert options.httpx_client is transport.shared_transport().http_client
+
+            genai_types.HttpOptions = Mock(side_effect=TypeError("unexpected keyword 'httpx_client'"))
+            transport.gemini_client("test-key")
+            assert genai.Client.call_args.kwargs["http_options"] is None
+
+    def test_retry_delay_headers(self):
+        """Test Retry-After and Groq reset headers are parsed."""
+        import httpx
+        from focus_guard.engine.transport import parse_duration, retry_delay
+
+        assert parse_duration("2m59.56s") == pytest.approx(179.56)
+        assert parse_duration("250ms") == pytest.approx(0.25)
+        assert retry_delay(httpx.Headers({"retry-after": "3"})) == 3
+        assert retry_delay(httpx.Headers({
+            "x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "7.66s",
+        })) == pytest.approx(7.66)
+        assert retry_delay(httpx.Headers({})) is None
+
+
+class TestMetrics:
+    """Test the built-in metrics and their Prometheus rendering."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket counts, sum and count in the exposition format."""
+        from focus_guard.engine.metrics import Histogram
+
+        histogram = Histogram("h_seconds", "test", ["stage"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, stage="vision")
+
+        lines = histogram.render().splitlines()
+        assert "# TYPE h_seconds histogram" in lines
+        assert 'h_seconds_bucket{stage="vision",le="0.1"} 1' in lines
+        assert 'h_seconds_bucket{stage="vision",le="1.0"} 2' in lines
+        assert 'h_seconds_bucket{stage="vision",le="+Inf"} 3' in lines
+        assert 'h_seconds_count{stage="vision"} 3' in lines
+
+    def test_labels_are_checked(self):
+        """Test a missing label is an error rather than a silent new series."""
+        from focus_guard.engine.metrics import Counter
+
+        with pytest.raises(ValueError):
+            Counter("c_total", "test", ["stage"]).inc()
+
+    def test_pipeline_records_stages_and_failures(self, agent, mock_groq_client):
+        """Test stage latencies, roast fallbacks and unsafe verdicts are counted."""
+        from focus_guard.engine.metrics import FALLBACKS, STAGE_LATENCY, UNSAFE
+
+        agent.roast_pool = None  # no background refills racing the counters
+        vision, fallbacks, unsafe = STAGE_LATENCY.count(stage="vision"), FALLBACKS.value(), UNSAFE.value()
+
+        def create(model, **kwargs):
+            if "maverick" in model:
+                raise Exception("reasoning down")
+            return replies_by_model()(model, **kwargs)
+
+        mock_groq_client.chat.completions.create.side_effect = create
+        agent.process_distraction("frame")
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(safety="unsafe\nS1")
+        agent.process_distraction("frame")
+
+        assert STAGE_LATENCY.count(stage="vision") == vision + 2
+        assert FALLBACKS.value() == fallbacks + 1
+        assert UNSAFE.value() == unsafe + 1
+
+    def test_recording_overhead_is_small(self):
+        """Test an observation costs microseconds, not milliseconds."""
+        from focus_guard.engine.metrics import Histogram
+
+        histogram = Histogram("overhead_seconds", "test", ["stage"])
+        started = time.perf_counter()
+        for _ in range(20000):
+            histogram.observe(0.2, stage="roast")
+        assert (time.perf_counter() - started) / 20000 < 50e-6
+
+
+class TestLoadHarness:
+    """Test the mock Groq fault injection and the load report maths."""
+
+    def test_mock_groq_injects_errors(self):
+        """Test error_rate=1 answers every request with the configured status."""
+        from fastapi.testclient import TestClient
+
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+        from mock_groq import create_app
+
+        client = TestClient(create_app(latency=0, error_rate=1.0, error_status=429))
+        response = client.post("/openai/v1/chat/completions", json={"model": "m", "messages": []})
+
+        assert response.status_code == 429
+        assert response.headers["retry-after-ms"] == "50"
+        assert client.get("/mock/stats").json() == {"requests": 1, "errors": 1}
+
+    def test_histogram_quantile_from_scrape(self):
+        """Test loop-lag quantiles are estimated from /metrics bucket deltas."""
+        from focus_guard.engine.metrics import Histogram
+
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+        from load_ws import histogram_buckets, histogram_quantile
+
+        lag = Histogram("focusguard_event_loop_lag_seconds", "test", buckets=(0.01, 0.1))
+        before = lag.render()
+        for value in [0.005] * 90 + [0.05] * 10:
+            lag.observe(value)
+
+        start, end = histogram_buckets(before, lag.name), histogram_buckets(lag.render(), lag.name)
+        delta = {bound: end[bound] - start.get(bound, 0) for bound in end}
+        assert histogram_quantile(0.5, delta) <= 0.01
+        assert 0.01 < histogram_quantile(0.99, delta) <= 0.1
+
+
+class TestDeadlines:
+    """Test per-event budgets and the fallback tiers."""
+
+    @pytest.fixture
+    def quiet_pool(self, agent):
+        """Roast pool without background refills or fresh-roast rolls."""
+        agent.roast_pool.refill = lambda activity: None
+        agent.roast_pool.fresh_ratio = 0
+        return agent.roast_pool
+
+    def test_full_tier_passes_stage_timeouts(self, agent, mock_groq_client):
+        """Test each Groq call gets its stage's sub-budget as the SDK timeout."""
+        from focus_guard.engine.deadline import Deadline
+
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model()
+        agent.roast_pool = None
+        deadline = Deadline(budget=5.0, stage_budgets={"vision": 1.0, "reasoning": 0.8, "safety": 0.5})
+
+        result = agent.process_distraction("frame", deadline=deadline)
+
+        assert result["tier"] == "full"
+        assert result["deadline"]["missed"] == []
+        timeouts = {c.kwargs["model"]: c.kwargs.get("timeout")
+                    for c in mock_groq_client.chat.completions.create.call_args_list}
+        assert timeouts[agent.vision_model] <= 1.0
+        assert timeouts[agent.reasoning_model] <= 0.8
+
+    def test_slow_vision_falls_back_to_text_only(self, agent, mock_groq_client):
+        """Test a vision timeout roasts from the client's reason instead."""
+        seen = []
+
+        def create(model, **kwargs):
+            if "scout" in model:
+                raise Exception("Request timed out.")
+            seen.append(kwargs["messages"][-1]["content"])
+            return replies_by_model()(model, **kwargs)
+
+        mock_groq_client.chat.completions.create.side_effect = create
+        agent.roast_pool = None
+
+        result = agent.process_distraction("frame", reason="User looking away (Head)")
+
+        assert result["tier"] == "text_only"
+        assert result["deadline"]["missed"] == ["vision"]
+        assert result["tease"] == "Lock in bro"
+        assert "User looking away (Head)" in seen[0]
+
+    def test_exhausted_budget_serves_pool_then_static(self, agent, mock_groq_client, quiet_pool):
+        """Test no time for Reasoning means a pool roast, or the fallback line when empty."""
+        from focus_guard.engine.deadline import Deadline
+        from focus_guard.engine.groq_agent import ROAST_FALLBACK
+
+        quiet_pool.add("phone", "Phone down, homie.")
+        # First take() serves it normally; empty the pool by taking once more afterwards
+        quiet_pool.fresh_ratio = 1.0
+
+        result = agent.process_description("User is on phone", deadline=Deadline(budget=0.05))
+        assert result["tier"] == "pool"
+        assert result["tease"] == "Phone down, homie."
+
+        result = agent.process_description("User is on phone", deadline=Deadline(budget=0.05))
+        assert result["tier"] == "static"
+        assert result["tease"] == ROAST_FALLBACK
+        assert "reasoning" in result["deadline"]["missed"]
+        mock_groq_client.chat.completions.create.assert_not_called()
+
+    def test_no_time_for_safety_uses_cached_verdict(self, agent, mock_groq_client):
+        """Test an already-judged roast skips the Llama Guard call when safety has no budget."""
+        from focus_guard.engine.deadline import Deadline
+
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model()
+        agent.roast_pool = None
+        agent.verdict_cache.put("Lock in bro", True)
+        deadline = Deadline(budget=5.0, stage_budgets={"vision": 1.0, "reasoning": 1.0, "safety": 0.0})
+
+        result = agent.process_description("User is on phone", deadline=deadline)
+
+        assert result["tier"] == "full"
+        assert result["safe"] is True
+        models = [c.kwargs["model"] for c in mock_groq_client.chat.completions.create.call_args_list]
+        assert not any("guard" in model for model in models)
+
+    def test_unjudged_roast_without_safety_budget_degrades(self, agent, mock_groq_client):
+        """Test a fresh roast is never sent unchecked when safety has no budget."""
+        from focus_guard.engine.deadline import Deadline
+
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model()
+        agent.roast_pool = None
+        deadline = Deadline(budget=5.0, stage_budgets={"vision": 1.0, "reasoning": 1.0, "safety": 0.0})
+
+        result = agent.process_description("User is on phone", deadline=deadline)
+
+        assert result["tier"] == "static"
+        assert result["deadline"]["missed"] == ["safety"]
+
+
+class LocalRedis:
+    """In-process stand-in for the redis-py commands RedisBackend uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.lock = threading.Lock()
+
+    def _expire(self, key):
+        if key in self.expiry and self.expiry[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+
+    def get(self, key):
+        with self.lock:
+            self._expire(key)
+            value = self.data.get(key)
+            return None if value is None else str(value).encode()
+
+    def set(self, key, value, px=None):
+        with self.lock:
+            self.data[key] = value
+            self.expiry.pop(key, None)
+            if px:
+                self.expiry[key] = time.monotonic() + px / 1000
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.expiry.pop(key, None)
+            return int(self.data.pop(key, None) is not None)
+
+    def incrbyfloat(self, key, amount):
+        with self.lock:
+            self._expire(key)
+            self.data[key] = float(self.data.get(key, 0)) + amount
+            return self.data[key]
+
+    def pexpire(self, key, ms):
+        with self.lock:
+            self.expiry[key] = time.monotonic() + ms / 1000
+            return True
+
+
+class TestSharedState:
+    """Test the shared backends, cross-worker budget and graceful drain."""
+
+    @pytest.fixture(params=["memory", "sqlite", "redis"])
+    def backend(self, request, tmp_path):
+        from focus_guard.engine.shared import MemoryBackend, RedisBackend, SQLiteBackend
+
+        if request.param == "memory":
+            backend = MemoryBackend()
+        elif request.param == "sqlite":
+            backend = SQLiteBackend(str(tmp_path / "shared.db"))
+        else:
+            backend = RedisBackend(LocalRedis())
+        yield backend
+        backend.close()
+
+    def test_values_and_ttl(self, backend):
+        """Test get/set/delete and expiry behave the same on every backend."""
+        backend.set("a", "1")
+        backend.set("b", "2", ttl=0.05)
+        assert backend.get("a") == "1"
+        assert backend.get("b") == "2"
+
+        time.sleep(0.08)
+        assert backend.get("b") is None
+        backend.delete("a")
+        assert backend.get("a") is None
+
+    def test_counters(self, backend):
+        """Test counters start at zero, add up and expire."""
+        assert backend.incr("n", 3, ttl=0.05) == 3
+        assert backend.incr("n", -1) == 2
+
+        time.sleep(0.08)
+        assert backend.incr("n", 1) == 1
+
+    def test_sqlite_counters_shared_between_connections(self, tmp_path):
+        """Test two workers' connections to one file see a single atomic counter."""
+        from focus_guard.engine.shared import SQLiteBackend
+
+        path = str(tmp_path / "shared.db")
+        workers = [SQLiteBackend(path), SQLiteBackend(path)]
+
+        def bump(backend):
+            for _ in range(50):
+                backend.incr("hits")
+
+        threads = [threading.Thread(target=bump, args=(backend,)) for backend in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert workers[0].get("hits") == "100.0"
+        for backend in workers:
+            backend.close()
+
+    def test_create_backend_from_spec(self, tmp_path):
+        """Test backend specs, including the fallback when redis isn't installed."""
+        from focus_guard.engine.shared import MemoryBackend, SQLiteBackend, create_backend
+
+        assert isinstance(create_backend("memory"), MemoryBackend)
+        backend = create_backend(f"sqlite:///{tmp_path / 'x.db'}")
+        assert isinstance(backend, SQLiteBackend) and backend.shared
+        backend.close()
+        with patch.dict(sys.modules, {"redis": None}):
+            assert isinstance(create_backend("redis://localhost:6379/0"), MemoryBackend)
+
+    def test_budget_shared_between_workers(self, tmp_path):
+        """Test two workers' limits draw on one budget per window through the backend."""
+        from focus_guard.engine.session import SharedRateLimit, TokenBucket, budget_for
+        from focus_guard.engine.shared import MemoryBackend, SQLiteBackend
+
+        backend = SQLiteBackend(str(tmp_path / "shared.db"))
+        workers = [SharedRateLimit(backend, rate=10, burst=4) for _ in range(2)]
+
+        with patch("time.time", return_value=1000.1):
+            waits = [workers[i % 2].take(1) for i in range(5)]
+        assert waits[:4] == [0.0] * 4
+        assert waits[4] == pytest.approx(0.3)
+        # The denied request was refunded; the next window starts fresh
+        with patch("time.time", return_value=1000.45):
+            assert workers[0].take(4) == 0.0
+
+        bucket = TokenBucket(rate=10, burst=4, shared=workers[0])
+        assert bucket.stats()["shared"] is True
+        assert budget_for(backend).shared is not None
+        assert budget_for(MemoryBackend()).shared is None
+        backend.close()
+
+    def test_bucket_waits_on_shared_limit(self):
+        """Test sessions queue for the next window once the shared budget is spent."""
+        from focus_guard.engine.session import SharedRateLimit, TokenBucket
+        from focus_guard.engine.shared import MemoryBackend
+
+        bucket = TokenBucket(rate=20, burst=2, shared=SharedRateLimit(MemoryBackend(), rate=20, burst=2))
+
+        async def main():
+            await asyncio.wait_for(asyncio.gather(*(bucket.acquire(i) for i in range(6))), 2)
+
+        asyncio.run(main())
+        assert bucket.granted == 6
+        assert bucket.queue_depth() == 0
+
+    def test_bucket_acquire_off_event_loop_when_backend_locked(self, tmp_path):
+        """Test a locked SQLite budget blocks the acquiring session, not the event loop."""
+        import sqlite3
+        from focus_guard.engine.session import SharedRateLimit, TokenBucket
+        from focus_guard.engine.shared import SQLiteBackend
+
+        path = str(tmp_path / "shared.db")
+        backend = SQLiteBackend(path)
+        bucket = TokenBucket(rate=10, burst=4, shared=SharedRateLimit(backend, rate=10, burst=4))
+        # Another worker holds the write lock
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+
+        async def main():
+            acquire = asyncio.create_task(bucket.acquire(1))
+            ticks = 0
+            for _ in range(20):
+                await asyncio.sleep(0.01)
+                ticks += 1
+            assert not acquire.done()
+            other.execute("COMMIT")
+            await asyncio.wait_for(acquire, 2)
+            return ticks
+
+        started = time.perf_counter()
+        assert asyncio.run(main()) == 20
+        assert time.perf_counter() - started < 2
+        assert bucket.granted == 1
+        other.close()
+        backend.close()
+
+    def test_verdicts_shared_between_workers(self, tmp_path):
+        """Test a verdict stored by one worker is a hit in another."""
+        from focus_guard.engine.safety import VerdictCache
+        from focus_guard.engine.shared import RedisBackend
+
+        backend = RedisBackend(LocalRedis())
+        first = VerdictCache(path=":memory:", shared=backend)
+        second = VerdictCache(path=":memory:", shared=backend)
+
+        first.put("Lock in, bro", True)
+        assert second.get("Lock in, bro") is True
+        assert second.stats()["hits"] == 1
+        assert second.get("Something else") is None
+
+    def test_drain_waits_for_inflight_pipelines(self):
+        """Test drain lets running work finish and reports what is still running at the timeout."""
+        from focus_guard.engine.session import SessionManager, TokenBucket
+
+        manager = SessionManager(TokenBucket(rate=0))
+
+        async def main():
+            quick, slow = manager.open(), manager.open()
+            quick.worker = asyncio.create_task(asyncio.sleep(0.05))
+            slow.worker = asyncio.create_task(asyncio.sleep(5))
+            still_running = await manager.drain(timeout=0.2)
+            finished = quick.worker.done()
+            slow.worker.cancel()
+            return still_running, finished
+
+        assert asyncio.run(main()) == (1, True)
+        assert manager.stats()["draining"] is True
+
+
+class TestEventStore:
+    """Test the batched SQLite event log and its aggregate queries."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        from focus_guard.engine.events import EventStore
+
+        store = EventStore(str(tmp_path / "events.db"), batch_size=50, flush_interval=0.01)
+        yield store
+        store.close()
+
+    def fill(self, store, user="alice", hours=3):
+        """One 30-minute session per hour with two distractions and 5 minutes distracted."""
+        from focus_guard.engine.events import DISTRACTION, RECOVERED, SESSION_END
+
+        for hour in range(hours):
+            base = 1_700_000_000 - 1_700_000_000 % 3600 + hour * 3600
+            store.append(user, DISTRACTION, ts=base + 60, activity="phone", roasted=True)
+            store.append(user, DISTRACTION, ts=base + 120, activity="away" if hour else "phone")
+            store.append(user, RECOVERED, ts=base + 400, seconds=300)
+            store.append(user, SESSION_END, ts=base + 1800, seconds=1800)
+        store.flush()
+
+    def test_writes_are_batched(self, store):
+        """Test events queued together land in few transactions."""
+        for i in range(120):
+            store.append("alice", "distraction", ts=1000 + i, activity="phone")
+        deadline = time.time() + 2
+        while store.stats()["written"] < 120 and time.time() < deadline:
+            time.sleep(0.01)
+
+        stats = store.stats()
+        assert stats["written"] == 120
+        assert stats["batches"] <= 6
+
+    def test_summary_and_top_activities(self, store):
+        """Test focus ratio, distraction rate and top activities come from SQL aggregates."""
+        self.fill(store)
+        self.fill(store, user="bob", hours=1)
+
+        summary = store.summary("alice", end=2_000_000_000)
+        assert summary["sessions"] == 3
+        assert summary["distractions"] == 6
+        assert summary["roasts"] == 3
+        assert summary["focus_ratio"] == pytest.approx(1 - 900 / 5400, abs=0.001)
+        assert summary["distractions_per_hour"] == pytest.approx(4.0)
+
+        top = store.top_activities("alice", end=2_000_000_000)
+        assert top[0] == {"activity": "phone", "count": 4}
+
+    def test_delete_user_clears_log_and_rollups(self, store):
+        """Test a deleted user's aggregates are empty while other users keep theirs."""
+        self.fill(store)
+        self.fill(store, user="bob", hours=1)
+
+        assert store.delete_user("alice") == 12
+        assert store.summary("alice", end=2_000_000_000)["sessions"] == 0
+        assert store.top_activities("alice", end=2_000_000_000) == []
+        assert store.timeline("alice", "day", end=2_000_000_000)["items"] == []
+        assert store.summary("bob", end=2_000_000_000)["sessions"] == 1
+
+    def test_timeline_pages(self, store):
+        """Test hourly buckets come newest first with an offset for the next page."""
+        self.fill(store, hours=3)
+
+        first = store.timeline("alice", "hour", end=2_000_000_000, limit=2)
+        assert len(first["items"]) == 2
+        assert first["items"][0]["start"] > first["items"][1]["start"]
+        assert first["next_offset"] == 2
+
+        second = store.timeline("alice", "hour", end=2_000_000_000, limit=2, offset=2)
+        assert len(second["items"]) == 1
+        assert second["next_offset"] is None
+
+    def test_distraction_log_cursor(self, store):
+        """Test the raw log pages by id cursor and carries the roast details."""
+        from focus_guard.engine.events import clean_user
+
+        for i in range(5):
+            store.record_result("alice", {"activity": "Looking at phone", "tease": f"Roast {i}", "tier": "full"})
+        store.record_result("alice", {"is_focused": True})
+        store.flush()
+
+        page = store.distractions("alice", limit=3)
+        assert len(page["items"]) == 3
+        assert page["items"][0]["activity"] == "phone"
+        assert page["items"][0]["tier"] == "full"
+        rest = store.distractions("alice", limit=3, before_id=page["next_cursor"])
+        assert len(rest["items"]) == 2 and rest["next_cursor"] is None
+
+        assert clean_user("abc-123") == "abc-123"
+        assert clean_user("../etc/passwd") == "anonymous"
+
+    def test_rollups_match_scan(self, store):
+        """Test rollup-backed totals equal a full scan for ranges cut mid-hour and mid-day."""
+        import random
+
+        from focus_guard.engine.events import DISTRACTION, RECOVERED, SESSION_END, split_range
+
+        rng = random.Random(7)
+        base = 1_700_000_000
+        for _ in range(400):
+            kind = rng.choice([DISTRACTION, RECOVERED, SESSION_END])
+            store.append("alice", kind, ts=base + rng.uniform(0, 4 * 86400),
+                         activity=rng.choice(["phone", "away"]), seconds=rng.uniform(1, 600),
+                         roasted=rng.random() < 0.5)
+        store.flush()
+
+        for start, end in [(0, 2_000_000_000), (base + 1234.5, base + 3 * 86400 + 77),
+                           (base + 100, base + 200), (base + 3600, base + 86400 * 2)]:
+            assert store.summary("alice", start, end) == pytest.approx(store.scan_summary("alice", start, end))
+            parts = split_range(start, end)
+            assert parts[0][1] == start and parts[-1][2] == end
+            assert all(a[2] == b[1] for a, b in zip(parts, parts[1:]))
+
+    def test_rollups_rebuilt_for_existing_log(self, tmp_path):
+        """Test a log written before rollups existed gets them on open."""
+        from focus_guard.engine.events import EventStore
+
+        path = str(tmp_path / "events.db")
+        store = EventStore(path, flush_interval=0.01)
+        self.fill(store)
+        store.close()
+        with sqlite3.connect(path) as db:
+            db.execute("DELETE FROM rollups")
+            db.execute("DELETE FROM rollup_activities")
+
+        reopened = EventStore(path)
+        try:
+            assert reopened.summary("alice", end=2_000_000_000)["sessions"] == 3
+            assert reopened.top_activities("alice", end=2_000_000_000)[0] == {"activity": "phone", "count": 4}
+        finally:
+            reopened.close()
+
+
+class TestServerTTS:
+    """Test server-side TTS: clip cache, render dedup, prerendering and the audio protocol."""
+
+    @pytest.fixture
+    def service(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+        from focus_guard.engine.tts import ClipCache, TTSService
+
+        calls = []
+
+        def render(text, voice, rate):
+            calls.append(text)
+            time.sleep(0.05)
+            return b"RIFF" + text.encode()
+
+        pool = ThreadPoolExecutor(max_workers=2)
+        service = TTSService(ClipCache(str(tmp_path / "tts")), voice="", rate=160, render=render, pool=pool)
+        service.calls = calls
+        yield service
+        service.shutdown()
+
+    def test_clip_cache_evicts_least_recently_used(self, tmp_path):
+        """Test the disk cache stays under its byte limit, dropping the oldest unused clip."""
+        from focus_guard.engine.tts import ClipCache
+
+        cache = ClipCache(str(tmp_path / "tts"), max_bytes=250)
+        cache.put("a", b"x" * 100)
+        cache.put("b", b"x" * 100)
+        assert cache.get("a") is not None
+        cache.put("c", b"x" * 100)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["bytes"] == 200
+
+        # A restart picks up the files left on disk
+        assert ClipCache(str(tmp_path / "tts"), max_bytes=250).get("c") == b"x" * 100
+
+    def test_cached_clip_read_off_event_loop(self, service):
+        """Test a cache hit reads the clip in a worker thread, not on the event loop."""
+        service.cache.put(service.key("Focus!"), b"RIFFFocus!")
+        get = service.cache.get
+        readers = []
+
+        def tracked_get(key):
+            readers.append(threading.current_thread())
+            return get(key)
+
+        service.cache.get = tracked_get
+        assert asyncio.run(service.clip("Focus!")) == b"RIFFFocus!"
+        assert readers and threading.main_thread() not in readers
+        assert service.calls == []
+
+    def test_concurrent_requests_render_once(self, service):
+        """Test one text is rendered once however many sockets ask, then served from disk."""
+        async def run():
+            return await asyncio.gather(*(service.clip("Focus!") for _ in range(5)))
+
+        clips = asyncio.run(run())
+        assert clips == [b"RIFFFocus!"] * 5
+        assert service.calls == ["Focus!"]
+
+        service._pending.clear()
+        assert asyncio.run(service.clip("Focus!")) == b"RIFFFocus!"
+        assert service.calls == ["Focus!"]
+        assert service.stats()["cache"]["hits"] >= 1
+
+    def test_cache_key_includes_voice_and_rate(self, service):
+        """Test the same text at another rate is a different clip."""
+        assert service.key("Focus!") != type(service)(service.cache, rate=200, pool=service._pool).key("Focus!")
+
+    def test_clip_times_out(self, service):
+        """Test a slow render returns None (the app speaks it itself) but still lands in the cache."""
+        assert asyncio.run(service.clip("Slow roast", timeout=0.001)) is None
+        service.submit("Slow roast").result(timeout=2)
+        time.sleep(0.05)
+        assert service.cache.get(service.key("Slow roast")) == b"RIFFSlow roast"
+
+    def test_roast_pool_prerenders(self, service):
+        """Test roasts entering the pool get their audio rendered ahead of time."""
+        from focus_guard.engine.roast_pool import RoastPool
+
+        pool = RoastPool(generate=lambda prompt: "x", check_safety=lambda roast: True)
+        pool.on_add = service.prerender
+        pool.add("phone", "Put the phone down.")
+        pool.add("phone", "Put the phone down.")
+        pool.shutdown()
+
+        service.submit("Put the phone down.").result(timeout=2)
+        assert service.calls == ["Put the phone down."]
+
+    def test_audio_message_roundtrip(self):
+        """Test audio chunks carry their clip id, order and media type."""
+        from focus_guard.engine.protocol import ProtocolError, decode_audio, decode_message, encode_audio
+
+        message = encode_audio(7, 1, True, "audio/wav", b"chunk")
+        meta, chunk = decode_audio(message)
+        assert meta == {"id": 7, "seq": 1, "last": True, "mime": "audio/wav"}
+        assert bytes(chunk) == b"chunk"
+        # Clients may only send frames
+        with pytest.raises(ProtocolError):
+            decode_message(message)
+
+
+class TestFusedMode:
+    """Test the single-call vision+roast mode and its structured-output parsing."""
+
+    @pytest.fixture
+    def fused(self, agent):
+        agent.pipeline_mode = "fused"
+        agent.roast_pool = None
+        agent.frame_cache = None
+        return agent
+
+    def test_extract_json_skips_fences_and_prose(self):
+        """Test the first complete object is found whatever surrounds it."""
+        from focus_guard.engine.structured import SchemaError, extract_json, parse_focus_reply
+
+        reply = 'Sure! {oops} ```json\n{"is_focused": false, "activity": "On phone", "tease": "Lock in"}\n``` hope that helps'
+        assert extract_json(reply)["activity"] == "On phone"
+        assert parse_focus_reply(reply) == {"is_focused": False, "activity": "On phone", "tease": "Lock in"}
+
+        with pytest.raises(SchemaError):
+            parse_focus_reply('{"is_focused": "no", "activity": "On phone", "tease": "x"}')
+        with pytest.raises(SchemaError):
+            parse_focus_reply('{"is_focused": false, "tease": "x"}')
+        with pytest.raises(SchemaError):
+            parse_focus_reply("I can't see anyone")
+
+    def test_incremental_parser_streams_tease(self):
+        """Test the tease is handed out while it's generated, escapes included."""
+        from focus_guard.engine.structured import IncrementalJSONParser
+
+        pieces = ['```json\n{"is_foc', 'used": false, "activity": "Phone {in hand}", ',
+                  '"tease": "Bro \\"put', ' it\\" down \\u2764', '"}\n```', "trailing"]
+        streamed = []
+        parser = IncrementalJSONParser("tease", streamed.append)
+        for piece in pieces:
+            parser.feed(piece)
+
+        assert parser.done
+        assert "".join(streamed) == 'Bro "put it" down ❤'
+        assert parser.result() == {"is_focused": False, "activity": "Phone {in hand}",
+                                   "tease": 'Bro "put it" down ❤'}
+
+    def test_incremental_parser_joins_surrogate_pairs(self):
+        """Test an escaped emoji split across deltas is streamed as one encodable character."""
+        from focus_guard.engine.structured import IncrementalJSONParser
+
+        pieces = ['{"is_focused": false, "activity": "Phone", "tease": "dead \\ud83d',
+                  '\\udc80 lol \\ud83d"}']
+        streamed = []
+        parser = IncrementalJSONParser("tease", streamed.append)
+        for piece in pieces:
+            parser.feed(piece)
+
+        assert "".join(streamed) == "dead \U0001f480 lol "
+        for piece in streamed:
+            piece.encode("utf-8")
+        assert parser.result()["tease"].startswith("dead \U0001f480 lol")
+
+    def test_fused_is_one_vision_call_plus_safety(self, fused, mock_groq_client):
+        """Test a distracted frame costs one vision call and a safety check, with no reasoning call."""
+        reply = '{"is_focused": false, "activity": "User is on phone", "tease": "Phone down, bro"}'
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(vision=reply)
+
+        result = fused.process_distraction("frame")
+
+        assert result["tease"] == "Phone down, bro"
+        assert result["is_focused"] is False
+        assert result["safe"] is True
+        assert result["source"] == "fused"
+        calls = mock_groq_client.chat.completions.create.call_args_list
+        assert [c.kwargs["model"] for c in calls] == [fused.vision_model, fused.safety_model]
+        assert calls[0].kwargs["response_format"] == {"type": "json_object"}
+        assert "fused_ms" in result["timings"]
+
+    def test_fused_reports_real_focus(self, fused, mock_groq_client):
+        """Test a focused user gets is_focused=True and no roast."""
+        reply = '{"is_focused": true, "activity": "Typing code", "tease": ""}'
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(vision=reply)
+
+        result = fused.process_distraction("frame")
+
+        assert result["is_focused"] is True
+        assert result["tease"] is None
+        assert mock_groq_client.chat.completions.create.call_count == 1
+
+    def test_unparseable_reply_falls_back_to_three_stages(self, fused, mock_groq_client):
+        """Test prose instead of JSON reruns the frame through Vision -> Reasoning -> Safety."""
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(vision="User is on phone")
+
+        result = fused.process_distraction("frame")
+
+        assert result["tease"] == "Lock in bro"
+        assert result["source"] == "fresh"
+        assert "fused" in result["deadline"]["missed"]
+        models = [c.kwargs["model"] for c in mock_groq_client.chat.completions.create.call_args_list]
+        assert models == [fused.vision_model, fused.vision_model, fused.reasoning_model, fused.safety_model]
+
+    def test_fused_checks_frame_cache_once(self, fused, mock_groq_client):
+        """Test a fused miss that falls back, then a repeat frame, count one lookup each."""
+        from focus_guard.engine.frame_cache import FrameCache
+
+        fused.frame_cache = FrameCache()
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(vision="User is on phone")
+        frame = jpeg_frame()
+
+        fused.process_distraction(frame)
+        assert (fused.frame_cache.hits, fused.frame_cache.misses) == (0, 1)
+        calls = mock_groq_client.chat.completions.create.call_count
+
+        result = fused.process_distraction(frame)
+        assert (fused.frame_cache.hits, fused.frame_cache.misses) == (1, 1)
+        assert result["activity"] == "User is on phone"
+        models = [c.kwargs["model"] for c in mock_groq_client.chat.completions.create.call_args_list[calls:]]
+        # The repeat skips vision; the identical roast's verdict is cached
+        assert models == [fused.reasoning_model]
+
+    def test_repeated_focused_frame_stays_focused(self, fused, mock_groq_client):
+        """Test a cache hit on a frame judged focused keeps the verdict instead of roasting it."""
+        from focus_guard.engine.frame_cache import FrameCache
+
+        fused.frame_cache = FrameCache()
+        reply = '{"is_focused": true, "activity": "Typing code", "tease": ""}'
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model(vision=reply)
+        frame = jpeg_frame()
+
+        first = fused.process_distraction(frame)
+        repeat = fused.process_distraction(jpeg_frame(noise=2))
+
+        assert (first["is_focused"], first["tease"]) == (True, None)
+        assert (repeat["is_focused"], repeat["tease"]) == (True, None)
+        assert repeat["source"] == "cache"
+        assert fused.frame_cache.hits == 1
+        mock_groq_client.chat.completions.create.assert_called_once()
+
+    def test_streamed_fused_reply(self, fused, mock_groq_client):
+        """Test streaming mode forwards only the tease text and records time to first token."""
+        pieces = ['{"is_focused": false, "activity": "Asleep", ', '"tease": "Wake', ' up"}']
+        chunks = [Mock(choices=[Mock(delta=Mock(content=text))]) for text in pieces]
+
+        def create(model, **kwargs):
+            if kwargs.get("stream"):
+                return iter(chunks)
+            return replies_by_model()(model, **kwargs)
+
+        mock_groq_client.chat.completions.create.side_effect = create
+        deltas = []
+
+        result = fused.process_distraction("frame", on_token=deltas.append)
+
+        assert deltas == ["Wake", " up"]
+        assert result["tease"] == "Wake up"
+        assert result["timings"]["ttft_ms"] <= result["timings"]["total_ms"]
+
+
+class TestBackendRouter:
+    """Test latency-aware routing and hedged requests across vision backends."""
+
+    class FakeBackend:
+        """Local backend with a fixed latency, every ``tail_every``-th call slow, or failing."""
+
+        def __init__(self, name, latency=0.005, tail=0.0, tail_every=0, fail=False):
+            self.key = name
+            self.latency, self.tail, self.tail_every, self.fail = latency, tail, tail_every, fail
+            self.calls = 0
+            self._lock = threading.Lock()
+
+        def describe(self, image, timeout=None):
+            with self._lock:
+                self.calls += 1
+                slow = self.tail_every and self.calls % self.tail_every == 0
+            time.sleep(self.tail if slow else self.latency)
+            if self.fail:
+                raise ConnectionError(f"{self.key} is down")
+            return f"{self.key} saw the user"
+
+    @staticmethod
+    def p99(router, requests):
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            router.call("frame", timeout=2.0)
+            latencies.append(time.perf_counter() - started)
+        return sorted(latencies)[int(0.99 * len(latencies))]
+
+    def test_routes_to_fastest_backend(self):
+        """Test once both are measured, nearly all requests go to the faster backend."""
+        from focus_guard.engine.router import BackendRouter
+
+        slow, fast = self.FakeBackend("slow", latency=0.03), self.FakeBackend("fast", latency=0.003)
+        router = BackendRouter([slow, fast], hedge=False, min_samples=3, explore=0)
+        try:
+            for _ in range(30):
+                router.call("frame")
+        finally:
+            router.shutdown()
+
+        assert slow.calls == 3
+        assert fast.calls == 27
+        assert router.stats()["backends"]["fast"]["p50_ms"] < router.stats()["backends"]["slow"]["p50_ms"]
+
+    def test_errors_fail_over_and_demote(self):
+        """Test a failing backend's request is retried elsewhere and it stops being chosen."""
+        from focus_guard.engine.router import BackendRouter
+
+        broken, healthy = self.FakeBackend("broken", latency=0.001, fail=True), self.FakeBackend("healthy", latency=0.01)
+        router = BackendRouter([broken, healthy], hedge=False, min_samples=2, explore=0)
+        try:
+            results = [router.call("frame") for _ in range(10)]
+        finally:
+            router.shutdown()
+
+        assert results == ["healthy saw the user"] * 10
+        assert broken.calls == 2
+        assert router.stats()["failovers"] == 2
+        assert router.stats()["backends"]["broken"]["error_rate"] == 1.0
+
+    def test_all_backends_failing_raises(self):
+        """Test the caller gets NoBackendAvailable (and the agent its vision error string)."""
+        from focus_guard.engine.router import BackendRouter, NoBackendAvailable
+
+        router = BackendRouter([self.FakeBackend("a", fail=True), self.FakeBackend("b", fail=True)], hedge=False)
+        try:
+            with pytest.raises(NoBackendAvailable):
+                router.call("frame")
+        finally:
+            router.shutdown()
+
+    def test_hedging_cuts_tail_latency(self):
+        """Test a p95-delayed hedge brings p99 down to about twice the normal latency."""
+        from focus_guard.engine.router import BackendRouter
+
+        def backends():
+            # One call in 25 (4%) hangs for 150ms on either backend
+            return [self.FakeBackend("a", latency=0.004, tail=0.15, tail_every=25),
+                    self.FakeBackend("b", latency=0.004, tail=0.15, tail_every=25)]
+
+        plain = BackendRouter(backends(), hedge=False, explore=0)
+        hedged = BackendRouter(backends(), hedge=True, hedge_min_delay=0.01, explore=0)
+        try:
+            plain_p99 = self.p99(plain, 100)
+            hedged_p99 = self.p99(hedged, 100)
+        finally:
+            plain.shutdown()
+            hedged.shutdown()
+
+        assert plain_p99 >= 0.15
+        assert hedged_p99 < 0.08
+        assert hedged.stats()["hedge_wins"] >= 1
+
+    def test_agent_vision_goes_through_router(self, agent, mock_groq_client):
+        """Test GroqAgent.analyze_image uses the router when one is configured."""
+        from focus_guard.engine.router import BackendRouter
+
+        agent.frame_cache = None
+        agent.vision_router = BackendRouter([self.FakeBackend("fake")], hedge=False)
+        try:
+            assert agent.analyze_image("frame") == "fake saw the user"
+            mock_groq_client.chat.completions.create.assert_not_called()
+        finally:
+            agent.vision_router.shutdown()
+
+    def test_backends_from_spec(self, agent):
+        """Test FOCUS_VISION_BACKENDS entries become per-model Groq backends."""
+        from focus_guard.engine.router import create_backends, create_vision_router
+
+        backends = create_backends(agent, "groq:model-a, groq:model-b, bogus:x")
+        assert [backend.key for backend in backends] == ["groq:model-a", "groq:model-b"]
+        assert create_vision_router(agent, "groq:model-a") is None
+
+        router = create_vision_router(agent, "groq:model-a,groq:model-b")
+        try:
+            assert set(router.stats()["backends"]) == {"groq:model-a", "groq:model-b"}
+        finally:
+            router.shutdown()
+
+
+class TestVisionBatcher:
+    """Test cross-session batching of vision calls."""
+
+    @staticmethod
+    def describe_concurrently(batcher, frames, timeout=2.0):
+        results = [None] * len(frames)
+
+        def call(index):
+            results[index] = batcher.describe(frames[index], timeout)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(frames))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_frames_share_one_request(self):
+        """Test frames arriving within the window go out together and come back to their callers."""
+        from focus_guard.engine.vision_batch import VisionBatcher
+
+        batches = []
+
+        def describe_batch(frames, timeout):
+            batches.append(list(frames))
+            return [f"saw {frame}" for frame in frames]
+
+        batcher = VisionBatcher(describe_batch, Mock(), max_wait=0.2, max_batch=4)
+        try:
+            frames = ["a", "b", "c", "d"]
+            assert self.describe_concurrently(batcher, frames) == ["saw a", "saw b", "saw c", "saw d"]
+        finally:
+            batcher.shutdown()
+
+        # A full batch is sent without waiting out the window
+        assert len(batches) == 1
+        assert sorted(batches[0]) == frames
+        assert batcher.stats()["mean_batch"] == 4
+
+    def test_lone_frame_waits_at_most_max_wait(self):
+        """Test a frame with no company goes out as a single request after max_wait."""
+        from focus_guard.engine.vision_batch import VisionBatcher
+
+        describe_batch = Mock()
+        batcher = VisionBatcher(describe_batch, lambda frame, timeout: f"saw {frame}", max_wait=0.05)
+        try:
+            started = time.perf_counter()
+            assert batcher.describe("a") == "saw a"
+            elapsed = time.perf_counter() - started
+        finally:
+            batcher.shutdown()
+
+        assert 0.05 <= elapsed < 0.5
+        describe_batch.assert_not_called()
+        assert batcher.stats()["singles"] == 1
+
+    def test_failed_batch_is_retried_frame_by_frame(self):
+        """Test a bad batch reply falls back to single-frame calls."""
+        from focus_guard.engine.vision_batch import VisionBatcher
+
+        def describe_batch(frames, timeout):
+            return ["only one description"]
+
+        batcher = VisionBatcher(describe_batch, lambda frame, timeout: f"saw {frame}", max_wait=0.2, max_batch=3)
+        try:
+            assert self.describe_concurrently(batcher, ["a", "b", "c"]) == ["saw a", "saw b", "saw c"]
+        finally:
+            batcher.shutdown()
+        assert batcher.stats()["retried"] == 3
+
+    def test_caller_budget_is_respected(self):
+        """Test a slow batch raises TimeoutError for a caller whose budget ran out."""
+        from focus_guard.engine.vision_batch import VisionBatcher
+
+        def describe_one(frame, timeout):
+            time.sleep(0.3)
+            return "too late"
+
+        batcher = VisionBatcher(Mock(), describe_one, max_wait=0.01)
+        try:
+            with pytest.raises(TimeoutError):
+                batcher.describe("a", timeout=0.1)
+        finally:
+            batcher.shutdown()
+        assert batcher.stats()["timeouts"] == 1
+
+    def test_parse_batch_reply(self):
+        """Test batch replies must carry exactly one non-empty description per image."""
+        from focus_guard.engine.structured import SchemaError
+        from focus_guard.engine.vision_batch import parse_batch_reply
+
+        assert parse_batch_reply('```json\n{"descriptions": [" phone ", "away"]}\n```', 2) == ["phone", "away"]
+        for reply in ('{"descriptions": ["phone"]}', '{"descriptions": ["phone", ""]}', "no json"):
+            with pytest.raises(SchemaError):
+                parse_batch_reply(reply, 2)
+
+    def test_agent_sends_multi_image_request(self, agent, mock_groq_client):
+        """Test analyze_image calls from two sessions become one labelled multi-image request."""
+        from focus_guard.engine.vision_batch import VisionBatcher
+
+        mock_groq_client.chat.completions.create.return_value = completion(
+            '{"descriptions": ["on phone", "sleeping"]}')
+        agent.frame_cache = None
+        agent.vision_batcher = VisionBatcher(agent.groq_vision_batch, agent._describe_frame,
+                                             max_wait=0.5, max_batch=2)
+        try:
+            results = {}
+            threads = [threading.Thread(target=lambda f=frame: results.setdefault(f, agent.analyze_image(f)))
+                       for frame in (b"first", b"second")]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.05)  # fixed arrival order
+            for thread in threads:
+                thread.join()
+        finally:
+            agent.vision_batcher.shutdown()
+
+        assert results == {b"first": "on phone", b"second": "sleeping"}
+        mock_groq_client.chat.completions.create.assert_called_once()
+        kwargs = mock_groq_client.chat.completions.create.call_args.kwargs
+        content = kwargs["messages"][0]["content"]
+        assert [part["text"] for part in content if part["type"] == "text"][1:] == ["Image 1:", "Image 2:"]
+        assert sum(part["type"] == "image_url" for part in content) == 2
+        assert kwargs["response_format"] == {"type": "json_object"}
+
+
+class TestCaptureController:
+    """Test capture levels recommended from load, vision latency and session stability."""
+
+    def test_level_follows_queue_depth_and_latency(self):
+        """Test each multiple of the thresholds is one more level, capped at the last."""
+        from focus_guard.engine.capture import CAPTURE_LEVELS, CaptureController
+
+        controller = CaptureController(queue_high=8, latency_high=2.0)
+        assert controller.recommend(0, load=controller.load(queue_depth=0)) == 0
+        assert controller.recommend(0, load=controller.load(queue_depth=9)) == 1
+        assert controller.recommend(0, load=controller.load(queue_depth=100)) == len(CAPTURE_LEVELS) - 1
+
+        controller.load(queue_depth=0)
+        controller.observe_result({"timings": {"vision_ms": 4500.0}})
+        assert controller.recommend(0) == 2
+
+    def test_stable_session_backs_off_one_more_level(self):
+        """Test sessions showing the same activity frame after frame get a longer interval."""
+        from focus_guard.engine.capture import CaptureController
+        from focus_guard.engine.session import STABLE_FRAMES, FocusSession
+
+        session = FocusSession(1)
+        for _ in range(STABLE_FRAMES - 1):
+            session.record_activity("phone")
+        assert not session.stable
+        session.record_activity("phone")
+        assert session.stable
+        assert CaptureController().recommend(0, session.stable, load=0.0) == 1
+
+        session.record_activity("away")
+        assert not session.stable
+
+    def test_hysteresis_prevents_flapping(self):
+        """Test a level is only left once load has clearly dropped below it."""
+        from focus_guard.engine.capture import CaptureController
+
+        controller = CaptureController()
+        assert controller.recommend(1, load=0.9) == 1
+        assert controller.recommend(1, load=0.5) == 0
+        assert controller.stats()["recoveries"] == 1
+
+    def test_latency_is_smoothed(self):
+        """Test one slow call doesn't swing the latency estimate all the way."""
+        from focus_guard.engine.capture import CaptureController
+
+        controller = CaptureController()
+        controller.observe_latency(0.5)
+        controller.observe_latency(5.0)
+        assert 0.5 < controller.latency < 5.0
+        controller.observe_result({"activity": "no timings"})
+        assert controller.stats()["latency_ms"] == round(controller.latency * 1000, 1)
+
+
+class TestResponseStore:
+    """Test recording model responses to disk and replaying them offline."""
+
+    @staticmethod
+    def offline(agent):
+        """Take caches and background pools out of the way so every stage hits the client."""
+        agent.frame_cache = agent.verdict_cache = agent.safety_batcher = agent.roast_pool = None
+        return agent
+
+    def test_store_persists_and_cycles_repeats(self, tmp_path):
+        """Test recordings survive a reopen and repeats replay in recorded order."""
+        from focus_guard.engine.replay import ResponseStore, fingerprint
+
+        store = ResponseStore(str(tmp_path))
+        key = fingerprint("model", "prompt")
+        store.put(key, {"content": "first", "latency": 0.1, "chunks": None})
+        store.put(key, {"content": "second", "latency": 0.2, "chunks": None})
+        store.close()
+
+        store = ResponseStore(str(tmp_path))
+        try:
+            assert [store.get(key)["content"] for _ in range(3)] == ["first", "second", "first"]
+            assert store.get(fingerprint("model", "other prompt")) is None
+            assert store.stats()["recordings"] == 2
+        finally:
+            store.close()
+
+    def test_index_rebuilt_from_log(self, tmp_path):
+        """Test a lost or torn index is repaired from the append-only log."""
+        from focus_guard.engine.replay import INDEX_NAME, LOG_NAME, ResponseStore, fingerprint
+
+        store = ResponseStore(str(tmp_path))
+        for i in range(3):
+            store.put(fingerprint("model", str(i)), {"content": f"reply {i}", "latency": 0.0, "chunks": None})
+        store.close()
+
+        with open(tmp_path / INDEX_NAME, "r+b") as f:
+            f.truncate(50)  # one whole entry plus a torn one
+        with open(tmp_path / LOG_NAME, "ab") as f:
+            f.write(b"\x00\x00\x01")  # torn record
+
+        store = ResponseStore(str(tmp_path))
+        try:
+            assert [store.get(fingerprint("model", str(i)))["content"] for i in range(3)] == \
+                ["reply 0", "reply 1", "reply 2"]
+        finally:
+            store.close()
+
+    def test_fingerprint_uses_frame_hash(self):
+        """Test a frame is keyed by its bytes, whatever the encoding, along with model and prompt."""
+        from focus_guard.engine.replay import fingerprint
+
+        def messages(image, prompt="Describe"):
+            return [{"role": "user", "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image}"}},
+            ]}]
+
+        frame = jpeg_frame()
+        assert fingerprint("scout", messages(frame)) == fingerprint("scout", messages(frame))
+        assert fingerprint("scout", messages(frame)) != fingerprint("scout", messages(jpeg_frame(shade=90)))
+        assert fingerprint("scout", messages(frame)) != fingerprint("maverick", messages(frame))
+        assert fingerprint("scout", messages(frame)) != fingerprint("scout", messages(frame, "Roast"))
+        assert fingerprint("scout", base64.b64decode(frame)) == fingerprint("scout", base64.b64decode(frame))
+
+    def test_pipeline_replays_without_network(self, agent, mock_groq_client, tmp_path):
+        """Test a recorded distraction replays to the same result with no client at all."""
+        from focus_guard.engine.groq_agent import GroqAgent
+        from focus_guard.engine.replay import RECORD, REPLAY, ReplayGroqClient, ResponseStore
+
+        mock_groq_client.chat.completions.create.side_effect = replies_by_model()
+        store = ResponseStore(str(tmp_path))
+        self.offline(agent).client = ReplayGroqClient(mock_groq_client, store, RECORD)
+        frame = jpeg_frame()
+        recorded = agent.process_distraction(frame)
+        assert mock_groq_client.chat.completions.create.call_count == 3
+
+        with patch.dict(os.environ, {}, clear=True), \
+                patch("focus_guard.engine.groq_agent.REPLAY_MODE", REPLAY), \
+                patch("focus_guard.engine.replay.REPLAY_MODE", REPLAY), \
+                patch("focus_guard.engine.replay.REPLAY_SPEED", 0.0), \
+                patch("focus_guard.engine.replay._store", store):
+            replayer = self.offline(GroqAgent())
+            assert replayer.enabled and replayer.transport is None
+            replayed = replayer.process_distraction(frame)
+
+        assert mock_groq_client.chat.completions.create.call_count == 3
+        for field in ("is_focused", "activity", "tease", "safe"):
+            assert replayed[field] == recorded[field]
+        assert replayed["tease"] == "Lock in bro"
+        # An unseen frame has nothing to replay: the vision stage fails like it would offline
+        assert replayer.analyze_image(jpeg_frame(shade=90)).startswith("Error analyzing image")
+        store.close()
+
+    def test_default_agent_replays_concurrent_sessions(self, mock_groq_client, tmp_path):
+        """Test record then replay with the default agent configuration gives the same results."""
+        from concurrent.futures import ThreadPoolExecutor
+        from focus_guard.engine.groq_agent import GroqAgent
+        from focus_guard.engine.replay import RECORD, REPLAY, ResponseStore
+
+        calls = itertools.count()
+
+        def create(model, messages, **kwargs):
+            # Every reply is unique, so a replay that consumes recordings out of order shows up
+            n = next(calls)
+            time.sleep(0.001 * (n % 5))
+            if "guard" in model:
+                return completion("safe")
+            return completion(f"{'Person on phone' if 'scout' in model else 'Lock in'} #{n}")
+
+        mock_groq_client.chat.completions.create.side_effect = create
+        store = ResponseStore(str(tmp_path))
+        frames = [jpeg_frame(shade=shade) for shade in range(0, 240, 30)]
+
+        def run(mode, env):
+            with patch.dict(os.environ, env, clear=True), \
+                    patch("focus_guard.engine.groq_agent.REPLAY_MODE", mode), \
+                    patch("focus_guard.engine.replay.REPLAY_MODE", mode), \
+                    patch("focus_guard.engine.replay.REPLAY_SPEED", 0.0), \
+                    patch("focus_guard.engine.replay._store", store):
+                agent = GroqAgent()
+                try:
+                    with ThreadPoolExecutor(max_workers=4) as sessions:
+                        return list(sessions.map(agent.process_distraction, frames))
+                finally:
+                    agent.close()
+
+        recorded = run(RECORD, {"GROQ_API_KEY": "test-key"})
+        count = mock_groq_client.chat.completions.create.call_count
+        replayed = run(REPLAY, {})
+
+        assert mock_groq_client.chat.completions.create.call_count == count
+        assert store.stats()["misses"] == 0
+        for before, after in zip(recorded, replayed):
+            for field in ("is_focused", "activity", "tease", "safe", "source"):
+                assert after[field] == before[field]
+        store.close()
+
+    def test_replay_keeps_recorded_latency(self, mock_groq_client, tmp_path):
+        """Test replay waits the recorded latency times the speed factor, and honours timeouts."""
+        from focus_guard.engine.replay import RECORD, REPLAY, ReplayGroqClient, ResponseStore
+
+        def slow(model, **kwargs):
+            time.sleep(0.1)
+            return completion("slow reply")
+
+        mock_groq_client.chat.completions.create.side_effect = slow
+        store = ResponseStore(str(tmp_path))
+        request = {"model": "scout", "messages": [{"role": "user", "content": "hi"}]}
+        ReplayGroqClient(mock_groq_client, store, RECORD).chat.completions.create(**request)
+
+        def replay(speed, timeout=None):
+            client = ReplayGroqClient(None, store, REPLAY, speed=speed)
+            started = time.perf_counter()
+            reply = client.chat.completions.create(timeout=timeout, **request)
+            return reply.choices[0].message.content, time.perf_counter() - started
+
+        content, elapsed = replay(1.0)
+        assert content == "slow reply" and elapsed >= 0.1
+        assert replay(0.0)[1] < 0.05
+        assert replay(0.5)[1] < 0.1
+        with pytest.raises(TimeoutError):
+            replay(1.0, timeout=0.02)
+        store.close()
+
+    def test_streams_replay_token_by_token(self, mock_groq_client, tmp_path):
+        """Test streamed replies are recorded with their token timing and replayed as chunks."""
+        from focus_guard.engine.replay import RECORD, REPLAY, ReplayGroqClient, ResponseStore
+
+        def stream(model, **kwargs):
+            for delta in ("Lock", " in", " bro"):
+                time.sleep(0.01)
+                yield Mock(choices=[Mock(delta=Mock(content=delta))])
+
+        mock_groq_client.chat.completions.create.side_effect = stream
+        store = ResponseStore(str(tmp_path))
+        request = {"model": "maverick", "messages": [{"role": "user", "content": "roast"}], "stream": True}
+        recorder = ReplayGroqClient(mock_groq_client, store, RECORD)
+        assert [c.choices[0].delta.content for c in recorder.chat.completions.create(**request)] == \
+            ["Lock", " in", " bro"]
+
+        replayer = ReplayGroqClient(None, store, REPLAY, speed=1.0)
+        started = time.perf_counter()
+        deltas = [c.choices[0].delta.content for c in replayer.chat.completions.create(**request)]
+        assert deltas == ["Lock", " in", " bro"]
+        assert time.perf_counter() - started >= 0.03
+        # Output options are part of the fingerprint
+        with pytest.raises(LookupError):
+            replayer.chat.completions.create(**dict(request, stream=False, response_format={"type": "json_object"}))
+        store.close()
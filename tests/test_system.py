@@ -5,8 +5,10 @@ Run with: pytest tests/test_system.py -v
 
 import os
 import sys
+import threading
+import time
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import ANY, Mock, patch, MagicMock
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -127,6 +129,21 @@ class TestFastAPIServer:
         response = client.get("/settings")
         assert response.status_code == 200
 
+    def test_stats_endpoint(self, client):
+        """Test engine counters are exposed."""
+        response = client.get("/stats")
+        assert response.status_code == 200
+        assert "queue_depth" in response.json()["sessions"]["budget"]
+
+    def test_metrics_endpoint(self, client):
+        """Test Prometheus metrics are exposed next to /health."""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "text/plain" in response.headers["content-type"]
+        for name in ("focusguard_stage_latency_seconds", "focusguard_active_sessions",
+                     "focusguard_inflight_calls", "focusguard_errors_total"):
+            assert f"# TYPE {name}" in response.text
+
     def test_static_files_served(self, client):
         """Test static files are accessible."""
         response = client.get("/static/css/style.css")
@@ -169,6 +186,330 @@ class TestWebSocket:
                 # Should receive response
                 # Note: May timeout in test environment
 
+    def test_websocket_binary_frame(self, client):
+        """Test binary frame messages reach the pipeline as raw bytes."""
+        from focus_guard.engine.protocol import encode_frame
+        
+        with patch("focus_guard.server.groq_agent") as mock_agent:
+            mock_agent.pipeline_mode = "sequential"
+            mock_agent.process_distraction.return_value = {"tease": "Focus!", "safe": True}
+            
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.send_bytes(encode_frame(b"\xff\xd8jpeg", "Looking away"))
+                result = websocket.receive_json()
+            
+            assert result["tease"] == "Focus!"
+            image = mock_agent.process_distraction.call_args[0][0]
+            assert bytes(image) == b"\xff\xd8jpeg"
+
+    def test_websocket_empty_room_skips_vision(self, client):
+        """Test frames pre-classified as away never reach the vision model."""
+        import io
+        from PIL import Image
+        from focus_guard.engine.prefilter import AWAY_DESCRIPTION
+        from focus_guard.engine.protocol import encode_frame
+        
+        buffer = io.BytesIO()
+        Image.new("RGB", (320, 240), (120, 120, 120)).save(buffer, format="JPEG")
+        
+        with patch("focus_guard.server.groq_agent") as mock_agent:
+            mock_agent.process_description.return_value = {"tease": "Where'd you go?"}
+            
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.send_bytes(encode_frame(buffer.getvalue()))
+                result = websocket.receive_json()
+            
+            assert result["prefilter"] == "away"
+            mock_agent.process_description.assert_called_once_with(AWAY_DESCRIPTION, deadline=ANY)
+            mock_agent.process_distraction.assert_not_called()
+
+    def test_websocket_unchanged_focused_frame_not_roasted(self, client):
+        """Test a frame the prefilter calls unchanged keeps the last frame's focused verdict."""
+        from focus_guard.engine.groq_agent import GroqAgent
+        from focus_guard.engine.prefilter import LLM, SAME
+        from focus_guard.engine.protocol import encode_frame
+
+        verdicts = iter([LLM, SAME])
+
+        async def triage_frame(prefilter, image):
+            return next(verdicts)
+
+        with patch("focus_guard.server.groq_agent") as mock_agent, \
+                patch("focus_guard.server.triage_frame", triage_frame), \
+                patch("focus_guard.server.PREFILTER_ENABLED", True):
+            mock_agent.pipeline_mode = "sequential"
+            mock_agent.process_distraction.return_value = {
+                "is_focused": True, "activity": "Typing code", "tease": None, "safe": True}
+            mock_agent.focused_result.side_effect = (
+                lambda description, **kwargs: GroqAgent.focused_result(mock_agent, description, **kwargs))
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.send_bytes(encode_frame(b"\xff\xd8jpeg"))
+                assert websocket.receive_json()["is_focused"] is True
+                websocket.send_bytes(encode_frame(b"\xff\xd8jpeg"))
+                result = websocket.receive_json()
+
+        assert (result["is_focused"], result["tease"]) == (True, None)
+        assert result["prefilter"] == "same"
+        mock_agent.process_description.assert_not_called()
+
+    def test_websocket_rejects_malformed_binary(self, client):
+        """Test a bad binary message gets an error instead of closing the socket."""
+        with client.websocket_connect("/ws/focus") as websocket:
+            websocket.send_bytes(b"not a frame")
+            result = websocket.receive_json()
+            
+            assert "error" in result
+
+    def test_websocket_rejects_non_object_json(self, client):
+        """Test JSON that isn't an object gets an error and the socket keeps working."""
+        with patch("focus_guard.server.groq_agent") as mock_agent:
+            mock_agent.process_reason.return_value = {"tease": "Focus!"}
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                for message in ([1, 2], "frame", None):
+                    websocket.send_json(message)
+                    assert "error" in websocket.receive_json()
+                websocket.send_json({"reason": "Switched tabs"})
+                assert websocket.receive_json()["tease"] == "Focus!"
+
+    def test_websocket_failed_message_frees_session(self, client):
+        """Test an unexpected pipeline error doesn't leave the session busy forever."""
+        failed = threading.Event()
+
+        def process_reason(reason, **kwargs):
+            if not failed.is_set():
+                failed.set()
+                raise KeyError("boom")
+            return {"tease": "Focus!"}
+
+        with patch("focus_guard.server.groq_agent") as mock_agent:
+            mock_agent.process_reason.side_effect = process_reason
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.send_json({"reason": "Switched tabs"})
+                assert failed.wait(2)
+                time.sleep(0.05)
+                websocket.send_json({"reason": "Switched tabs"})
+                assert websocket.receive_json()["tease"] == "Focus!"
+
+    def test_run_pipelined_uses_given_agent(self, client):
+        """Test the pipelined path runs on the agent it is handed, not the module global."""
+        import asyncio
+        from concurrent.futures import Future
+        from focus_guard.engine.deadline import Deadline
+        from focus_guard.server import run_pipelined
+
+        verdict = Future()
+        verdict.set_result({"type": "safety", "safe": True})
+        agent = Mock()
+        agent.process_distraction_pipelined.return_value = ({"tease": "Focus!", "safe": None}, verdict)
+        sent = []
+
+        class Socket:
+            async def send_json(self, message):
+                sent.append(message)
+
+        with patch("focus_guard.server.groq_agent", None):
+            result = asyncio.run(run_pipelined(Socket(), agent, b"jpeg", {}, time.perf_counter(), Deadline()))
+
+        assert result["tease"] == "Focus!"
+        assert sent == [{"tease": "Focus!", "safe": None}, {"type": "safety", "safe": True}]
+
+    def test_websocket_tab_switch_roast(self, client):
+        """Test text-only triggers are answered via the engine executor."""
+        with patch("focus_guard.server.groq_agent") as mock_agent:
+            mock_agent.process_reason.return_value = {
+                "is_focused": False,
+                "activity": "Switched tabs",
+                "tease": "Alt+Tab back, bro."
+            }
+            
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.send_json({"reason": "Switched tabs"})
+                result = websocket.receive_json()
+            
+            assert result["tease"] == "Alt+Tab back, bro."
+            assert result["activity"] == "Switched tabs"
+
+    def test_websocket_streams_roast_deltas(self, client):
+        """Test streamed roasts arrive as deltas followed by a final message."""
+        def process_reason(reason, on_token=None, **kwargs):
+            for delta in ("Alt+Tab", " back,", " bro."):
+                on_token(delta)
+            return {"is_focused": False, "activity": reason, "tease": "Alt+Tab back, bro.", "safe": True}
+
+        with patch("focus_guard.server.groq_agent") as mock_agent, \
+                patch("focus_guard.server.STREAM_ROASTS", True):
+            mock_agent.process_reason.side_effect = process_reason
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.send_json({"reason": "Switched tabs"})
+                messages = [websocket.receive_json() for _ in range(4)]
+
+        assert [m["delta"] for m in messages[:3]] == ["Alt+Tab", " back,", " bro."]
+        assert messages[3]["type"] == "roast_final"
+        assert messages[3]["streamed"] is True
+        assert messages[3]["tease"] == "Alt+Tab back, bro."
+
+
+    def test_websocket_streams_server_tts_audio(self, client, tmp_path):
+        """Test FOCUS_TTS=server sends a control message, then the roast's clip as binary chunks."""
+        from concurrent.futures import ThreadPoolExecutor
+        from focus_guard.engine.protocol import decode_audio
+        from focus_guard.engine.tts import CHUNK_SIZE, ClipCache, TTSService
+
+        clip = b"RIFF" + b"\0" * (CHUNK_SIZE + 10)
+        service = TTSService(ClipCache(str(tmp_path / "tts")), render=lambda text, voice, rate: clip,
+                             pool=ThreadPoolExecutor(max_workers=1))
+        with patch("focus_guard.server.groq_agent") as mock_agent, \
+                patch("focus_guard.server.tts_service", service):
+            mock_agent.process_reason.return_value = {"activity": "Switched tabs", "tease": "Focus!"}
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                assert websocket.receive_json() == {"type": "control", "tts": "server"}
+                websocket.send_json({"reason": "Switched tabs"})
+                assert websocket.receive_json()["tease"] == "Focus!"
+                chunks = [decode_audio(websocket.receive_bytes()) for _ in range(2)]
+        service.shutdown()
+
+        assert [meta["seq"] for meta, _ in chunks] == [0, 1]
+        assert [meta["last"] for meta, _ in chunks] == [False, True]
+        assert chunks[0][0]["mime"] == "audio/wav"
+        assert b"".join(bytes(chunk) for _, chunk in chunks) == clip
+
+    def test_websocket_server_tts_falls_back_to_browser(self, client, tmp_path):
+        """Test a failed render tells the app to speak the roast itself."""
+        from concurrent.futures import ThreadPoolExecutor
+        from focus_guard.engine.tts import ClipCache, TTSService
+
+        def render(text, voice, rate):
+            raise RuntimeError("no speech engine")
+
+        service = TTSService(ClipCache(str(tmp_path / "tts")), render=render,
+                             pool=ThreadPoolExecutor(max_workers=1))
+        with patch("focus_guard.server.groq_agent") as mock_agent, \
+                patch("focus_guard.server.tts_service", service):
+            mock_agent.process_reason.return_value = {"activity": "Switched tabs", "tease": "Focus!"}
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.receive_json()
+                websocket.send_json({"reason": "Switched tabs"})
+                websocket.receive_json()
+                assert websocket.receive_json() == {"type": "speak", "text": "Focus!"}
+        service.shutdown()
+
+    def test_websocket_slow_vision_backs_off_capture(self, client):
+        """Test slow vision calls make the server push a lower capture rate, size and quality."""
+        from focus_guard.engine.capture import CAPTURE_LEVELS, CaptureController
+        from focus_guard.engine.protocol import encode_frame
+
+        controller = CaptureController(queue_high=100, latency_high=1.0)
+        with patch("focus_guard.server.groq_agent") as mock_agent, \
+                patch("focus_guard.server.capture_controller", controller):
+            mock_agent.pipeline_mode = "sequential"
+            mock_agent.process_distraction.return_value = {
+                "is_focused": False, "activity": "on phone", "tease": "Focus!",
+                "timings": {"vision_ms": 2500.0},
+            }
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                websocket.send_bytes(encode_frame(b"\xff\xd8jpeg"))
+                assert websocket.receive_json()["tease"] == "Focus!"
+                control = websocket.receive_json()
+
+        assert control == {"type": "control", "capture": dict(CAPTURE_LEVELS[2], level=2)}
+        assert controller.stats()["backoffs"] == 1
+
+    def test_websocket_stable_activity_backs_off_capture(self, client):
+        """Test an idle server still slows capture for a session that keeps showing the same thing."""
+        from focus_guard.engine.capture import CaptureController
+        from focus_guard.engine.protocol import encode_frame
+
+        with patch("focus_guard.server.groq_agent") as mock_agent, \
+                patch("focus_guard.server.capture_controller", CaptureController()):
+            mock_agent.pipeline_mode = "sequential"
+            mock_agent.process_distraction.return_value = {
+                "is_focused": False, "activity": "looking at phone", "tease": "Focus!"}
+
+            with client.websocket_connect("/ws/focus") as websocket:
+                for _ in range(3):
+                    websocket.send_bytes(encode_frame(b"\xff\xd8jpeg"))
+                    assert websocket.receive_json()["tease"] == "Focus!"
+                control = websocket.receive_json()
+
+        assert control["type"] == "control"
+        assert control["capture"]["level"] == 1
+
+
+class TestHistoryAPI:
+    """Test focus results are logged per user and served as aggregates."""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        """Test client with a fresh event store."""
+        from focus_guard.engine.events import EventStore
+
+        with patch.dict(os.environ, {"GROQ_API_KEY": "test-key"}):
+            from fastapi.testclient import TestClient
+            from focus_guard.server import app
+        store = EventStore(str(tmp_path / "events.db"), flush_interval=0.01)
+        with patch("focus_guard.server.event_store", store):
+            yield TestClient(app), store
+        store.close()
+
+    def test_websocket_results_feed_stats(self, client):
+        """Test a roast, a recovery and the session end show up in /api/users/{id}/stats."""
+        client, store = client
+        with patch("focus_guard.server.groq_agent") as mock_agent:
+            mock_agent.process_reason.return_value = {"activity": "Switched tabs", "tease": "Focus!"}
+
+            with client.websocket_connect("/ws/focus?user=alice") as websocket:
+                websocket.send_json({"reason": "User switched tabs/windows"})
+                assert websocket.receive_json()["tease"] == "Focus!"
+                websocket.send_json({"event": "recovered", "seconds": 2.5})
+        store.flush()
+
+        stats = client.get("/api/users/alice/stats").json()
+        assert stats["summary"]["sessions"] == 1
+        assert stats["summary"]["distractions"] == 1
+        assert stats["summary"]["roasts"] == 1
+        assert stats["top_activities"] == [{"activity": "tab_switch", "count": 1}]
+
+        log = client.get("/api/users/alice/distractions").json()
+        assert log["items"][0]["description"] == "Switched tabs"
+        assert client.get("/api/users/bob/stats").json()["summary"]["sessions"] == 0
+
+    def test_timeline_validates_bucket(self, client):
+        """Test unknown bucket sizes are rejected."""
+        client, _ = client
+        assert client.get("/api/users/alice/timeline?bucket=day").status_code == 200
+        assert client.get("/api/users/alice/timeline?bucket=week").status_code == 400
+
+    def test_delete_history(self, client):
+        """Test the dashboard's Clear All erases one user's history, including queued events."""
+        client, store = client
+        for user in ("alice", "bob"):
+            store.append(user, "distraction", activity="phone", roasted=True)
+
+        response = client.delete("/api/users/alice/history")
+
+        assert response.json() == {"user": "alice", "deleted": 1}
+        assert client.get("/api/users/alice/stats").json()["summary"]["distractions"] == 0
+        assert client.get("/api/users/alice/distractions").json()["items"] == []
+        assert client.get("/api/users/bob/stats").json()["summary"]["distractions"] == 1
+
+    def test_store_opened_at_startup_not_import(self, tmp_path):
+        """Test importing the app leaves the data directory alone; the lifespan opens the store."""
+        import focus_guard.server as server
+        from fastapi.testclient import TestClient
+
+        assert server.event_store is None
+        with TestClient(server.app):
+            assert server.event_store is not None
+            assert server.event_store.path == str(tmp_path / "events.db")
+        assert server.event_store is None
+
 
 class TestStaticAssets:
     """Test static asset files exist."""
@@ -204,6 +545,90 @@ class TestStaticAssets:
             assert os.path.exists(path), f"Missing: {page}"
 
 
+class TestStaticCaching:
+    """Test the production static pipeline (hashed URLs, immutable caching, ETag/304, gzip)."""
+
+    @pytest.fixture
+    def static_dir(self, tmp_path):
+        (tmp_path / "css").mkdir()
+        (tmp_path / "img").mkdir()
+        (tmp_path / "css" / "site.css").write_text("body { color: red; }\n" * 200)
+        (tmp_path / "img" / "logo.jpg").write_bytes(b"\xff\xd8jpeg-bytes")
+        (tmp_path / "page.html").write_text(
+            '<link href="/static/css/site.css"><img src="/static/img/logo.jpg">')
+        return tmp_path
+
+    @pytest.fixture
+    def client(self, static_dir):
+        from fastapi.testclient import TestClient
+        from starlette.applications import Starlette
+        from starlette.routing import Mount
+        from focus_guard.assets import AssetManifest, ProductionStaticFiles
+
+        manifest = AssetManifest(str(static_dir)).build()
+        app = Starlette(routes=[Mount("/static", ProductionStaticFiles(manifest))])
+        client = TestClient(app)
+        client.manifest = manifest
+        return client
+
+    def test_hashed_urls_are_immutable(self, client):
+        """Test hashed asset URLs get a year-long immutable cache and an ETag."""
+        url = client.manifest.url("css/site.css")
+        assert url != "/static/css/site.css"
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+        assert response.headers["etag"]
+        assert response.text.startswith("body")
+
+    def test_etag_revalidation_returns_304(self, client):
+        """Test If-None-Match gets a 304 with no body."""
+        response = client.get("/static/css/site.css")
+        assert response.headers["cache-control"] == "no-cache"
+
+        again = client.get("/static/css/site.css", headers={"If-None-Match": response.headers["etag"]})
+        assert again.status_code == 304
+        assert again.content == b""
+
+    def test_precompressed_gzip_variant(self, client):
+        """Test text assets are served from their gzip variant; images are left alone."""
+        import gzip as gzip_module
+
+        response = client.get(client.manifest.url("css/site.css"), headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        asset = client.manifest.assets["css/site.css"]
+        assert len(asset.variants["gzip"]) < len(asset.body)
+        assert gzip_module.decompress(asset.variants["gzip"]) == asset.body
+
+        image = client.get(client.manifest.url("img/logo.jpg"), headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in image.headers
+
+    def test_pages_reference_hashed_urls(self, client):
+        """Test /static references inside HTML are rewritten to hashed URLs."""
+        page = client.manifest.assets["page.html"].body.decode()
+        assert client.manifest.url("css/site.css") in page
+        assert client.manifest.url("img/logo.jpg") in page
+
+    def test_files_added_later_fall_back_to_disk(self, client, static_dir):
+        """Test uploads created after startup are still served."""
+        (static_dir / "img" / "upload.jpg").write_bytes(b"new")
+        response = client.get("/static/img/upload.jpg")
+        assert response.status_code == 200
+        assert response.content == b"new"
+
+    def test_dev_mode_disables_caching(self):
+        """Test the default dev mode keeps the no-cache headers."""
+        with patch.dict(os.environ, {"GROQ_API_KEY": "test-key"}):
+            from fastapi.testclient import TestClient
+            from focus_guard.server import app, static_assets
+        if static_assets is not None:
+            pytest.skip("server imported in prod static mode")
+        response = TestClient(app).get("/static/css/style.css")
+        assert "no-store" in response.headers["cache-control"]
+
+
 class TestConfiguration:
     """Test configuration and environment."""
 
@@ -228,5 +653,57 @@ class TestConfiguration:
         assert os.path.exists(req_file), "requirements.txt is required"
 
 
+
+class TestColdStart:
+    """Test import cost of the server module (cold start on scale-up)."""
+
+    SRC_DIR = os.path.join(os.path.dirname(__file__), "..", "src")
+    # Allowed import time on top of FastAPI itself, in ms
+    BUDGET_MS = float(os.getenv("FOCUS_IMPORT_BUDGET_MS", "150"))
+
+    def import_times(self, module: str) -> dict:
+        """Cumulative microseconds per module from ``python -X importtime``."""
+        import subprocess
+        env = dict(os.environ, PYTHONPATH=self.SRC_DIR)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, env=env, timeout=60,
+        )
+        assert proc.returncode == 0, proc.stderr
+        times = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            parts = line.split("|")
+            try:
+                times[parts[2].strip()] = int(parts[1])
+            except ValueError:
+                continue  # header line
+        return times
+
+    def test_heavy_modules_not_imported(self):
+        """Importing the server must not pull in the Groq SDK, numpy, Pillow or opik."""
+        times = self.import_times("focus_guard.server")
+        loaded = {name.split(".")[0] for name in times}
+        assert "focus_guard.server" in times
+        for heavy in ("groq", "numpy", "PIL", "opik", "httpx"):
+            assert heavy not in loaded, f"{heavy} imported at startup"
+
+    def test_import_time_budget(self):
+        """Server import beyond FastAPI stays within budget (best of 3 runs)."""
+        overheads = []
+        for _ in range(3):
+            times = self.import_times("fastapi, focus_guard.server")
+            overheads.append(times["focus_guard.server"] / 1000)
+        assert min(overheads) < self.BUDGET_MS, f"focus_guard.server import took {min(overheads):.0f}ms"
+
+    def test_lazy_attributes_resolve(self):
+        """Lazily imported names are still reachable (and patchable)."""
+        from focus_guard.engine import GroqAgent
+        from focus_guard.engine import groq_agent
+        assert GroqAgent is groq_agent.GroqAgent
+        assert groq_agent.Groq.__name__ == "Groq"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])